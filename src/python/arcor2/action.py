@@ -1,11 +1,15 @@
-import select
 import sys
+import threading
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union, cast
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar, Union, cast
 
+from PIL.Image import Image
+
+from arcor2 import blobs, channel, json
 from arcor2.cached import CachedProject, CachedScene
 from arcor2.data.events import ActionStateAfter, ActionStateBefore, Event, PackageState
 from arcor2.exceptions import Arcor2Exception
+from arcor2.image import image_to_bytes
 from arcor2.object_types.abstract import Generic
 from arcor2.object_types.utils import iterate_over_actions
 from arcor2.parameter_plugins.utils import plugin_from_instance
@@ -38,37 +42,78 @@ def patch_object_actions(type_def: Type[Generic], action_name_to_id: Optional[Di
 try:
     # Windows solution
     import msvcrt
-    import time
-
-    def read_stdin(timeout: float = 0.0) -> Union[str, None]:
 
-        time_to_end = time.monotonic() + timeout
+    def read_stdin() -> Iterator[str]:
 
         while True:
+            yield msvcrt.getch().decode()  # type: ignore
 
-            x = msvcrt.kbhit()  # type: ignore
-            if x:
-                return msvcrt.getch().decode()  # type: ignore
+except ImportError:
 
-            if not timeout or time.monotonic() > time_to_end:
-                return None
+    # Linux solution
+    def read_stdin() -> Iterator[str]:
 
-            time.sleep(timeout / 100.0)
+        for line in sys.stdin:
+            yield line.strip()
 
 
-except ImportError:
+def read_commands() -> Iterator[str]:
+    """Blocks and yields commands from the Execution service channel or (when
+    the script is not run by the Execution service) from stdin.
 
-    # Linux solution
-    def read_stdin(timeout: float = 0.0) -> Union[str, None]:
+    :return:
+    """
 
-        if select.select([sys.stdin], [], [], timeout)[0]:
-            return sys.stdin.readline().strip()
-        return None
+    sock = channel.channel()
+
+    if sock is None:
+        yield from read_stdin()
+        return
+
+    while True:
+        try:
+            yield channel.recv_frame(sock).decode()
+        except channel.ChannelException:
+            return
+
+
+_RESUMED = threading.Event()
+_RESUMED.set()
+
+_LISTENER: Optional[threading.Thread] = None
+
+
+def _listen() -> None:
+
+    try:
+        for ctrl_cmd in read_commands():
+            if ctrl_cmd == channel.Command.PAUSE:
+                _RESUMED.clear()
+            elif ctrl_cmd == channel.Command.RESUME:
+                _RESUMED.set()
+    except (OSError, ValueError):  # e.g. stdin is closed or not readable
+        pass
+    finally:
+        _RESUMED.set()  # nobody could resume the script anymore, it must not stay paused forever
+
+
+def start_control_listener() -> None:
+    """Starts (once) a background thread that receives commands and sets
+    flags checked by handle_commands."""
 
+    global _LISTENER
 
-def handle_stdin_commands() -> None:
-    """Reads stdin and checks for commands from parent script (e.g. Execution
-    unit). Prints events to stdout.
+    if _LISTENER is not None:
+        return
+
+    _LISTENER = threading.Thread(target=_listen, name="control_listener", daemon=True)
+    _LISTENER.start()
+
+
+def handle_commands() -> None:
+    """Checks flags set by the control listener according to commands from
+    parent script (e.g. Execution unit). Sends events to the Execution
+    service.
 
     p == pause script
     r == resume script
@@ -76,22 +121,29 @@ def handle_stdin_commands() -> None:
     :return:
     """
 
-    ctrl_cmd = read_stdin()
+    if _RESUMED.is_set():  # the fast path - no syscall here
+        return
 
-    if ctrl_cmd == "p":
-        print_event(PackageState(PackageState.Data(PackageState.Data.StateEnum.PAUSED)))
-        while True:
-            ctrl_cmd = read_stdin(0.1)
-            if ctrl_cmd == "r":
-                print_event(PackageState(PackageState.Data(PackageState.Data.StateEnum.RUNNING)))
-                break
+    print_event(PackageState(PackageState.Data(PackageState.Data.StateEnum.PAUSED)))
+    _RESUMED.wait()
+    print_event(PackageState(PackageState.Data(PackageState.Data.StateEnum.RUNNING)))
 
 
 def print_event(event: Event) -> None:
-    """Used from main script to print event as JSON."""
+    """Used from main script to send event to the Execution service.
+
+    Events are sent over the framed channel when available, otherwise
+    printed to stdout as JSON.
+    """
+
+    sock = channel.channel()
+
+    if sock is None:
+        print(event.to_json())
+        sys.stdout.flush()
+        return
 
-    print(event.to_json())
-    sys.stdout.flush()
+    channel.send_frame(sock, event.to_json().encode())
 
 
 F = TypeVar("F", bound=Callable[..., Any])
@@ -114,6 +166,32 @@ def results_to_json(res: Any) -> Optional[List[str]]:
         return [plugin_from_instance(res).value_to_json(res)]
 
 
+def results_to_json_with_blobs(res: Any) -> Tuple[Optional[List[str]], Dict[str, bytes]]:
+    """Like results_to_json, but images are replaced by references to blobs
+    (see arcor2.blobs).
+
+    :param res:
+    :return: Results and blobs (by id).
+    """
+
+    if res is None:
+        return None, {}
+
+    results: List[str] = []
+    blob_data: Dict[str, bytes] = {}
+
+    for r in res if isinstance(res, tuple) else (res,):
+
+        if isinstance(r, Image):
+            blob_id = blobs.new_id()
+            blob_data[blob_id] = image_to_bytes(r)
+            results.append(json.dumps(blobs.ref(blob_id)))
+        else:
+            results.append(plugin_from_instance(r).value_to_json(r))
+
+    return results, blob_data
+
+
 _executed_action: Optional[Tuple[str, Callable]] = None
 
 
@@ -135,6 +213,8 @@ def action(f: F) -> F:
 
         if HANDLE_ACTIONS:  # if not set, ignore everything
 
+            start_control_listener()
+
             if _executed_action and an:
                 raise Arcor2Exception("Inner actions should not have name specified.")
 
@@ -168,7 +248,7 @@ def action(f: F) -> F:
                 if _executed_action is None:
                     _executed_action = action_id, f
 
-        handle_stdin_commands()
+            handle_commands()
 
         try:
             res = f(*args, an=an, **kwargs)
@@ -186,7 +266,7 @@ def action(f: F) -> F:
                     _executed_action = None
                     print_event(ActionStateAfter(ActionStateAfter.Data(action_id, results_to_json(res))))
 
-        handle_stdin_commands()
+            handle_commands()
 
         return res
 
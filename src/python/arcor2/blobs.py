@@ -0,0 +1,94 @@
+"""Binary side channel for WebSocket connections.
+
+Instead of embedding binary data (e.g. images) into JSON messages, it is
+sent as a binary WebSocket frame (blob id followed by data) and the JSON
+message only contains a reference to it ("blob:<id>"). The frame is
+always sent before the message referencing it.
+
+Clients opt in by connecting with the "blobs=true" query parameter,
+other clients get the data embedded in JSON as before.
+"""
+
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from arcor2.exceptions import Arcor2Exception
+
+REF_PREFIX = "blob:"
+QUERY_PARAM = "blobs"
+ID_LENGTH = 32  # uuid4 in hex
+
+
+class BlobException(Arcor2Exception):
+    pass
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def ref(blob_id: str) -> str:
+    return f"{REF_PREFIX}{blob_id}"
+
+
+def ref_id(value: str) -> Optional[str]:
+    """Returns blob id if the value is a reference to a blob."""
+
+    if value.startswith(REF_PREFIX) and len(value) == len(REF_PREFIX) + ID_LENGTH:
+        return value[len(REF_PREFIX) :]
+    return None
+
+
+def frame(blob_id: str, data: bytes) -> bytes:
+
+    if len(blob_id) != ID_LENGTH:
+        raise BlobException("Invalid blob id.")
+
+    return blob_id.encode() + data
+
+
+def parse_frame(message: bytes) -> Tuple[str, bytes]:
+
+    if len(message) < ID_LENGTH:
+        raise BlobException("Invalid blob frame.")
+
+    try:
+        return message[:ID_LENGTH].decode(), message[ID_LENGTH:]
+    except UnicodeDecodeError as e:
+        raise BlobException("Invalid blob id.") from e
+
+
+def enabled(path: Optional[str]) -> bool:
+    """Checks whether the client (given by the path it connected to) opted in
+    for blobs."""
+
+    if not path:
+        return False
+
+    return parse_qs(urlsplit(path).query).get(QUERY_PARAM, ["false"])[-1].lower() == "true"
+
+
+class BlobStore:
+    """Blobs received from one client, waiting for the message that
+    references them."""
+
+    def __init__(self, size: int = 8) -> None:
+
+        self._size = size
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def put(self, blob_id: str, data: bytes) -> None:
+
+        self._blobs[blob_id] = data
+
+        while len(self._blobs) > self._size:
+            self._blobs.popitem(last=False)
+
+    def pop(self, blob_id: str) -> bytes:
+
+        try:
+            return self._blobs.pop(blob_id)
+        except KeyError:
+            raise BlobException("Unknown blob.")
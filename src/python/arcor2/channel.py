@@ -0,0 +1,112 @@
+import asyncio
+import os
+import socket
+import struct
+import threading
+from typing import Optional
+
+from arcor2.data.common import StrEnum
+from arcor2.exceptions import Arcor2Exception
+
+"""
+Framed channel between the main script and the Execution service.
+
+Events (script -> Execution) and control commands (Execution -> script) are sent as frames over a dedicated socket.
+Each frame consists of a 4-byte big-endian payload length followed by the payload itself.
+Thanks to this, stdout of the script is left for the user's prints.
+"""
+
+CHANNEL_FD_NAME = "ARCOR2_CHANNEL_FD"
+
+HEADER = struct.Struct("!I")
+
+
+class ChannelException(Arcor2Exception):
+    pass
+
+
+class Command(StrEnum):
+
+    PAUSE: str = "p"
+    RESUME: str = "r"
+
+
+def frame(payload: bytes) -> bytes:
+    return HEADER.pack(len(payload)) + payload
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+
+    buff = bytearray()
+
+    while len(buff) < size:
+        chunk = sock.recv(size - len(buff))
+        if not chunk:
+            raise ChannelException("Channel closed.")
+        buff.extend(chunk)
+
+    return bytes(buff)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    """Blocks until a whole frame is received.
+
+    :param sock:
+    :return: Payload of the frame.
+    """
+
+    (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return _recv_exactly(sock, size)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Asynchronous counterpart of recv_frame, used by the Execution service.
+
+    :param reader:
+    :return: Payload of the frame.
+    """
+
+    try:
+        (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError as e:
+        raise ChannelException("Channel closed.") from e
+
+
+_SOCKET: Optional[socket.socket] = None
+_SOCKET_CHECKED = False
+_SEND_LOCK = threading.Lock()
+
+
+def channel() -> Optional[socket.socket]:
+    """Returns the channel socket passed by the Execution service (if any).
+
+    When the script is not started by the Execution service (the env. variable is not set), None is returned.
+    :return:
+    """
+
+    global _SOCKET
+    global _SOCKET_CHECKED
+
+    if not _SOCKET_CHECKED:
+
+        _SOCKET_CHECKED = True
+
+        try:
+            fd = int(os.environ[CHANNEL_FD_NAME])
+        except (KeyError, ValueError):
+            return None
+
+        try:
+            _SOCKET = socket.socket(fileno=fd)
+        except OSError as e:
+            raise ChannelException(f"Invalid channel file descriptor: {fd}.") from e
+
+    return _SOCKET
+
+
+def send_frame(sock: socket.socket, payload: bytes) -> None:
+
+    # frames might be sent from more threads, they must not interleave
+    with _SEND_LOCK:
+        sock.sendall(frame(payload))
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 from dataclasses_jsonschema import JsonSchemaMixin
@@ -7,6 +7,21 @@ from dataclasses_jsonschema import JsonSchemaMixin
 from arcor2.exceptions import Arcor2Exception
 
 
+@dataclass
+class Roi(JsonSchemaMixin):
+    """Region of interest (in pixels of the full-resolution image)."""
+
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def __post_init__(self) -> None:
+
+        if self.x < 0 or self.y < 0 or self.width < 1 or self.height < 1:
+            raise Arcor2Exception("Invalid region of interest.")
+
+
 @dataclass
 class CameraParameters(JsonSchemaMixin):
 
@@ -30,3 +45,26 @@ class CameraParameters(JsonSchemaMixin):
                 [0.00000, 0.00000, 1],
             ]
         )
+
+    def for_region(self, roi: Optional[Roi] = None, scale: float = 1.0) -> "CameraParameters":
+        """Parameters of a camera producing cropped and downscaled images.
+
+        :param roi: Region the image is cropped to (first).
+        :param scale: Factor the (cropped) image is scaled by.
+        :return:
+        """
+
+        cx, cy = self.cx, self.cy
+
+        if roi:
+            cx -= roi.x
+            cy -= roi.y
+
+        # pixel centers are at .5, so the principal point has to be shifted accordingly
+        return CameraParameters(
+            self.fx * scale,
+            self.fy * scale,
+            (cx + 0.5) * scale - 0.5,
+            (cy + 0.5) * scale - 0.5,
+            list(self.dist_coefs),
+        )
@@ -2,6 +2,7 @@ import sys
 import time
 import traceback
 
+from arcor2.action import print_event
 from arcor2.data.events import ProjectException
 from arcor2.exceptions import Arcor2Exception
 
@@ -14,8 +15,8 @@ def format_stacktrace() -> str:
 
 
 def print_exception(e: Exception) -> None:
-    """This is intended to be called from the main script. It prints out
-    exception in form of JSON (ProjectException).
+    """This is intended to be called from the main script. It sends out
+    exception in form of ProjectException event.
 
     The related traceback is saved to a text file for latter diagnosis.
     :param e: Exception to be printed out.
@@ -23,8 +24,7 @@ def print_exception(e: Exception) -> None:
     """
 
     pee = ProjectException(ProjectException.Data(str(e), e.__class__.__name__, isinstance(e, Arcor2Exception)))
-    print(pee.to_json())
-    sys.stdout.flush()
+    print_event(pee)
 
     with open("traceback-{}.txt".format(time.strftime("%Y%m%d-%H%M%S")), "w") as tb_file:
         tb_file.write(format_stacktrace())
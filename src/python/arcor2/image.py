@@ -1,5 +1,5 @@
 import io
-from typing import Optional
+from typing import Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
@@ -7,9 +7,18 @@ import PIL.Image
 from PIL.Image import Image
 
 from arcor2 import json
+from arcor2.data.camera import Roi
+from arcor2.exceptions import Arcor2Exception
 
 ENCODING = "latin-1"
 
+# raw depth images (uint16, little-endian) are sent together with their shape
+DEPTH_SHAPE_HEADER = "X-Depth-Shape"
+
+
+class ImageException(Arcor2Exception):
+    pass
+
 
 def image_to_cv2(pil_image: Image, mode=cv2.COLOR_RGB2BGR) -> np.ndarray:
 
@@ -29,6 +38,14 @@ def image_to_bytes_io(value: Image, target_format: str = "jpeg", target_mode: Op
     return output
 
 
+def image_to_bytes(value: Image, target_format: str = "jpeg") -> bytes:
+    return image_to_bytes_io(value, target_format).getvalue()
+
+
+def image_from_bytes(value: bytes) -> Image:
+    return image_from_bytes_io(io.BytesIO(value))
+
+
 def image_to_str(value: Image, target_format: str = "jpeg") -> str:
     return image_to_bytes_io(value, target_format).getvalue().decode(ENCODING)
 
@@ -48,3 +65,88 @@ def image_from_bytes_io(value: io.BytesIO) -> Image:
 
 def image_from_json(value: str) -> Image:
     return image_from_str(json.loads_type(value, str))
+
+
+def region(
+    arr: np.ndarray, roi: Optional[Roi] = None, scale: float = 1.0, interpolation: int = cv2.INTER_AREA
+) -> np.ndarray:
+    """Crops the image (ROI is clipped to the image) and then resizes it by
+    the given factor (0, 1>.
+
+    :param arr:
+    :param roi:
+    :param scale:
+    :param interpolation: Use cv2.INTER_NEAREST for depth images so there are no values made up on edges.
+    :return:
+    """
+
+    if not 0 < scale <= 1:
+        raise ImageException("Scale has to be in (0, 1>.")
+
+    if roi:
+        arr = arr[roi.y : roi.y + roi.height, roi.x : roi.x + roi.width]
+        if not arr.size:
+            raise ImageException("Region of interest is outside of the image.")
+
+    if scale == 1.0:
+        return arr
+
+    height, width = arr.shape[:2]
+    return cv2.resize(arr, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=interpolation)
+
+
+def image_region(value: Image, roi: Optional[Roi] = None, scale: float = 1.0) -> Image:
+
+    if roi is None and scale == 1.0:
+        return value
+
+    return PIL.Image.fromarray(
+        region(np.array(value), roi, scale, cv2.INTER_NEAREST if value.mode.startswith("I") else cv2.INTER_AREA)
+    )
+
+
+def roi_to_str(roi: Roi) -> str:
+    return f"{roi.x},{roi.y},{roi.width},{roi.height}"
+
+
+def roi_from_str(value: str) -> Roi:
+
+    try:
+        x, y, width, height = (int(v) for v in value.split(","))
+    except ValueError as e:
+        raise ImageException("Invalid region of interest.") from e
+
+    return Roi(x, y, width, height)
+
+
+def depth_to_bytes(depth: np.ndarray) -> bytes:
+    """Serializes depth image (distances in mm) into a raw uint16 little-
+    endian buffer."""
+
+    return depth.astype("<u2", copy=False).tobytes()
+
+
+def depth_from_bytes(value: bytes, shape: Tuple[int, int]) -> np.ndarray:
+    """Counterpart of depth_to_bytes, the resulting array is read-only."""
+
+    try:
+        return np.frombuffer(value, dtype="<u2").reshape(shape).astype(np.uint16, copy=False)
+    except ValueError as e:
+        raise ImageException("Depth data do not match the shape.") from e
+
+
+def shape_to_str(shape: Sequence[int]) -> str:
+    return ",".join(str(dim) for dim in shape)
+
+
+def shape_from_str(value: str) -> Tuple[int, int]:
+
+    try:
+        height, width = (int(dim) for dim in value.split(","))
+    except ValueError as e:
+        raise ImageException("Invalid shape.") from e
+
+    if height < 1 or width < 1:
+        raise ImageException("Invalid shape.")
+
+    return height, width
@@ -4,18 +4,21 @@ import inspect
 from dataclasses import dataclass
 from typing import List, Optional, Set
 
+import cv2
+import numpy as np
 from dataclasses_jsonschema import JsonSchemaMixin
 from PIL import Image
 
 from arcor2 import CancelDict, DynamicParamDict
 from arcor2.clients import scene_service
-from arcor2.data.camera import CameraParameters
+from arcor2.data.camera import CameraParameters, Roi
 from arcor2.data.common import Joint, Pose, SceneObject
 from arcor2.data.object_type import Models
 from arcor2.data.robot import RobotType
 from arcor2.docstring import parse_docstring
 from arcor2.exceptions import Arcor2Exception, Arcor2NotImplemented
 from arcor2.helpers import NonBlockingLock
+from arcor2.image import image_region, region
 
 
 class GenericException(Arcor2Exception):
@@ -295,6 +298,30 @@ class Camera(GenericWithPose, metaclass=abc.ABCMeta):
 
         raise Arcor2NotImplemented()
 
+    def color_image_region(self, roi: Optional[Roi] = None, scale: float = 1.0) -> Image.Image:
+        """Color image cropped to the region of interest and downscaled.
+        Cameras should override it in order to do that before the image is
+        encoded and transferred.
+
+        :param roi: Region of the full-resolution image.
+        :param scale: Factor (0, 1> the cropped image is scaled by.
+        :return:
+        """
+
+        return image_region(self.color_image(), roi, scale)
+
+    def depth_array(self, averaged_frames: int = 1, roi: Optional[Roi] = None, scale: float = 1.0) -> np.ndarray:
+        """Depth image (uint16, distances in mm) as an array. Cameras should
+        override it when they can avoid encoding the image.
+
+        :param averaged_frames: Maximal number of averaged frames.
+        :param roi: Region of the full-resolution image.
+        :param scale: Factor (0, 1> the cropped image is scaled by.
+        :return:
+        """
+
+        return region(np.array(self.depth_image(averaged_frames)), roi, scale, cv2.INTER_NEAREST)
+
 
 __all__ = [
     Generic.__name__,
@@ -1,8 +1,23 @@
 import logging
 from enum import Enum
 from functools import partial
-from io import BytesIO
-from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Type, TypeVar, Union, overload
+from io import BufferedReader, BytesIO
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    overload,
+)
 
 import humps
 import requests
@@ -21,7 +36,8 @@ ReturnType = Union[None, Type[Primitive], Type[DataClass], Type[BytesIO]]
 
 OptBody = Optional[Union[JsonSchemaMixin, Sequence[JsonSchemaMixin], Sequence[Primitive]]]
 OptParams = Optional[Dict[str, Primitive]]
-OptFiles = Optional[Dict[str, Union[bytes, str]]]
+# a sequence allows to send multiple files with the same name
+OptFiles = Optional[Union[Dict[str, Union[bytes, str]], Sequence[Tuple[str, Union[bytes, str]]]]]
 
 
 class RestException(Arcor2Exception):
@@ -347,16 +363,127 @@ def _handle_response(resp: requests.Response) -> None:
             raise RestHttpException(decoded_content, error_code=resp.status_code)
 
 
-def get_image(url: str) -> Image.Image:
+def get_image(url: str, params: OptParams = None) -> Image.Image:
     """Shortcut for getting an image."""
 
     # TODO check content type?
     try:
-        return Image.open(call(Method.GET, url, return_type=BytesIO))
+        return Image.open(call(Method.GET, url, return_type=BytesIO, params=params))
     except (UnidentifiedImageError, TypeError) as e:
         raise RestException("Invalid image.") from e
 
 
+def read_multipart(stream: BinaryIO) -> Iterator[bytes]:
+    """Yields bodies of parts of a multipart stream (e.g.
+    multipart/x-mixed-replace), each part has to have Content-Length.
+
+    :param stream:
+    :return:
+    """
+
+    while True:
+
+        line = stream.readline()
+
+        if not line:
+            return
+
+        line = line.strip()
+
+        if not line:  # CRLF after the previous part
+            continue
+
+        if not line.startswith(b"--"):
+            raise RestException("Invalid multipart stream.")
+
+        if line.endswith(b"--"):  # the closing boundary
+            return
+
+        length: Optional[int] = None
+
+        while True:
+
+            header = stream.readline()
+
+            if not header:
+                return
+
+            name, _, value = header.strip().partition(b":")
+
+            if not name:
+                break
+
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+
+        if length is None:
+            raise RestException("Unknown length of the part.")
+
+        data = stream.read(length)
+
+        if len(data) < length:  # stream ended
+            return
+
+        yield data
+
+
+def get_image_stream(url: str, params: OptParams = None, timeout: OptTimeout = None) -> Iterator[Image.Image]:
+    """Shortcut for getting a stream of images (multipart/x-mixed-replace).
+    The connection is closed when the generator is closed."""
+
+    if timeout is None:
+        timeout = Timeout()
+
+    try:
+        resp = session.get(url, params=params, stream=True, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        raise RestException("Catastrophic system error.") from e
+
+    with resp:
+
+        _handle_response(resp)
+
+        try:
+            for data in read_multipart(BufferedReader(resp.raw)):
+                try:
+                    yield Image.open(BytesIO(data))
+                except UnidentifiedImageError as e:
+                    raise RestException("Invalid image.") from e
+        except requests.exceptions.RequestException as e:
+            raise RestException("Stream interrupted.") from e
+
+
+class RawResponse(NamedTuple):
+
+    content: bytes
+    headers: Mapping[str, str]
+    status_code: int = 200
+
+
+def get_raw(
+    url: str, params: OptParams = None, timeout: OptTimeout = None, headers: Optional[Dict[str, str]] = None
+) -> RawResponse:
+    """Shortcut for getting binary data together with response headers (that
+    usually describe the data).
+
+    Compressed responses (Content-Encoding) are decoded transparently.
+    Request headers allow conditional requests (e.g. If-None-Match), then the
+    status code has to be checked (304 means there are no data).
+    """
+
+    if timeout is None:
+        timeout = Timeout()
+
+    try:
+        resp = session.get(url, params=params, timeout=timeout, headers=headers)
+    except requests.exceptions.RequestException as e:
+        raise RestException("Catastrophic system error.") from e
+
+    _handle_response(resp)
+
+    return RawResponse(resp.content, resp.headers, resp.status_code)
+
+
 def download(url: str, path: str, params: OptParams = None) -> None:
     """Shortcut for saving a file to disk."""
 
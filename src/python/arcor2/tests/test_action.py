@@ -1,11 +1,17 @@
 import io
+import os
+import select
+import socket
+import threading
+import time
 from typing import Optional
 
 import pytest
 
+from arcor2 import action, channel
 from arcor2.action import patch_object_actions
 from arcor2.data.common import ActionMetadata
-from arcor2.data.events import ActionStateAfter, ActionStateBefore
+from arcor2.data.events import ActionStateAfter, ActionStateBefore, PackageState
 from arcor2.exceptions import Arcor2Exception
 from arcor2.object_types.abstract import Generic
 
@@ -147,3 +153,158 @@ def test_composite_action(monkeypatch, capsys) -> None:
 
     with pytest.raises(Arcor2Exception, match="Inner actions should not have name specified."):
         my_obj.action_with_inner_name_spec(an="name")
+
+
+def test_pause_resume(monkeypatch) -> None:
+
+    a, b = socket.socketpair()
+    monkeypatch.setattr(channel, "_SOCKET", a)
+    monkeypatch.setattr(channel, "_SOCKET_CHECKED", True)
+    monkeypatch.setattr(action, "_LISTENER", None)
+    monkeypatch.setattr(action, "_RESUMED", threading.Event())
+    action._RESUMED.set()
+
+    action.start_control_listener()
+    assert action._LISTENER is not None
+
+    try:
+        channel.send_frame(b, channel.Command.PAUSE.encode())
+
+        for _ in range(100):
+            if not action._RESUMED.is_set():
+                break
+            time.sleep(0.01)
+        else:
+            pytest.fail("Pause command not handled.")
+
+        paused_thread = threading.Thread(target=action.handle_commands)
+        paused_thread.start()
+
+        paused_evt = PackageState.from_json(channel.recv_frame(b).decode())
+        assert paused_evt.data.state == PackageState.Data.StateEnum.PAUSED
+        assert paused_thread.is_alive()
+
+        channel.send_frame(b, channel.Command.RESUME.encode())
+        paused_thread.join(1)
+        assert not paused_thread.is_alive()
+
+        running_evt = PackageState.from_json(channel.recv_frame(b).decode())
+        assert running_evt.data.state == PackageState.Data.StateEnum.RUNNING
+    finally:
+        b.close()  # listener ends
+        action._LISTENER.join(1)
+        a.close()
+
+
+def test_pause_channel_closed(monkeypatch) -> None:
+
+    a, b = socket.socketpair()
+    monkeypatch.setattr(channel, "_SOCKET", a)
+    monkeypatch.setattr(channel, "_SOCKET_CHECKED", True)
+    monkeypatch.setattr(action, "_LISTENER", None)
+    monkeypatch.setattr(action, "_RESUMED", threading.Event())
+    action._RESUMED.set()
+
+    action.start_control_listener()
+    assert action._LISTENER is not None
+
+    def paused() -> None:
+        try:
+            action.handle_commands()
+        except OSError:  # the running event can't be sent to the closed channel
+            pass
+
+    try:
+        channel.send_frame(b, channel.Command.PAUSE.encode())
+
+        for _ in range(100):
+            if not action._RESUMED.is_set():
+                break
+            time.sleep(0.01)
+        else:
+            pytest.fail("Pause command not handled.")
+
+        paused_thread = threading.Thread(target=paused, daemon=True)  # would block the exit otherwise
+        paused_thread.start()
+
+        paused_evt = PackageState.from_json(channel.recv_frame(b).decode())
+        assert paused_evt.data.state == PackageState.Data.StateEnum.PAUSED
+        assert paused_thread.is_alive()
+
+        b.close()  # the parent is gone
+
+        action._LISTENER.join(1)
+        assert not action._LISTENER.is_alive()
+
+        paused_thread.join(1)
+        assert not paused_thread.is_alive()
+    finally:
+        b.close()
+        a.close()
+
+
+def test_action_overhead(monkeypatch) -> None:
+    """Microbenchmark of the overhead added by the @action decorator.
+
+    When the script is not paused, checking for commands must not do
+    any I/O (or wait for anything), which is ensured by failing on any
+    attempt to do so. The overhead is then compared to the plain call
+    measured in the same process, so the (generous) limit does not
+    depend on the speed of the machine.
+    """
+
+    class MyObject(Generic):
+        def action(self, *, an: Optional[str] = None) -> None:
+            pass
+
+        action.__action__ = ActionMetadata()  # type: ignore
+
+    sio = io.StringIO()
+    monkeypatch.setattr("sys.stdin", sio)
+    monkeypatch.setattr(channel, "_SOCKET", None)
+    monkeypatch.setattr(channel, "_SOCKET_CHECKED", True)
+    monkeypatch.setattr(action, "_LISTENER", None)
+    monkeypatch.setattr(action, "_RESUMED", threading.Event())
+    action._RESUMED.set()
+
+    my_obj = MyObject("123", "")
+    calls = 10000
+
+    def measure() -> float:
+        """Best of several rounds, to filter out disturbances."""
+
+        best = float("inf")
+
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(calls):
+                my_obj.action()
+            best = min(best, (time.perf_counter() - start) / calls)
+
+        return best
+
+    plain = measure()
+    patch_object_actions(MyObject)
+
+    my_obj.action()  # starts the control listener
+    assert action._LISTENER is not None
+    action._LISTENER.join(1)  # stdin is empty
+
+    def fail(*args, **kwargs) -> None:
+        pytest.fail("Unexpected call on the fast path.")
+
+    monkeypatch.setattr(action._RESUMED, "wait", fail)
+    monkeypatch.setattr(action, "print_event", fail)
+    monkeypatch.setattr(action, "read_commands", fail)
+    monkeypatch.setattr(channel, "channel", fail)
+    monkeypatch.setattr(channel, "recv_frame", fail)
+    monkeypatch.setattr(select, "select", fail)
+    monkeypatch.setattr(os, "read", fail)
+    monkeypatch.setattr(time, "sleep", fail)
+
+    decorated = measure()
+
+    overhead = decorated - plain
+    assert (
+        overhead < 100 * plain
+    ), f"Decorator overhead {overhead * 1e6:.2f} µs per call (plain call {plain * 1e6:.2f} µs)."
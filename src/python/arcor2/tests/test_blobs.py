@@ -0,0 +1,127 @@
+import functools
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pytest
+import websockets
+from dataclasses_jsonschema import JsonSchemaMixin
+from PIL import Image
+from websockets.server import WebSocketServerProtocol as WsClient
+
+from arcor2 import blobs, json, ws_server
+from arcor2.action import results_to_json, results_to_json_with_blobs
+from arcor2.data.rpc.common import RPC
+from arcor2.image import image_from_bytes, image_from_str, image_to_bytes, image_to_str
+
+
+class ImageSize(RPC):
+    @dataclass
+    class Request(RPC.Request):
+        @dataclass
+        class Args(JsonSchemaMixin):
+            image: str
+
+        args: Args
+
+    @dataclass
+    class Response(RPC.Response):
+
+        data: Optional[List[int]] = None
+
+
+class Logger:
+
+    level = None
+
+    def error(self, *args, **kwargs) -> None:
+        raise AssertionError(args)
+
+    def debug(self, *args, **kwargs) -> None:
+        pass
+
+    warn = debug
+
+
+def test_frame() -> None:
+
+    blob_id = blobs.new_id()
+    assert blobs.parse_frame(blobs.frame(blob_id, b"\x00\xff")) == (blob_id, b"\x00\xff")
+
+    assert blobs.ref_id(blobs.ref(blob_id)) == blob_id
+    assert blobs.ref_id("some image data") is None
+
+    with pytest.raises(blobs.BlobException):
+        blobs.parse_frame(b"short")
+
+
+@pytest.mark.parametrize(
+    "path,enabled",
+    [(None, False), ("/", False), ("/?blobs=true", True), ("/?blobs=false", False), ("/?x=1&blobs=True", True)],
+)
+def test_enabled(path: Optional[str], enabled: bool) -> None:
+    assert blobs.enabled(path) is enabled
+
+
+def test_results_with_blobs() -> None:
+
+    img = Image.new("RGB", (32, 24))
+
+    results, blob_data = results_to_json_with_blobs((img, 5))
+
+    assert results is not None
+    assert len(blob_data) == 1
+    blob_id = blobs.ref_id(json.loads(results[0]))
+    assert blob_id is not None
+    assert image_from_bytes(blob_data[blob_id]).size == (32, 24)
+    assert results[1] == "5"
+
+    # the blob is smaller than the legacy string and does not need escaping
+    legacy = results_to_json(img)
+    assert legacy is not None
+    assert len(blob_data[blob_id]) < len(legacy[0].encode())
+    assert image_from_str(json.loads(legacy[0])).size == (32, 24)
+
+    assert results_to_json_with_blobs(None) == (None, {})
+    assert results_to_json_with_blobs(1) == (["1"], {})
+
+
+@pytest.mark.asyncio()
+async def test_received_blob() -> None:
+    async def image_size_cb(req: ImageSize.Request, ui: WsClient) -> ImageSize.Response:
+
+        data = ws_server.received_blob(ui, req.args.image)
+        img = image_from_str(req.args.image) if data is None else image_from_bytes(data)
+        return ImageSize.Response(data=list(img.size))
+
+    async def noop(client) -> None:
+        pass
+
+    handler = functools.partial(
+        ws_server.server,
+        logger=Logger(),
+        register=noop,
+        unregister=noop,
+        rpc_dict={ImageSize.__name__: (ImageSize, image_size_cb)},
+    )
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as srv:
+
+        port = srv.sockets[0].getsockname()[1]
+
+        async with websockets.connect(f"ws://127.0.0.1:{port}/?blobs=true") as client:
+
+            blob_id = blobs.new_id()
+            await client.send(blobs.frame(blob_id, image_to_bytes(Image.new("RGB", (20, 10)))))
+            await client.send(ImageSize.Request(1, ImageSize.Request.Args(blobs.ref(blob_id))).to_json())
+            assert ImageSize.Response.from_json(await client.recv()).data == [20, 10]
+
+            # each blob can be used just once
+            await client.send(ImageSize.Request(2, ImageSize.Request.Args(blobs.ref(blob_id))).to_json())
+            resp = ImageSize.Response.from_json(await client.recv())
+            assert not resp.result
+
+            # fallback
+            await client.send(
+                ImageSize.Request(3, ImageSize.Request.Args(image_to_str(Image.new("RGB", (4, 3))))).to_json()
+            )
+            assert ImageSize.Response.from_json(await client.recv()).data == [4, 3]
@@ -0,0 +1,75 @@
+import asyncio
+import socket
+from typing import Optional
+
+import pytest
+
+from arcor2 import channel
+from arcor2.action import patch_object_actions
+from arcor2.data.common import ActionMetadata
+from arcor2.data.events import ActionStateAfter, ActionStateBefore
+from arcor2.object_types.abstract import Generic
+
+
+def test_frames() -> None:
+
+    a, b = socket.socketpair()
+
+    try:
+        for payload in (b"", b"p", b"x" * 100000):
+            channel.send_frame(a, payload)
+            assert channel.recv_frame(b) == payload
+
+        a.close()
+
+        with pytest.raises(channel.ChannelException):
+            channel.recv_frame(b)
+    finally:
+        b.close()
+
+
+@pytest.mark.asyncio()
+async def test_read_frame() -> None:
+
+    a, b = socket.socketpair()
+    reader, writer = await asyncio.open_unix_connection(sock=b)
+
+    channel.send_frame(a, b"first")
+    channel.send_frame(a, b"second")
+    a.close()
+
+    assert await channel.read_frame(reader) == b"first"
+    assert await channel.read_frame(reader) == b"second"
+
+    with pytest.raises(channel.ChannelException):
+        await channel.read_frame(reader)
+
+    writer.close()
+
+
+def test_action_events_over_channel(monkeypatch, capsys) -> None:
+    class MyObject(Generic):
+        def action(self, *, an: Optional[str] = None) -> None:
+            print("user output")
+
+        action.__action__ = ActionMetadata()  # type: ignore
+
+    a, b = socket.socketpair()
+    monkeypatch.setattr(channel, "_SOCKET", a)
+    monkeypatch.setattr(channel, "_SOCKET_CHECKED", True)
+
+    try:
+        patch_object_actions(MyObject, {"name": "id"})
+        MyObject("123", "").action(an="name")
+
+        out, _ = capsys.readouterr()
+        assert out.strip() == "user output"  # stdout contains only user's prints
+
+        before_evt = ActionStateBefore.from_json(channel.recv_frame(b).decode())
+        after_evt = ActionStateAfter.from_json(channel.recv_frame(b).decode())
+
+        assert before_evt.data.action_id == "id"
+        assert after_evt.data.action_id == "id"
+    finally:
+        a.close()
+        b.close()
@@ -1,7 +1,21 @@
 import numpy as np
+import pytest
 from PIL import Image, ImageChops
 
-from arcor2.image import image_from_str, image_to_str
+from arcor2.data.camera import CameraParameters, Roi
+from arcor2.image import (
+    ImageException,
+    depth_from_bytes,
+    depth_to_bytes,
+    image_from_str,
+    image_region,
+    image_to_str,
+    region,
+    roi_from_str,
+    roi_to_str,
+    shape_from_str,
+    shape_to_str,
+)
 
 
 def test_image_str() -> None:
@@ -15,3 +29,62 @@ def test_image_str() -> None:
 
     diff = ImageChops.difference(img, img2)
     assert diff.getbbox() is None, "Difference image is not empty!"
+
+
+def test_raw_depth() -> None:
+
+    depth = np.random.randint(0, 65536, (12, 16), dtype=np.uint16)
+
+    data = depth_to_bytes(depth)
+    assert len(data) == depth.size * 2
+    assert data[:2] == int(depth[0, 0]).to_bytes(2, "little")
+
+    shape = shape_from_str(shape_to_str(depth.shape))
+    assert shape == (12, 16)
+    assert np.array_equal(depth_from_bytes(data, shape), depth)
+
+    with pytest.raises(ImageException):
+        depth_from_bytes(data, (16, 16))
+
+    with pytest.raises(ImageException):
+        shape_from_str("12")
+
+
+def test_region() -> None:
+
+    arr = np.arange(48 * 64, dtype=np.uint16).reshape(48, 64)
+    roi = Roi(10, 20, 16, 8)
+
+    assert roi_from_str(roi_to_str(roi)) == roi
+    assert np.array_equal(region(arr, roi), arr[20:28, 10:26])
+    assert region(arr, roi, 0.5).shape == (4, 8)
+    assert region(arr, Roi(60, 40, 10, 10)).shape == (8, 4)  # clipped
+
+    img = image_region(Image.fromarray(arr), roi, 0.5)
+    assert img.size == (8, 4)
+    assert np.all(np.isin(np.array(img), arr))  # no interpolated values
+
+    with pytest.raises(ImageException):
+        region(arr, Roi(64, 0, 10, 10))
+
+    with pytest.raises(ImageException):
+        region(arr, scale=0)
+
+
+def test_region_camera_parameters() -> None:
+
+    params = CameraParameters(500, 510, 319.5, 239.5, [0, 0, 0, 0])
+    point = np.array([0.1, -0.05, 1.0])
+
+    def project(p: CameraParameters) -> np.ndarray:
+        return (p.as_camera_matrix() @ point)[:2] / point[2]
+
+    roi = Roi(100, 50, 320, 240)
+    scale = 0.5
+
+    full = project(params)
+    # pixel center of the full-resolution image expressed in the cropped and downscaled image
+    expected = (full - (roi.x, roi.y) + 0.5) * scale - 0.5
+
+    assert np.allclose(project(params.for_region(roi, scale)), expected)
+    assert params.for_region() == params
@@ -0,0 +1,111 @@
+import io
+import os
+import zipfile
+from typing import Dict, List, Optional
+
+import pytest
+
+from arcor2 import rest, urdf
+
+URDF_TEMPLATE = """<?xml version="1.0"?>
+<robot name="{name}">
+  <link name="base_link">
+    <visual>
+      <geometry>
+        <box size="0.1 0.1 0.1"/>
+      </geometry>
+    </visual>
+  </link>
+</robot>
+"""
+
+
+def package(name: str, padding: int = 0) -> bytes:
+
+    buff = io.BytesIO()
+    with zipfile.ZipFile(buff, "w") as zf:
+        zf.writestr("robot.urdf", URDF_TEMPLATE.format(name=name))
+        if padding:
+            zf.writestr("meshes/padding.bin", os.urandom(padding))
+    return buff.getvalue()
+
+
+class Server:
+    """Serves packages the way the Project service does (with ETag)."""
+
+    def __init__(self) -> None:
+
+        self.packages: Dict[str, bytes] = {}
+        self.downloads: List[str] = []
+
+    def get_raw(self, url: str, params=None, timeout=None, headers: Optional[Dict[str, str]] = None):
+
+        data = self.packages[url]
+        etag = str(hash(data))
+
+        if headers and headers.get("If-None-Match") == etag:
+            return rest.RawResponse(b"", {"ETag": etag}, 304)
+
+        self.downloads.append(url)
+        return rest.RawResponse(data, {"ETag": etag}, 200)
+
+
+@pytest.fixture()
+def server(monkeypatch) -> Server:
+
+    srv = Server()
+    monkeypatch.setattr(rest, "get_raw", srv.get_raw)
+    return srv
+
+
+def test_cache(server: Server, tmp_path) -> None:
+
+    cache = urdf.UrdfCache(str(tmp_path), models=1)
+
+    server.packages["a"] = package("robot_a")
+    server.packages["b"] = package("robot_a")  # the same package under a different url
+
+    model = cache.get("a")
+    assert model.name == "robot_a"
+    assert cache.get("a") is model
+    assert server.downloads == ["a"]  # not modified, so it is not downloaded again
+
+    assert cache.get("b") is model
+    assert len(os.listdir(tmp_path)) == 1
+
+    server.packages["a"] = package("robot_a2")
+    assert cache.get("a").name == "robot_a2"
+    assert server.downloads == ["a", "b", "a"]
+
+    # the model is evicted from memory but it is still extracted on disk
+    assert cache.get("b") is not model
+    assert cache.get("b").name == "robot_a"
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_cache_size_limit(server: Server, tmp_path) -> None:
+
+    cache = urdf.UrdfCache(str(tmp_path), size=150 * 1024)
+
+    for name in ("a", "b", "c"):
+        server.packages[name] = package(name, 100 * 1024)
+        assert cache.get(name).name == name
+        assert len(os.listdir(tmp_path)) == 1
+
+    # the model is still in memory, even though the package is not on disk anymore
+    assert cache.get("a").name == "a"
+
+    cache.clear()
+    assert cache.get("a").name == "a"
+    assert server.downloads == ["a", "b", "c", "a"]
+
+
+def test_invalid_package(server: Server, tmp_path) -> None:
+
+    cache = urdf.UrdfCache(str(tmp_path))
+    server.packages["a"] = b"not a zip"
+
+    with pytest.raises(urdf.Arcor2UrdfException):
+        cache.get("a")
+
+    assert not os.listdir(tmp_path)
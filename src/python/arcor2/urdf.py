@@ -1,13 +1,22 @@
+import hashlib
 import io
 import os
+import shutil
 import tempfile
+import threading
 import zipfile
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 
 from urdfpy import URDF
 
-from arcor2 import rest
+from arcor2 import env, rest
 from arcor2.exceptions import Arcor2Exception
 
+URDF_CACHE_PATH = os.getenv("ARCOR2_URDF_CACHE_PATH", os.path.join(tempfile.gettempdir(), "arcor2_urdf_cache"))
+URDF_CACHE_SIZE = env.get_int("ARCOR2_URDF_CACHE_SIZE", 256)  # MB of extracted packages on disk
+URDF_CACHE_MODELS = env.get_int("ARCOR2_URDF_CACHE_MODELS", 4)  # parsed models kept in memory
+
 
 class Arcor2UrdfException(Arcor2Exception):
     pass
@@ -40,13 +49,147 @@ def urdf_from_path(path_to_urdf: str) -> URDF:
         raise Arcor2UrdfException(str(e)) from e
 
 
-def urdf_from_url(url_of_zipped_package: str) -> URDF:
+def _dir_size(path: str) -> int:
+
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+class UrdfCache:
+    """Process-wide cache of parsed URDF models.
+
+    Packages are identified by a hash of their content. When the server
+    provides ETag, unchanged packages are not downloaded again. Extracted
+    packages are kept on disk (so they don't have to be extracted again
+    e.g. by another process), the least recently used ones are removed
+    when the store exceeds its size limit.
+
+    Models are shared, so they must not be modified.
+    """
+
+    def __init__(
+        self, path: str = URDF_CACHE_PATH, size: int = URDF_CACHE_SIZE * 1024 * 1024, models: int = URDF_CACHE_MODELS
+    ) -> None:
+
+        self._path = path
+        self._size = size
+        self._models_limit = models
+
+        self._etags: Dict[str, Tuple[str, str]] = {}  # url -> (etag, hash)
+        self._models: "OrderedDict[str, URDF]" = OrderedDict()  # hash -> model
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> URDF:
+
+        with self._lock:
+
+            digest, data = self._download(url)
+
+            try:
+                self._models.move_to_end(digest)
+                return self._models[digest]
+            except KeyError:
+                pass
+
+            path = os.path.join(self._path, digest)
+
+            if os.path.isdir(path):
+                os.utime(path)
+            else:
+                if data is None:  # the package was not downloaded (not modified), but it was removed from the store
+                    del self._etags[url]
+                    digest, data = self._download(url)
+                    path = os.path.join(self._path, digest)
+                assert data is not None
+                self._extract(data, path)
+
+            try:
+                model = urdf_from_path(path)
+            except Arcor2UrdfException:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+
+            self._models[digest] = model
+
+            while len(self._models) > self._models_limit:
+                self._models.popitem(last=False)
+
+            self._prune(path)
+
+            return model
+
+    def clear(self) -> None:
 
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        path_to_zip = os.path.join(tmp_dir, "urdf.zip")
-        rest.download(url_of_zipped_package, path_to_zip)
+        with self._lock:
+            self._etags.clear()
+            self._models.clear()
+
+    def _download(self, url: str) -> Tuple[str, Optional[bytes]]:
+        """Returns hash of the package and its content (None if it was not
+        modified)."""
+
+        known = self._etags.get(url)
+
+        resp = rest.get_raw(url, headers={"If-None-Match": known[0]} if known else None)
+
+        if known and resp.status_code == 304:
+            return known[1], None
+
+        digest = hashlib.sha256(resp.content).hexdigest()
+
+        etag = resp.headers.get("ETag")
+
+        if etag:
+            self._etags[url] = (etag, digest)
+        else:
+            self._etags.pop(url, None)
+
+        return digest, resp.content
+
+    def _extract(self, data: bytes, path: str) -> None:
+
+        os.makedirs(self._path, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self._path, prefix=".")
+
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as zip_ref:
+                zip_ref.extractall(tmp_dir)
+            os.rename(tmp_dir, path)  # the package appears at once, even for other processes
+        except zipfile.BadZipFile as e:
+            raise Arcor2UrdfException("Invalid package.") from e
+        except OSError:
+            if not os.path.isdir(path):  # otherwise, it was extracted by another process in the meantime
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _prune(self, keep: str) -> None:
+        """Removes the least recently used packages from the store."""
+
+        dirs = [entry for entry in os.scandir(self._path) if entry.is_dir() and not entry.name.startswith(".")]
+        sizes = {entry.path: _dir_size(entry.path) for entry in dirs}
+        total = sum(sizes.values())
+
+        for entry in sorted(dirs, key=lambda e: e.stat().st_mtime):
+
+            if total <= self._size:
+                break
+
+            if entry.path == keep:
+                continue
+
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= sizes[entry.path]
+
+
+_cache = UrdfCache()
+
+
+def urdf_from_url(url_of_zipped_package: str) -> URDF:
+    """Returns model from the (zipped) package. Models are cached, so they
+    must not be modified.
 
-        with zipfile.ZipFile(path_to_zip, "r") as zip_ref:
-            zip_ref.extractall(tmp_dir)
+    :param url_of_zipped_package:
+    :return:
+    """
 
-        return urdf_from_path(tmp_dir)
+    return _cache.get(url_of_zipped_package)
@@ -9,7 +9,7 @@ from aiologger.levels import LogLevel
 from dataclasses_jsonschema import ValidationError
 from websockets.server import WebSocketServerProtocol as WsClient
 
-from arcor2 import env
+from arcor2 import blobs, env
 from arcor2.data.events import Event
 from arcor2.data.rpc.common import RPC
 from arcor2.exceptions import Arcor2Exception
@@ -27,6 +27,9 @@ EventT = TypeVar("EventT", bound=Event)
 EVENT_DICT_TYPE = Dict[str, Tuple[Type[EventT], Callable[[EventT, WsClient], Coroutine[Any, Any, None]]]]
 
 
+_RECEIVED_BLOBS: Dict[WsClient, blobs.BlobStore] = {}
+
+
 async def send_json_to_client(client: WsClient, data: str) -> None:
 
     try:
@@ -35,6 +38,34 @@ async def send_json_to_client(client: WsClient, data: str) -> None:
         pass
 
 
+async def send_blob_to_client(client: WsClient, blob_id: str, data: bytes) -> None:
+
+    try:
+        await client.send(blobs.frame(blob_id, data))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+def received_blob(client: WsClient, value: str) -> Optional[bytes]:
+    """Returns (and forgets) data of a blob previously sent by the client, if
+    the value is a reference to it.
+
+    :param client:
+    :param value: Possibly a blob reference.
+    :return: None if the value is not a reference.
+    """
+
+    blob_id = blobs.ref_id(value)
+
+    if blob_id is None:
+        return None
+
+    try:
+        return _RECEIVED_BLOBS[client].pop(blob_id)
+    except KeyError:
+        raise blobs.BlobException("Unknown blob.")
+
+
 async def server(
     client: Any,
     path: str,
@@ -170,11 +201,22 @@ async def server(
         await register(client)
 
         loop = asyncio.get_event_loop()
+        received_blobs = _RECEIVED_BLOBS[client] = blobs.BlobStore()
 
         async for message in client:
+
+            if isinstance(message, bytes):
+                # stored immediately, so it is available before the message referencing it is handled
+                try:
+                    received_blobs.put(*blobs.parse_frame(message))
+                except blobs.BlobException as e:
+                    logger.error(f"Invalid binary message: {e}")
+                continue
+
             loop.create_task(handle_message(message))
 
     except websockets.exceptions.ConnectionClosed:
         pass
     finally:
+        _RECEIVED_BLOBS.pop(client, None)
         await unregister(client)
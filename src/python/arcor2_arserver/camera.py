@@ -1,4 +1,10 @@
+import asyncio
+from typing import List, Optional
+
+from PIL import Image
+
 from arcor2.exceptions import Arcor2Exception
+from arcor2.helpers import run_in_executor
 from arcor2.object_types.abstract import Camera
 from arcor2_arserver.scene import get_instance
 
@@ -11,3 +17,45 @@ def get_camera_instance(obj_id: str) -> Camera:
         raise Arcor2Exception("Not a camera.")
 
     return obj
+
+
+async def color_images(
+    camera: Camera, count: int, interval: float, max_attempts: Optional[int] = None
+) -> List[Image.Image]:
+    """Grabs distinct color images.
+
+    Cameras might return the latest buffered frame, so images are grabbed at least
+    `interval` seconds apart and an image identical to the previous one (the same capture) is skipped.
+
+    :param camera: Camera instance.
+    :param count: Required number of images.
+    :param interval: Minimal time between grabs (seconds), e.g. the frame period of the camera.
+    :param max_attempts: Grabbing stops after this number of attempts (defaults to 3 * count), so a static
+        image source returns fewer images.
+    :return: At least one image.
+    """
+
+    if max_attempts is None:
+        max_attempts = 3 * count
+
+    images: List[Image.Image] = []
+    last: Optional[bytes] = None
+
+    for attempt in range(max(max_attempts, 1)):
+
+        if attempt:
+            await asyncio.sleep(interval)
+
+        image = await run_in_executor(camera.color_image)
+        data = image.tobytes()
+
+        if data == last:
+            continue
+
+        images.append(image)
+        last = data
+
+        if len(images) >= count:
+            break
+
+    return images
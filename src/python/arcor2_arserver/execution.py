@@ -8,6 +8,7 @@ from typing import TYPE_CHECKING, Dict, Optional
 import websockets
 from websockets.server import WebSocketServerProtocol as WsClient
 
+from arcor2 import env
 from arcor2 import helpers as hlp
 from arcor2 import rest
 from arcor2.data import common, rpc
@@ -29,6 +30,8 @@ else:
     ReqQueue = asyncio.Queue
     RespQueue = asyncio.Queue
 
+UPLOAD_CHUNK_SIZE = max(env.get_int("ARCOR2_ARSERVER_UPLOAD_CHUNK_SIZE", 1024 * 1024), 1)
+
 MANAGER_RPC_REQUEST_QUEUE: ReqQueue = ReqQueue()
 MANAGER_RPC_RESPONSES: Dict[int, RespQueue] = {}
 
@@ -95,18 +98,30 @@ async def build_and_upload_package(project_id: str, package_name: str) -> str:
             {"packageName": package_name},
         )
 
+        size = os.path.getsize(path)
+
+        # send data to execution service, chunk by chunk
         with open(path, "rb") as zip_file:
-            b64_bytes = base64.b64encode(zip_file.read())
-            b64_str = b64_bytes.decode()
 
-    # send data to execution service
-    exe_req = erpc.UploadPackage.Request(uuid.uuid4().int, args=erpc.UploadPackage.Request.Args(package_id, b64_str))
-    exe_resp = await manager_request(exe_req)
+            offset = 0
 
-    if not exe_resp.result:
-        if not exe_resp.messages:
-            raise Arcor2Exception("Upload to the Execution unit failed.")
-        raise Arcor2Exception("\n".join(exe_resp.messages))
+            while True:
+
+                chunk = await hlp.run_in_executor(zip_file.read, UPLOAD_CHUNK_SIZE)
+                last = offset + len(chunk) >= size
+
+                args = erpc.UploadPackageChunk.Request.Args(package_id, offset, base64.b64encode(chunk).decode(), last)
+                exe_resp = await manager_request(erpc.UploadPackageChunk.Request(uuid.uuid4().int, args=args))
+
+                if not exe_resp.result:
+                    if not exe_resp.messages:
+                        raise Arcor2Exception("Upload to the Execution unit failed.")
+                    raise Arcor2Exception("\n".join(exe_resp.messages))
+
+                if last:
+                    break
+
+                offset += len(chunk)
 
     return package_id
 
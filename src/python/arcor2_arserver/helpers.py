@@ -1,9 +1,12 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Iterable, List, Set, Union
 
+from PIL.Image import Image
 from websockets.server import WebSocketServerProtocol as WsClient
 
+from arcor2 import blobs, ws_server
 from arcor2.exceptions import Arcor2Exception
+from arcor2.image import image_from_bytes, image_from_str, image_to_bytes, image_to_str
 from arcor2_arserver import globals as glob
 from arcor2_arserver.decorators import retry
 from arcor2_arserver.lock.exceptions import CannotLock, LockingException
@@ -18,6 +21,35 @@ def unique_name(name: str, existing_names: Set[str]) -> None:
         raise Arcor2Exception("Name already exists.")
 
 
+def image_from_arg(ui: WsClient, value: str) -> Image:
+    """Image sent by the UI - either as a blob or embedded in the JSON.
+
+    :param ui:
+    :param value: Blob reference or image encoded as string.
+    :return:
+    """
+
+    data = ws_server.received_blob(ui, value)
+    return image_from_str(value) if data is None else image_from_bytes(data)
+
+
+async def image_to_arg(ui: WsClient, image: Image) -> str:
+    """Sends the image as a blob to UIs that support it, otherwise encodes it
+    as string.
+
+    :param ui:
+    :param image:
+    :return: Value for a message.
+    """
+
+    if not blobs.enabled(ui.path):
+        return image_to_str(image)
+
+    blob_id = blobs.new_id()
+    await ws_server.send_blob_to_client(ui, blob_id, image_to_bytes(image))
+    return blobs.ref(blob_id)
+
+
 def make_name_unique(orig_name: str, names: Set[str]) -> str:
 
     cnt = 1
@@ -1,20 +1,75 @@
 import asyncio
-from typing import Optional
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Union
 
 from websockets.server import WebSocketServerProtocol
 
-from arcor2 import ws_server
+from arcor2 import blobs, ws_server
 from arcor2.data import events
 from arcor2_arserver import globals as glob
 
 
-async def broadcast_event(event: events.Event, exclude_ui: Optional[WebSocketServerProtocol] = None) -> None:
+class BlobEvent(NamedTuple):
+    """Variant of an event for interfaces supporting blobs."""
+
+    event: events.Event
+    blobs: Dict[str, bytes]
+
+
+EventFactory = Callable[[], events.Event]
+BlobEventFactory = Callable[[], Optional[BlobEvent]]
+
+
+async def _send_blob_event(interface: WebSocketServerProtocol, blob_event: BlobEvent, message: str) -> None:
+
+    for blob_id, data in blob_event.blobs.items():
+        await ws_server.send_blob_to_client(interface, blob_id, data)
+
+    await ws_server.send_json_to_client(interface, message)
+
+
+async def broadcast_event(
+    event: Union[events.Event, EventFactory],
+    exclude_ui: Optional[WebSocketServerProtocol] = None,
+    blob_event: Optional[BlobEventFactory] = None,
+) -> None:
+    """Sends event to all interfaces.
+
+    Both variants of the event could be given as factories - each one is then
+    built (at most once) only if there is an interface that needs it.
+
+    :param event: Event (or its factory).
+    :param exclude_ui:
+    :param blob_event: Factory of a variant sent instead of the event to interfaces supporting blobs.
+        If it returns None, the event is sent to them as well.
+    :return:
+    """
 
     if (exclude_ui is None and glob.USERS.interfaces) or (exclude_ui and len(glob.USERS.interfaces) > 1):
-        message = event.to_json()
-        await asyncio.gather(
-            *[ws_server.send_json_to_client(intf, message) for intf in glob.USERS.interfaces if intf != exclude_ui]
-        )
+
+        interfaces = [intf for intf in glob.USERS.interfaces if intf != exclude_ui]
+
+        blob_interfaces = []
+        if blob_event is not None:
+            blob_interfaces = [intf for intf in interfaces if blobs.enabled(intf.path)]
+
+        blob_evt = blob_event() if blob_event is not None and blob_interfaces else None
+
+        if blob_evt is None:
+            json_interfaces = interfaces
+        else:
+            json_interfaces = [intf for intf in interfaces if intf not in blob_interfaces]
+
+        coros: List[Awaitable[None]] = []
+
+        if json_interfaces:
+            message = event.to_json() if isinstance(event, events.Event) else event().to_json()
+            coros.extend(ws_server.send_json_to_client(intf, message) for intf in json_interfaces)
+
+        if blob_evt is not None:
+            blob_message = blob_evt.event.to_json()
+            coros.extend(_send_blob_event(intf, blob_evt, blob_message) for intf in blob_interfaces)
+
+        await asyncio.gather(*coros)
 
 
 async def event(interface: WebSocketServerProtocol, event: events.Event) -> None:
@@ -1,8 +1,9 @@
 import asyncio
-from typing import Any, AsyncIterator, Callable, Dict, List, Set, Union
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Union
 
 from arcor2 import helpers as hlp
-from arcor2.action import results_to_json
+from arcor2.action import results_to_json, results_to_json_with_blobs
 from arcor2.cached import CachedProject, CachedScene, UpdateableCachedProject
 from arcor2.data import common
 from arcor2.exceptions import Arcor2Exception
@@ -45,34 +46,60 @@ async def close_project() -> None:
     asyncio.ensure_future(notify_project_closed(project_id))
 
 
+def _action_result(action_id: str, action_result: Any) -> ActionResult:
+
+    evt = ActionResult(ActionResult.Data(action_id))
+
+    try:
+        evt.data.results = results_to_json(action_result)
+    except Arcor2Exception:
+        glob.logger.error(f"Action {action_id} returned unsupported type of result: {action_result}.")
+
+    return evt
+
+
+def _blob_action_result(action_id: str, action_result: Any) -> Optional[notif.BlobEvent]:
+
+    try:
+        blob_results, blob_data = results_to_json_with_blobs(action_result)
+    except Arcor2Exception:
+        return None  # the plain variant is sent (and the error logged) instead
+
+    if not blob_data:
+        return None
+
+    return notif.BlobEvent(ActionResult(ActionResult.Data(action_id, blob_results)), blob_data)
+
+
 async def execute_action(action_method: Callable, params: List[Any]) -> None:
 
     assert glob.RUNNING_ACTION
 
-    await notif.broadcast_event(ActionExecution(ActionExecution.Data(glob.RUNNING_ACTION)))
+    action_id = glob.RUNNING_ACTION
+    await notif.broadcast_event(ActionExecution(ActionExecution.Data(action_id)))
 
-    evt = ActionResult(ActionResult.Data(glob.RUNNING_ACTION))
+    evt: Union[ActionResult, notif.EventFactory]
+    blob_event: Optional[notif.BlobEventFactory] = None
 
     try:
         action_result = await hlp.run_in_executor(action_method, *params)
     except (Arcor2Exception, AttributeError, TypeError) as e:
         glob.logger.error(f"Failed to run method {action_method.__name__} with params {params}. {str(e)}")
         glob.logger.debug(str(e), exc_info=True)
-        evt.data.error = str(e)
+        evt = ActionResult(ActionResult.Data(action_id, error=str(e)))
     else:
         if action_result is not None:
-            glob.PREV_RESULTS[glob.RUNNING_ACTION] = action_result
+            glob.PREV_RESULTS[action_id] = action_result
 
-        try:
-            evt.data.results = results_to_json(action_result)
-        except Arcor2Exception:
-            glob.logger.error(f"Method {action_method.__name__} returned unsupported type of result: {action_result}.")
+        # results are encoded only into formats that connected interfaces actually need
+        evt = partial(_action_result, action_id, action_result)
+        blob_event = partial(_blob_action_result, action_id, action_result)
 
     if glob.RUNNING_ACTION is None:
         # action was cancelled, do not send any event
         return  # type: ignore  # action could be cancelled during its execution
 
-    await notif.broadcast_event(evt)
+    await notif.broadcast_event(evt, blob_event=blob_event)
     glob.RUNNING_ACTION = None
     glob.RUNNING_ACTION_PARAMS = None
 
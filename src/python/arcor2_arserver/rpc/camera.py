@@ -3,15 +3,15 @@ import asyncio
 from arcor2_calibration_data import client as calib_client
 from websockets.server import WebSocketServerProtocol as WsClient
 
+from arcor2 import env
 from arcor2.cached import UpdateableCachedScene
 from arcor2.exceptions import Arcor2Exception
 from arcor2.helpers import run_in_executor
-from arcor2.image import image_to_str
 from arcor2.object_types.abstract import Camera
 from arcor2_arserver import globals as glob
 from arcor2_arserver import notifications as notif
-from arcor2_arserver.camera import get_camera_instance
-from arcor2_arserver.helpers import ensure_locked
+from arcor2_arserver.camera import color_images, get_camera_instance
+from arcor2_arserver.helpers import ensure_locked, image_to_arg
 from arcor2_arserver.scene import ensure_scene_started, update_scene_object_pose
 from arcor2_arserver_data.events.common import ProcessState
 from arcor2_arserver_data.rpc.camera import CalibrateCamera, CameraColorImage, CameraColorParameters
@@ -26,7 +26,7 @@ async def camera_color_image_cb(req: CameraColorImage.Request, ui: WsClient) ->
     ensure_scene_started()
     camera = get_camera_instance(req.args.id)
     resp = CameraColorImage.Response()
-    resp.data = image_to_str(camera.color_image())
+    resp.data = await image_to_arg(ui, camera.color_image())
     return resp
 
 
@@ -46,6 +46,8 @@ async def camera_color_parameters_cb(
 
 
 CAMERA_CALIB = "CameraCalibration"
+CAMERA_CALIB_FRAMES = max(env.get_int("ARCOR2_ARSERVER_CAMERA_CALIBRATION_FRAMES", 5), 1)
+CAMERA_CALIB_INTERVAL = env.get_float("ARCOR2_ARSERVER_CAMERA_CALIBRATION_INTERVAL", 0.1)  # seconds between frames
 
 
 async def calibrate_camera(scene: UpdateableCachedScene, camera: Camera) -> None:
@@ -54,8 +56,10 @@ async def calibrate_camera(scene: UpdateableCachedScene, camera: Camera) -> None
 
     await notif.broadcast_event(ProcessState(ProcessState.Data(CAMERA_CALIB, ProcessState.Data.StateEnum.Started)))
     try:
-        img = await run_in_executor(camera.color_image)
-        estimated_pose = await run_in_executor(calib_client.estimate_camera_pose, camera.color_camera_params, img)
+        images = await color_images(camera, CAMERA_CALIB_FRAMES, CAMERA_CALIB_INTERVAL)
+        estimated_pose = await run_in_executor(
+            calib_client.estimate_camera_pose_batch, camera.color_camera_params, images
+        )
     except Arcor2Exception as e:
         await notif.broadcast_event(
             ProcessState(ProcessState.Data(CAMERA_CALIB, ProcessState.Data.StateEnum.Failed, str(e)))
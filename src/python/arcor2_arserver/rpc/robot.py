@@ -414,7 +414,7 @@ async def calibrate_robot(robot_inst: Robot, camera_inst: Camera, move_to_calibr
             if move_to_calibration_pose:
                 await run_in_executor(robot_inst.move_to_calibration_pose)
             robot_joints = await run_in_executor(robot_inst.robot_joints)
-            depth_image = await run_in_executor(camera_inst.depth_image, 128)
+            depth_image = await run_in_executor(camera_inst.depth_array, 128)
 
             args = CalibrateRobotArgs(
                 robot_joints,
@@ -14,11 +14,17 @@ from arcor2.clients import aio_scene_service as scene_srv
 from arcor2.data import common, object_type
 from arcor2.data.events import Event, PackageState
 from arcor2.exceptions import Arcor2Exception
-from arcor2.image import image_from_str
 from arcor2_arserver import globals as glob
 from arcor2_arserver import notifications as notif
 from arcor2_arserver.clients import persistent_storage as storage
-from arcor2_arserver.helpers import ctx_read_lock, ctx_write_lock, ensure_locked, get_unlocked_objects, unique_name
+from arcor2_arserver.helpers import (
+    ctx_read_lock,
+    ctx_write_lock,
+    ensure_locked,
+    get_unlocked_objects,
+    image_from_arg,
+    unique_name,
+)
 from arcor2_arserver.lock.exceptions import LockingException
 from arcor2_arserver.objects_actions import get_object_types, get_robot_instance
 from arcor2_arserver.project import (
@@ -560,7 +566,7 @@ async def calibration_cb(req: srpc.c.GetCameraPose.Request, ui: WsClient) -> srp
         data=await hlp.run_in_executor(
             calibration.estimate_camera_pose,
             req.args.camera_parameters,
-            image_from_str(req.args.image),
+            image_from_arg(ui, req.args.image),
             req.args.inverse,
         )
     )
@@ -572,7 +578,7 @@ async def marker_corners_cb(req: srpc.c.MarkersCorners.Request, ui: WsClient) ->
     # TODO should be rather returned in an event (it is possibly a long-running process)
     return srpc.c.MarkersCorners.Response(
         data=await hlp.run_in_executor(
-            calibration.markers_corners, req.args.camera_parameters, image_from_str(req.args.image)
+            calibration.markers_corners, req.args.camera_parameters, image_from_arg(ui, req.args.image)
         )
     )
 
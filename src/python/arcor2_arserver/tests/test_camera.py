@@ -0,0 +1,64 @@
+import time
+from typing import List, Optional
+
+import pytest
+from PIL import Image
+
+from arcor2.data.common import Pose
+from arcor2.object_types.abstract import Camera
+
+FRAME_PERIOD = 0.05
+
+
+class BufferedCamera(Camera):
+    """Returns the latest frame of a camera capturing at 1 / FRAME_PERIOD
+    fps."""
+
+    def __init__(self) -> None:
+        super().__init__("id", "camera", Pose())
+        self.start = time.monotonic()
+        self.grabs = 0
+
+    def color_image(self, *, an: Optional[str] = None) -> Image.Image:
+        self.grabs += 1
+        capture = int((time.monotonic() - self.start) / FRAME_PERIOD)
+        return Image.new("L", (4, 4), capture % 256)
+
+
+def captures(images: List[Image.Image]) -> List[int]:
+    return [img.getpixel((0, 0)) for img in images]
+
+
+@pytest.mark.asyncio()
+async def test_color_images(monkeypatch) -> None:
+
+    monkeypatch.setenv("ARCOR2_DATA_PATH", "/tmp")
+
+    from arcor2_arserver.camera import color_images
+
+    camera = BufferedCamera()
+    images = await color_images(camera, 5, FRAME_PERIOD / 2)
+
+    # all images come from different captures
+    assert len(images) == 5
+    assert len(set(captures(images))) == 5
+    assert captures(images) == sorted(captures(images))
+
+
+@pytest.mark.asyncio()
+async def test_color_images_static(monkeypatch) -> None:
+
+    monkeypatch.setenv("ARCOR2_DATA_PATH", "/tmp")
+
+    from arcor2_arserver.camera import color_images
+
+    class StaticCamera(BufferedCamera):
+        def color_image(self, *, an: Optional[str] = None) -> Image.Image:
+            self.grabs += 1
+            return Image.new("L", (4, 4))
+
+    camera = StaticCamera()
+
+    # the same image over and over, grabbing does not go on forever
+    assert len(await color_images(camera, 5, 0)) == 1
+    assert camera.grabs == 15
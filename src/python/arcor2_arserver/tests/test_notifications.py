@@ -0,0 +1,113 @@
+from typing import List, Optional, Union
+
+import pytest
+
+from arcor2.data.events import Event
+from arcor2_arserver import globals as glob
+from arcor2_arserver import notifications as notif
+from arcor2_arserver.user import Users
+from arcor2_arserver_data.events.actions import ActionResult
+
+
+class Interface:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.sent: List[Union[str, bytes]] = []
+
+    async def send(self, data: Union[str, bytes]) -> None:
+        self.sent.append(data)
+
+
+class Factory:
+    """Counts how many times the event was built."""
+
+    def __init__(self, event: Optional[Event] = None, blobs: bool = False) -> None:
+        self.event = event
+        self.blobs = blobs
+        self.calls = 0
+
+    def __call__(self) -> Event:
+        self.calls += 1
+        assert self.event
+        return self.event
+
+    def blob_event(self) -> Optional[notif.BlobEvent]:
+        self.calls += 1
+        if not self.blobs:
+            return None
+        return notif.BlobEvent(ActionResult(ActionResult.Data("action", ['"blob:' + "0" * 32 + '"'])), {"0" * 32: b"x"})
+
+
+@pytest.fixture()
+def interfaces(monkeypatch) -> List[Interface]:
+
+    users = Users()
+    monkeypatch.setattr(glob, "USERS", users)
+
+    ret = [Interface("/"), Interface("/?blobs=true")]
+    for intf in ret:
+        users.add_interface(intf)  # type: ignore[arg-type]
+    return ret
+
+
+@pytest.mark.asyncio()
+async def test_json_only(interfaces: List[Interface]) -> None:
+
+    json_intf, blob_intf = interfaces
+    glob.USERS.interfaces.remove(blob_intf)  # type: ignore[arg-type]
+
+    event = Factory(ActionResult(ActionResult.Data("action")))
+    blob = Factory()
+
+    await notif.broadcast_event(event, blob_event=blob.blob_event)
+
+    assert event.calls == 1
+    assert blob.calls == 0  # nobody asked for blobs
+    assert len(json_intf.sent) == 1
+
+
+@pytest.mark.asyncio()
+async def test_blobs_only(interfaces: List[Interface]) -> None:
+
+    json_intf, blob_intf = interfaces
+    glob.USERS.interfaces.remove(json_intf)  # type: ignore[arg-type]
+
+    event = Factory(ActionResult(ActionResult.Data("action")))
+    blob = Factory(blobs=True)
+
+    await notif.broadcast_event(event, blob_event=blob.blob_event)
+
+    assert event.calls == 0  # nobody needs the plain variant
+    assert blob.calls == 1
+    assert blob_intf.sent[0] == b"0" * 32 + b"x"
+    assert isinstance(blob_intf.sent[1], str)
+
+
+@pytest.mark.asyncio()
+async def test_both(interfaces: List[Interface]) -> None:
+
+    json_intf, blob_intf = interfaces
+
+    event = Factory(ActionResult(ActionResult.Data("action")))
+    blob = Factory(blobs=True)
+
+    await notif.broadcast_event(event, blob_event=blob.blob_event)
+
+    assert event.calls == 1
+    assert blob.calls == 1
+    assert len(json_intf.sent) == 1
+    assert len(blob_intf.sent) == 2
+
+
+@pytest.mark.asyncio()
+async def test_no_blobs_in_results(interfaces: List[Interface]) -> None:
+
+    json_intf, blob_intf = interfaces
+
+    event = Factory(ActionResult(ActionResult.Data("action")))
+    blob = Factory(blobs=False)
+
+    await notif.broadcast_event(event, blob_event=blob.blob_event)
+
+    assert event.calls == 1
+    assert json_intf.sent == blob_intf.sent
@@ -1,12 +1,12 @@
 import time
 import uuid
 from queue import Empty, Queue
-from typing import Dict, Optional, Type, TypeVar
+from typing import Any, Dict, Optional, Type, TypeVar
 
 import websocket
 from dataclasses_jsonschema import ValidationError
 
-from arcor2 import json
+from arcor2 import blobs, json
 from arcor2.data import events, rpc
 from arcor2.exceptions import Arcor2Exception
 from arcor2.logging import get_logger
@@ -37,6 +37,7 @@ class ARServer:
         ws_connection_str: str = "ws://0.0.0.0:6789",
         timeout: float = 3.0,
         event_mapping: Optional[Dict[str, Type[events.Event]]] = None,
+        use_blobs: bool = False,
     ):
 
         self._ws = websocket.WebSocket()
@@ -46,6 +47,10 @@ class ARServer:
             event_mapping = {}
 
         self.event_mapping = event_mapping
+        self._blobs = blobs.BlobStore()
+
+        if use_blobs:
+            ws_connection_str = f"{ws_connection_str.rstrip('/')}/?{blobs.QUERY_PARAM}=true"
 
         start_time = time.monotonic()
         while time.monotonic() < start_time + timeout:
@@ -69,6 +74,45 @@ class ARServer:
 
         self._supported_rpcs = system_info.supported_rpc_requests
 
+    def _recv(self) -> Any:
+        """Receives next JSON message, blobs are stored on the way."""
+
+        while True:
+
+            message = self._ws.recv()
+
+            if isinstance(message, bytes):
+                self._blobs.put(*blobs.parse_frame(message))
+                continue
+
+            return json.loads(message)
+
+    def send_blob(self, data: bytes) -> str:
+        """Sends data that will be referenced from the next message (requires
+        use_blobs).
+
+        :param data:
+        :return: Reference to be used in the message.
+        """
+
+        blob_id = blobs.new_id()
+        self._ws.send_binary(blobs.frame(blob_id, data))
+        return blobs.ref(blob_id)
+
+    def blob(self, value: str) -> bytes:
+        """Returns data of a received blob.
+
+        :param value: Reference from a message.
+        :return:
+        """
+
+        blob_id = blobs.ref_id(value)
+
+        if blob_id is None:
+            raise ARServerClientException("Not a blob reference.")
+
+        return self._blobs.pop(blob_id)
+
     def call_rpc(self, req: rpc.common.RPC.Request, resp_type: Type[RR]) -> RR:
 
         if req.request not in self._supported_rpcs:
@@ -83,7 +127,7 @@ class ARServer:
         # wait for RPC response, put any incoming event into the queue
         while True:
             try:
-                recv_dict = json.loads(self._ws.recv())
+                recv_dict = self._recv()
             except websocket.WebSocketTimeoutException:
                 raise ARServerClientException("RPC timeouted.")
 
@@ -117,7 +161,7 @@ class ARServer:
             evt = self._event_queue.get_nowait()
         except Empty:
             try:
-                recv_dict = json.loads(self._ws.recv())
+                recv_dict = self._recv()
             except websocket.WebSocketTimeoutException:
                 raise ARServerClientException("Timeouted.")
 
@@ -0,0 +1,107 @@
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+import quaternion
+
+from arcor2.data.common import Pose
+from arcor2.exceptions import Arcor2Exception
+from arcor2_calibration.quaternions import weighted_average_quaternions
+
+OUTLIER_K = 3.0  # how many (robust) standard deviations from the median an inlier might be
+MIN_POSITION_TOLERANCE = 0.005  # m, avoids rejecting everything when the estimates are (nearly) the same
+MIN_ORIENTATION_TOLERANCE = np.radians(1.0)
+
+MAD_TO_STD = 1.4826
+
+
+class PoseDeviation(NamedTuple):
+
+    position: float  # m, root mean square distance from the mean
+    orientation: float  # rad, root mean square angle from the mean
+
+
+def _quaternions(poses: Sequence[Pose]) -> np.ndarray:
+    return np.array([quaternion.as_float_array(pose.orientation.as_quaternion()) for pose in poses])
+
+
+def _positions(poses: Sequence[Pose]) -> np.ndarray:
+    return np.array([list(pose.position) for pose in poses], dtype=float)
+
+
+def _angles(quaternions: np.ndarray, ref: np.ndarray) -> np.ndarray:
+    """Angles between orientations (q and -q are the same)."""
+
+    dots = np.clip(np.abs(np.dot(quaternions, ref)), 0.0, 1.0)
+    return 2 * np.arccos(dots)
+
+
+def weighted_average_pose(poses: Sequence[Pose], weights: Sequence[float]) -> Pose:
+
+    if not poses:
+        raise Arcor2Exception("Nothing to average.")
+
+    if len(poses) != len(weights):
+        raise Arcor2Exception("Number of weights does not match number of poses.")
+
+    weights_arr = np.array(weights, dtype=float)
+
+    if not weights_arr.sum() > 0:  # e.g. all estimates are of zero quality
+        weights_arr = np.ones(len(poses))
+
+    pose = Pose()
+    pose.position.x, pose.position.y, pose.position.z = np.average(_positions(poses), axis=0, weights=weights_arr)
+    pose.orientation.set_from_quaternion(
+        quaternion.from_float_array(weighted_average_quaternions(_quaternions(poses), weights_arr))
+    )
+    return pose
+
+
+def inliers(
+    poses: Sequence[Pose],
+    k: float = OUTLIER_K,
+    min_position_tolerance: float = MIN_POSITION_TOLERANCE,
+    min_orientation_tolerance: float = MIN_ORIENTATION_TOLERANCE,
+) -> List[bool]:
+    """Marks estimates consistent with the majority.
+
+    Distances from the median position and angles from the medoid
+    orientation are compared to their median absolute deviation, so a
+    few wrong estimates (e.g. a flipped marker) can't spoil the result.
+    """
+
+    if not poses:
+        return []
+
+    positions = _positions(poses)
+    quaternions = _quaternions(poses)
+
+    dists = np.linalg.norm(positions - np.median(positions, axis=0), axis=1)
+    dist_tolerance = max(k * MAD_TO_STD * np.median(dists), min_position_tolerance)
+
+    # medoid - orientation with the smallest sum of angles to the others
+    pairwise = 2 * np.arccos(np.clip(np.abs(np.dot(quaternions, quaternions.T)), 0.0, 1.0))
+    angles = pairwise[int(np.argmin(pairwise.sum(axis=1)))]
+    angle_tolerance = max(k * MAD_TO_STD * np.median(angles), min_orientation_tolerance)
+
+    res = (dists <= dist_tolerance) & (angles <= angle_tolerance)
+
+    if not res.any():  # there is no majority
+        return [True] * len(poses)
+
+    return res.tolist()
+
+
+def deviation(poses: Sequence[Pose]) -> PoseDeviation:
+
+    if not poses:
+        raise Arcor2Exception("No poses given.")
+
+    positions = _positions(poses)
+    quaternions = _quaternions(poses)
+
+    pos_dev = np.sqrt(np.mean(np.sum((positions - positions.mean(axis=0)) ** 2, axis=1)))
+
+    mean_q = weighted_average_quaternions(quaternions, np.ones(len(poses)))
+    ori_dev = np.sqrt(np.mean(_angles(quaternions, mean_q) ** 2))
+
+    return PoseDeviation(float(pos_dev), float(ori_dev))
@@ -1,5 +1,5 @@
 import math
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
@@ -7,45 +7,166 @@ import quaternion
 from cv2 import aruco
 from PIL import Image
 
+from arcor2.data.camera import Roi
 from arcor2.data.common import Orientation, Pose, Position
 from arcor2.exceptions import Arcor2Exception
 
 aruco_dict = aruco.Dictionary_get(aruco.DICT_7X7_1000)
 
 BLUR_THRESHOLD: float = 150.0
+BLUR_STRIDE: int = 2  # blur is estimated on every n-th pixel in both directions (1 means all pixels)
 
+ROI_MARGIN: float = 0.5  # relative to the size of the markers' bounding box
 
-def detect_corners(
-    camera_matrix: List[List[float]], dist_matrix: List[float], image: Image.Image, refine: bool = False
-) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
 
-    camera_matrix_arr = np.array(camera_matrix)
-    dist_matrix_arr = np.array(dist_matrix)
+def blur_score(gray: np.ndarray, stride: int = BLUR_STRIDE) -> float:
+    """Variance of Laplacian, the lower the blurrier.
 
-    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGBA2GRAY)
+    With stride > 1, the Laplacian of the full-resolution image is
+    evaluated only on a regular subset of pixels. The result estimates
+    the same value, so BLUR_THRESHOLD applies regardless of the stride
+    (which is not the case for a downscaled image).
+    """
+
+    if stride <= 1:
+        return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    height, width = gray.shape[:2]
+
+    def sample(dy: int, dx: int) -> np.ndarray:
+        return gray[1 + dy : height - 1 + dy : stride, 1 + dx : width - 1 + dx : stride].astype(np.int32)
+
+    laplacian = sample(-1, 0) + sample(1, 0) + sample(0, -1) + sample(0, 1) - 4 * sample(0, 0)
+
+    return float(laplacian.var())
+
+
+def markers_roi(corners: Sequence[np.ndarray], width: int, height: int, margin: float = ROI_MARGIN) -> Roi:
+    """Region of the image where the markers (e.g. from a previous
+    detection) are, enlarged by the margin.
 
-    variance_of_laplacian = cv2.Laplacian(gray, cv2.CV_64F).var()
+    :param corners: Corners of markers, in pixels.
+    :param width: Width of the image.
+    :param height: Height of the image.
+    :param margin: How much the region is enlarged on each side.
+    :return:
+    """
 
-    if variance_of_laplacian < BLUR_THRESHOLD:
-        raise Arcor2Exception(f"Blur score {variance_of_laplacian:.2f} is below the threshold.")
+    if not len(corners):
+        raise Arcor2Exception("No corners given.")
+
+    points = np.concatenate([np.asarray(c, dtype=float).reshape(-1, 2) for c in corners])
+
+    (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+    dx, dy = (max_x - min_x) * margin, (max_y - min_y) * margin
+
+    x1, y1 = max(int(math.floor(min_x - dx)), 0), max(int(math.floor(min_y - dy)), 0)
+    x2, y2 = min(int(math.ceil(max_x + dx)), width), min(int(math.ceil(max_y + dy)), height)
+
+    if x2 <= x1 or y2 <= y1:
+        raise Arcor2Exception("Markers are out of the image.")
+
+    return Roi(x1, y1, x2 - x1, y2 - y1)
+
+
+def _detect(
+    gray: np.ndarray, camera_matrix: np.ndarray, dist_matrix: np.ndarray, refine: bool
+) -> Tuple[List[np.ndarray], Optional[np.ndarray]]:
 
     parameters = aruco.DetectorParameters_create()
     if refine:  # takes 3x longer
         parameters.cornerRefinementMethod = aruco.CORNER_REFINE_APRILTAG  # default is none
 
     corners, ids, _ = aruco.detectMarkers(
-        gray, aruco_dict, cameraMatrix=camera_matrix_arr, distCoeff=dist_matrix_arr, parameters=parameters
+        gray, aruco_dict, cameraMatrix=camera_matrix, distCoeff=dist_matrix, parameters=parameters
     )
 
+    return corners, ids
+
+
+def detect_corners(
+    camera_matrix: List[List[float]],
+    dist_matrix: List[float],
+    image: Image.Image,
+    refine: bool = False,
+    roi: Optional[Roi] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Detects markers in the image.
+
+    When the region of interest is given (e.g. around previously
+    detected markers), only the region is searched. The whole image is
+    searched if there is no marker in the region.
+    """
+
+    camera_matrix_arr = np.array(camera_matrix)
+    dist_matrix_arr = np.array(dist_matrix)
+
+    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGBA2GRAY)
+
+    # always on the whole image, the score of a region is not comparable to the threshold
+    score = blur_score(gray)
+
+    if score < BLUR_THRESHOLD:
+        raise Arcor2Exception(f"Blur score {score:.2f} is below the threshold.")
+
+    if roi is not None:
+
+        region = gray[roi.y : roi.y + roi.height, roi.x : roi.x + roi.width]
+
+        if region.size:
+
+            region_camera_matrix = camera_matrix_arr.copy()
+            region_camera_matrix[0, 2] -= roi.x
+            region_camera_matrix[1, 2] -= roi.y
+
+            corners, ids = _detect(region, region_camera_matrix, dist_matrix_arr, refine)
+
+            if ids is not None:
+                offset = np.array([roi.x, roi.y], dtype=np.float32)
+                return camera_matrix_arr, dist_matrix_arr, gray, [c + offset for c in corners], ids
+
+    corners, ids = _detect(gray, camera_matrix_arr, dist_matrix_arr, refine)
     return camera_matrix_arr, dist_matrix_arr, gray, corners, ids
 
 
+def draw_markers(
+    path: str,
+    gray: np.ndarray,
+    camera_matrix: np.ndarray,
+    dist_matrix: np.ndarray,
+    corners: Sequence[np.ndarray],
+    rvec: np.ndarray,
+    tvec: np.ndarray,
+) -> None:
+    """Writes image with detected markers and their axes (for
+    diagnostics)."""
+
+    backtorgb = cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+    aruco.drawDetectedMarkers(backtorgb, corners)  # Draw A square around the markers
+
+    for idx in range(len(rvec)):
+        aruco.drawAxis(backtorgb, camera_matrix, dist_matrix, rvec[idx], tvec[idx], 0.15)
+
+    cv2.imwrite(path, backtorgb)
+
+
 def estimate_camera_pose(
-    camera_matrix: List[List[float]], dist_matrix: List[float], image: Image.Image, marker_size: float
+    camera_matrix: List[List[float]],
+    dist_matrix: List[float],
+    image: Image.Image,
+    marker_size: float,
+    roi: Optional[Roi] = None,
+    diagnostics: Optional[str] = None,
 ) -> Dict[int, Pose]:
+    """Estimates camera pose wrt. each detected marker.
+
+    :param roi: Where to look for markers first.
+    :param diagnostics: Path of an image with visualized detections. Nothing is written if not set.
+    :return:
+    """
 
     camera_matrix_arr, dist_matrix_arr, gray, corners, ids = detect_corners(
-        camera_matrix, dist_matrix, image, refine=True
+        camera_matrix, dist_matrix, image, refine=True, roi=roi
     )
 
     ret: Dict[int, Pose] = {}
@@ -59,14 +180,8 @@ def estimate_camera_pose(
     rvec = rvec.reshape(len(ids), 3)
     tvec = tvec.reshape(len(ids), 3)
 
-    if __debug__:
-        backtorgb = cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
-        aruco.drawDetectedMarkers(backtorgb, corners)  # Draw A square around the markers
-
-        for idx in range(len(ids)):
-            aruco.drawAxis(backtorgb, camera_matrix_arr, dist_matrix_arr, rvec[idx], tvec[idx], 0.15)
-
-        cv2.imwrite("marker.jpg", backtorgb)
+    if diagnostics:
+        draw_markers(diagnostics, gray, camera_matrix_arr, dist_matrix_arr, corners, rvec, tvec)
 
     for idx, mid in enumerate(ids):
 
@@ -0,0 +1,213 @@
+"""Calibration jobs running in a bounded pool of processes.
+
+Calibrations are CPU-bound, so running them in request threads means
+that they block each other (GIL). Jobs might be submitted
+asynchronously (their state is then polled by clients) or just waited
+for.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import BrokenExecutor, CancelledError, Executor, Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from arcor2_calibration_data import Job, JobState
+
+from arcor2 import env
+from arcor2.exceptions import Arcor2Exception
+from arcor2.logging import get_logger
+
+WORKERS = env.get_int("ARCOR2_CALIBRATION_WORKERS", max((os.cpu_count() or 1) // 2, 1))
+MAX_JOBS = env.get_int("ARCOR2_CALIBRATION_MAX_JOBS", 16)  # unfinished ones
+JOB_TTL = env.get_float("ARCOR2_CALIBRATION_JOB_TTL", 600.0)  # how long are finished jobs kept (s)
+
+logger = get_logger(__name__)
+
+
+class JobException(Arcor2Exception):
+    pass
+
+
+class UnknownJob(JobException):
+    pass
+
+
+class TooManyJobs(JobException):
+    pass
+
+
+class JobNotFinished(JobException):
+    pass
+
+
+class _Entry(NamedTuple):
+
+    job: Job
+    future: Future
+
+
+def _timed(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[Any, float, float]:
+    """Runs in a worker process, so the timing does not include waiting in
+    the queue."""
+
+    started = time.time()
+    res = fn(*args)
+    return res, started, time.time()
+
+
+class Jobs:
+    def __init__(
+        self,
+        workers: int = WORKERS,
+        max_jobs: int = MAX_JOBS,
+        ttl: float = JOB_TTL,
+        executor_factory: Callable[[int], Executor] = ProcessPoolExecutor,
+    ) -> None:
+
+        self._workers = workers
+        self._max_jobs = max_jobs
+        self._ttl = ttl
+        self._executor_factory = executor_factory
+
+        self._executor: Optional[Executor] = None  # created on demand (processes are forked after configuration)
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.RLock()  # callbacks of cancelled futures are called from cancel()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args: Any) -> Job:
+        """Schedules the function (has to be picklable) to be called with the
+        arguments in a worker process.
+
+        :param kind: Type of the job (e.g. 'robot').
+        :return:
+        """
+
+        with self._lock:
+
+            self._remove_expired()
+
+            if sum(not entry.future.done() for entry in self._entries.values()) >= self._max_jobs:
+                raise TooManyJobs("Too many jobs.")
+
+            job = Job(uuid.uuid4().hex, kind, JobState.QUEUED, time.time())
+
+            try:
+                future = self._get_executor().submit(_timed, fn, args)
+            except BrokenExecutor:  # e.g. a worker was killed
+                logger.warning("Process pool is broken, creating a new one.")
+                self._executor = None
+                future = self._get_executor().submit(_timed, fn, args)
+            self._entries[job.id] = _Entry(job, future)
+
+        future.add_done_callback(lambda f: self._done(job, f))
+        return job
+
+    def status(self, job_id: str) -> Job:
+
+        with self._lock:
+            entry = self._entry(job_id)
+            if entry.job.state == JobState.QUEUED and entry.future.running():
+                entry.job.state = JobState.RUNNING
+            return entry.job
+
+    def result(self, job_id: str) -> Any:
+        """Returns result of the finished job or raises the exception the job
+        failed with."""
+
+        with self._lock:
+            entry = self._entry(job_id)
+
+        if entry.job.state != JobState.CANCELLED and not entry.future.done():
+            raise JobNotFinished("Job not finished yet.")
+
+        return self._result(entry)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Any:
+
+        with self._lock:
+            entry = self._entry(job_id)
+
+        try:
+            entry.future.exception(timeout)
+        except CancelledError:
+            pass
+
+        return self._result(entry)
+
+    def cancel(self, job_id: str) -> Job:
+        """Queued jobs are not started at all, the result of a running job is
+        thrown away (process pool can't interrupt the worker)."""
+
+        with self._lock:
+
+            entry = self._entry(job_id)
+
+            if entry.job.state in (JobState.QUEUED, JobState.RUNNING):
+                entry.job.state = JobState.CANCELLED
+                entry.job.finished = time.time()
+                entry.future.cancel()
+
+            return entry.job
+
+    def shutdown(self) -> None:
+
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _get_executor(self) -> Executor:
+
+        if self._executor is None:
+            self._executor = self._executor_factory(self._workers)
+        return self._executor
+
+    def _entry(self, job_id: str) -> _Entry:
+
+        try:
+            return self._entries[job_id]
+        except KeyError:
+            raise UnknownJob("Unknown job.")
+
+    def _result(self, entry: _Entry) -> Any:
+
+        # a running job might be cancelled but its future still finishes
+        if entry.job.state == JobState.CANCELLED:
+            raise JobException("Job was cancelled.")
+
+        return entry.future.result()[0]
+
+    def _done(self, job: Job, future: Future) -> None:
+
+        with self._lock:
+
+            if job.state == JobState.CANCELLED or future.cancelled():
+                return
+
+            exc = future.exception()
+
+            if exc is not None:
+                job.state = JobState.FAILED
+                job.error = str(exc)
+                job.finished = time.time()
+            else:
+                _, job.started, job.finished = future.result()
+                job.state = JobState.FINISHED
+
+        if exc is not None:
+            logger.info(f"Job {job.id} ({job.kind}) failed: {exc}")
+        else:
+            assert job.started is not None and job.finished is not None
+            logger.info(
+                f"Job {job.id} ({job.kind}) finished, "
+                f"waited {job.started - job.created:.3f}s, ran {job.finished - job.started:.3f}s."
+            )
+
+    def _remove_expired(self) -> None:
+
+        now = time.time()
+
+        for job_id, entry in list(self._entries.items()):
+            if entry.job.finished is not None and now - entry.job.finished > self._ttl:
+                del self._entries[job_id]
@@ -0,0 +1,118 @@
+import threading
+import weakref
+from typing import Dict, NamedTuple
+
+import numpy as np
+from urdfpy import URDF
+
+SIM_POINTS = int(1e5)
+
+
+class LinkPoints(NamedTuple):
+
+    points: np.ndarray
+    normals: np.ndarray
+
+
+def sample_mesh(vertices: np.ndarray, faces: np.ndarray, count: int, rng: np.random.Generator) -> LinkPoints:
+    """Samples points uniformly on the surface of the mesh (with normals of
+    the faces)."""
+
+    triangles = vertices[faces]
+
+    cross = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    areas = np.linalg.norm(cross, axis=1)
+
+    if not count or not areas.sum():
+        return LinkPoints(np.empty((0, 3)), np.empty((0, 3)))
+
+    idx = rng.choice(len(faces), count, p=areas / areas.sum())
+
+    # uniform sampling of a triangle: random point of a parallelogram reflected into the triangle
+    uv = rng.random((count, 2))
+    flip = uv.sum(axis=1) > 1
+    uv[flip] = 1 - uv[flip]
+
+    tri = triangles[idx]
+    points = tri[:, 0] + uv[:, :1] * (tri[:, 1] - tri[:, 0]) + uv[:, 1:] * (tri[:, 2] - tri[:, 0])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        normals = np.nan_to_num(cross[idx] / areas[idx, np.newaxis])
+
+    return LinkPoints(points, normals)
+
+
+class RobotPointCloud:
+    """Points sampled on visual meshes of the robot.
+
+    Sampling is done once (in mesh coordinates), for a particular
+    configuration, the points are just transformed according to the
+    forward kinematics.
+    """
+
+    def __init__(self, robot: URDF, points: int = SIM_POINTS, seed: int = 0) -> None:
+
+        self._robot = robot
+        self._links: Dict[int, LinkPoints] = {}
+
+        fk = robot.visual_trimesh_fk()
+
+        # meshes might be scaled (uniformly, hopefully)
+        areas = [mesh.area * abs(np.linalg.det(pose[:3, :3])) ** (2 / 3) for mesh, pose in fk.items()]
+        total = sum(areas)
+
+        rng = np.random.default_rng(seed)
+
+        for (mesh, _), area in zip(fk.items(), areas):
+            count = int(round(points * area / total)) if total else 0
+            self._links[id(mesh)] = sample_mesh(np.asarray(mesh.vertices), np.asarray(mesh.faces), count, rng)
+
+    def transformed(self, cfg: Dict[str, float], base: np.ndarray) -> LinkPoints:
+        """Points of the robot in the given configuration.
+
+        :param cfg: Joint values.
+        :param base: Transformation of the robot base.
+        :return:
+        """
+
+        points = []
+        normals = []
+
+        for mesh, pose in self._robot.visual_trimesh_fk(cfg=cfg).items():
+
+            link = self._links[id(mesh)]
+
+            tr = np.dot(base, pose)
+            rot = tr[:3, :3]
+
+            points.append(np.dot(link.points, rot.T) + tr[:3, 3])
+
+            # normals have to be transformed by the inverse transpose (meshes might be scaled)
+            link_normals = np.dot(link.normals, np.linalg.inv(rot))
+            norms = np.linalg.norm(link_normals, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            normals.append(link_normals / norms)
+
+        if not points:
+            return LinkPoints(np.empty((0, 3)), np.empty((0, 3)))
+
+        return LinkPoints(np.concatenate(points), np.concatenate(normals))
+
+
+_cache: "weakref.WeakKeyDictionary[URDF, RobotPointCloud]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def robot_point_cloud(robot: URDF) -> RobotPointCloud:
+    """Returns (cached) point cloud for the robot model.
+
+    Models are cached by arcor2.urdf, so the point cloud is computed
+    just once for each robot type.
+    """
+
+    with _lock:
+        try:
+            return _cache[robot]
+        except KeyError:
+            cloud = _cache[robot] = RobotPointCloud(robot)
+            return cloud
@@ -1,9 +1,10 @@
 import copy
-from typing import List
+from typing import List, Optional, Union
 
 import cv2
 import numpy as np
 import open3d as o3d
+from arcor2_calibration_data.client import IcpParameters
 from PIL import Image
 from urdfpy import URDF
 
@@ -11,6 +12,7 @@ from arcor2.data.camera import CameraParameters
 from arcor2.data.common import Joint, Pose
 from arcor2.exceptions import Arcor2Exception
 from arcor2.logging import get_logger
+from arcor2_calibration.point_cloud import robot_point_cloud
 
 logger = get_logger(__name__)
 
@@ -19,7 +21,7 @@ class RobotCalibrationException(Arcor2Exception):
     pass
 
 
-def depth_image_to_np(depth: Image.Image) -> np.ndarray:
+def depth_image_to_np(depth: Union[Image.Image, np.ndarray]) -> np.ndarray:
     return np.array(depth, dtype=np.float32) / 1000.0
 
 
@@ -47,36 +49,37 @@ def calibrate_robot(
     camera_pose: Pose,
     camera_parameters: CameraParameters,
     robot: URDF,
-    depth_image: Image,
+    depth_image: Union[Image.Image, np.ndarray],
     draw_results: bool = False,
+    icp: Optional[IcpParameters] = None,
 ) -> Pose:
 
-    logger.info("Creating robot model...")
+    if icp is None:
+        icp = IcpParameters()
+
+    if not icp.stages:
+        raise RobotCalibrationException("At least one ICP stage has to be given.")
 
-    fk = robot.visual_trimesh_fk(cfg={joint.name: joint.value for joint in robot_joints})
+    logger.info("Creating robot model...")
 
     robot_tr_matrix = robot_pose.as_tr_matrix()
 
-    res_mesh = o3d.geometry.TriangleMesh()
+    # meshes are sampled only once per robot model, here are the points just transformed
+    sim_points = robot_point_cloud(robot).transformed(
+        {joint.name: joint.value for joint in robot_joints}, robot_tr_matrix
+    )
 
-    for tm in fk:
-        pose = fk[tm]
-        mesh = o3d.geometry.TriangleMesh(
-            vertices=o3d.utility.Vector3dVector(tm.vertices), triangles=o3d.utility.Vector3iVector(tm.faces)
-        )
-        mesh.transform(np.dot(robot_tr_matrix, pose))
-        mesh.compute_vertex_normals()
-        res_mesh += mesh
+    sim_pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(sim_points.points))
+    sim_pcd.normals = o3d.utility.Vector3dVector(sim_points.normals)
 
     mesh_frame = o3d.geometry.TriangleMesh.create_coordinate_frame(size=0.1)
 
-    sim_pcd = res_mesh.sample_points_uniformly(int(1e5))
-
     camera_tr_matrix = camera_pose.as_tr_matrix()
     camera_matrix = camera_parameters.as_camera_matrix()
     depth = depth_image_to_np(depth_image)
 
-    wh = (depth_image.width, depth_image.height)
+    height, width = depth.shape
+    wh = (width, height)
 
     dist = np.array(camera_parameters.dist_coefs)
     newcameramtx, _ = cv2.getOptimalNewCameraMatrix(camera_matrix, dist, wh, 1, wh)
@@ -85,8 +88,8 @@ def calibrate_robot(
     real_pcd = o3d.geometry.PointCloud.create_from_depth_image(
         o3d.geometry.Image(depth),
         o3d.camera.PinholeCameraIntrinsic(
-            depth_image.width,
-            depth_image.height,
+            width,
+            height,
             camera_parameters.fx,
             camera_parameters.fy,
             camera_parameters.cx,
@@ -104,49 +107,58 @@ def calibrate_robot(
 
     sim_pcd = sim_pcd.select_by_index(sim_pcd.hidden_point_removal(np.array(list(camera_pose.position)), 500)[1])
 
-    print("Estimating normals...")
-    real_pcd.estimate_normals()
-
     if draw_results:
         o3d.visualization.draw_geometries([sim_pcd, real_pcd, mesh_frame])
 
-    threshold = 1.0
     trans_init = np.identity(4)
+    transformation = trans_init
 
-    """
-    evaluation = o3d.pipelines.registration.evaluate_registration(
-        sim_pcd,
-        real_pcd,
-        threshold,
-        trans_init,
-    )
+    logger.info("Applying coarse-to-fine point-to-plane robust ICP...")
 
-    logger.info(evaluation)
-    """
+    for stage in icp.stages:
 
-    logger.info("Applying point-to-plane robust ICP...")
+        sim_down, real_down = sim_pcd, real_pcd
 
-    loss = o3d.pipelines.registration.TukeyLoss(k=0.25)
+        if stage.voxel_size > 0:
+            sim_down = sim_pcd.voxel_down_sample(stage.voxel_size)
+            real_down = real_pcd.voxel_down_sample(stage.voxel_size)
 
-    p2l = o3d.pipelines.registration.TransformationEstimationPointToPlane(loss)
-    reg_p2p = o3d.pipelines.registration.registration_icp(
-        sim_pcd,
-        real_pcd,
-        threshold,
-        trans_init,
-        p2l,
-        o3d.pipelines.registration.ICPConvergenceCriteria(max_iteration=100),
-    )
+        # normals are estimated only for (much smaller) downsampled cloud
+        real_down.estimate_normals(
+            o3d.geometry.KDTreeSearchParamHybrid(radius=max(2 * stage.voxel_size, 0.01), max_nn=30)
+        )
+
+        # residuals above k are ignored by the loss, so it has to follow the correspondence distance
+        loss = o3d.pipelines.registration.TukeyLoss(k=stage.max_correspondence_distance / 2)
+
+        res = o3d.pipelines.registration.registration_icp(
+            sim_down,
+            real_down,
+            stage.max_correspondence_distance,
+            transformation,
+            o3d.pipelines.registration.TransformationEstimationPointToPlane(loss),
+            o3d.pipelines.registration.ICPConvergenceCriteria(
+                relative_fitness=icp.relative_fitness,
+                relative_rmse=icp.relative_rmse,
+                max_iteration=stage.max_iterations,
+            ),
+        )
+
+        logger.info(f"Stage with voxel size {stage.voxel_size}: {res}")
+
+        if not res.correspondence_set:
+            raise RobotCalibrationException("Robot not found in the depth image.")
+
+        transformation = res.transformation
 
-    logger.info(reg_p2p)
-    logger.debug(reg_p2p.transformation)
+    logger.debug(transformation)
 
     # TODO somehow check if calibration is ok
 
     if draw_results:
-        draw_registration_result(sim_pcd, real_pcd, trans_init, reg_p2p.transformation)
+        draw_registration_result(sim_pcd, real_pcd, trans_init, transformation)
 
-    robot_tr_matrix = np.dot(reg_p2p.transformation, robot_tr_matrix)
+    robot_tr_matrix = np.dot(transformation, robot_tr_matrix)
     pose = Pose.from_tr_matrix(robot_tr_matrix)
 
     logger.info("Done")
@@ -3,15 +3,27 @@
 import argparse
 import logging
 import math
+import os
 import random
 import sys
 import time
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import numpy as np
 import quaternion
 import yaml
-from arcor2_calibration_data import CALIBRATION_URL, SERVICE_NAME, Corner, EstimatedPose, MarkerCorners
+from arcor2_calibration_data import (
+    CALIBRATION_URL,
+    SERVICE_NAME,
+    Corner,
+    EstimatedPose,
+    Job,
+    MarkerCorners,
+    MarkerStatistics,
+    MultiFrameEstimatedPose,
+)
 from arcor2_calibration_data.client import CalibrateRobotArgs
 from dataclasses_jsonschema import ValidationError
 from flask import jsonify, request
@@ -19,14 +31,18 @@ from PIL import Image
 
 import arcor2_calibration
 from arcor2 import transformations as tr
+from arcor2.data.camera import Roi
 from arcor2.data.common import Pose, Position
-from arcor2.flask import RespT, create_app, run_app
+from arcor2.exceptions import Arcor2Exception
+from arcor2.flask import FlaskException, RespT, create_app, run_app
 from arcor2.helpers import port_from_url
+from arcor2.image import ImageException, depth_from_bytes, roi_from_str, shape_from_str
 from arcor2.logging import get_logger
 from arcor2.urdf import urdf_from_url
 from arcor2_calibration import calibration
+from arcor2_calibration.averaging import deviation, inliers, weighted_average_pose
 from arcor2_calibration.calibration import detect_corners, estimate_camera_pose
-from arcor2_calibration.quaternions import weighted_average_quaternions
+from arcor2_calibration.jobs import JobException, JobNotFinished, Jobs, TooManyJobs, UnknownJob
 from arcor2_calibration.robot import calibrate_robot
 
 logger = get_logger(__name__)
@@ -42,10 +58,47 @@ MIN_THETA = 2.0
 MAX_THETA = math.pi
 
 _mock: bool = False
+_diagnostics: Optional[str] = None  # directory where images with detected markers are written
+
+_jobs = Jobs()
 
 app = create_app(__name__)
 
 
+class MarkersNotFound(Arcor2Exception):
+    pass
+
+
+class Config(NamedTuple):
+
+    markers: Dict[int, Pose]
+    marker_size: float
+    min_dist: float
+    max_dist: float
+    blur_threshold: float
+    mock: bool
+    diagnostics: Optional[str] = None
+
+
+def configure(config: Config) -> None:
+    """Sets the module up, also called in each worker process."""
+
+    global MARKER_SIZE
+    global MIN_DIST
+    global MAX_DIST
+    global _mock
+    global _diagnostics
+
+    MARKERS.clear()
+    MARKERS.update(config.markers)
+    MARKER_SIZE = config.marker_size
+    MIN_DIST = config.min_dist
+    MAX_DIST = config.max_dist
+    calibration.BLUR_THRESHOLD = config.blur_threshold
+    _mock = config.mock
+    _diagnostics = config.diagnostics
+
+
 def camera_matrix_from_request() -> List[List[float]]:
 
     return [
@@ -59,6 +112,38 @@ def dist_matrix_from_request() -> List[float]:
     return [float(val) for val in request.args.getlist("distCoefs")]
 
 
+def roi_from_request() -> Optional[Roi]:
+
+    try:
+        return roi_from_str(request.args["roi"])
+    except KeyError:
+        return None
+    except ImageException as e:
+        raise FlaskException(str(e), error_code=400)
+
+
+def image_from_request(name: str = "image") -> Image.Image:
+
+    image = Image.open(request.files[name].stream)
+    image.load()  # the image is sent to a worker after the request is gone
+    return image
+
+
+def images_from_request() -> List[Image.Image]:
+
+    images: List[Image.Image] = []
+
+    for file in request.files.getlist("images"):
+        image = Image.open(file.stream)
+        image.load()
+        images.append(image)
+
+    if not images:
+        raise FlaskException("No image provided.", error_code=400)
+
+    return images
+
+
 def normalize(val: float, min_val: float, max_val: float) -> float:
 
     assert max_val > min_val
@@ -67,6 +152,260 @@ def normalize(val: float, min_val: float, max_val: float) -> float:
     return res
 
 
+def depth_from_request() -> np.ndarray:
+
+    if "depth" in request.files:
+        try:
+            shape = shape_from_str(request.files["depthShape"].stream.read().decode())
+        except KeyError:
+            raise FlaskException("Shape of the depth image not provided.", error_code=400)
+        return depth_from_bytes(request.files["depth"].stream.read(), shape)
+
+    if "image" in request.files:
+        return np.array(Image.open(request.files["image"].stream))
+
+    raise FlaskException("Depth image not provided.", error_code=400)
+
+
+def submit(kind: str, fn: Callable[..., Any], *args: Any) -> Job:
+
+    try:
+        return _jobs.submit(kind, fn, *args)
+    except TooManyJobs as e:
+        raise FlaskException(str(e), error_code=503)
+
+
+def run(kind: str, fn: Callable[..., Any], *args: Any) -> Any:
+    """Runs the function in a worker process and waits for the result."""
+
+    job = submit(kind, fn, *args)
+
+    try:
+        return _jobs.wait(job.id)
+    except MarkersNotFound as e:
+        raise FlaskException(str(e), error_code=404)
+
+
+def robot_calibration(args: CalibrateRobotArgs, depth: np.ndarray) -> Pose:
+
+    if _mock:
+        time.sleep(5)
+        pose = args.robot_pose
+        pose.position.x += random.uniform(-0.1, 0.1)
+        pose.position.y += random.uniform(-0.1, 0.1)
+        pose.position.z += random.uniform(-0.1, 0.1)
+        return pose
+
+    return calibrate_robot(
+        args.robot_joints,
+        args.robot_pose,
+        args.camera_pose,
+        args.camera_parameters,
+        urdf_from_url(args.urdf_uri),
+        depth,
+        icp=args.icp,
+    )
+
+
+def marker_corners(
+    camera_matrix: List[List[float]], dist_matrix: List[float], image: Image.Image, roi: Optional[Roi] = None
+) -> List[MarkerCorners]:
+
+    if _mock:
+        time.sleep(0.1)
+        return [MarkerCorners(10, [Corner(934, 831), Corner(900, 1007), Corner(663, 999), Corner(741, 828)])]
+
+    corners: List[MarkerCorners] = []
+    _, _, _, detected_corners, ids = detect_corners(camera_matrix, dist_matrix, image, roi=roi)
+
+    for mid, corn in zip(ids, detected_corners[0]):
+        corners.append(MarkerCorners(int(mid), [Corner(float(v[0]), float(v[1])) for v in corn]))
+
+    return corners
+
+
+def camera_request() -> Tuple[List[List[float]], List[float], Image.Image, bool, Optional[Roi]]:
+
+    return (
+        camera_matrix_from_request(),
+        dist_matrix_from_request(),
+        image_from_request(),
+        request.args.get("inverse", default="false") == "true",
+        roi_from_request(),
+    )
+
+
+def marker_estimates(
+    camera_matrix: List[List[float]], dist_matrix: List[float], image: Image.Image, roi: Optional[Roi] = None
+) -> Dict[int, Tuple[Pose, float]]:
+    """Estimates camera pose (wrt. the origin) using each detected known
+    marker.
+
+    :return: Camera pose and quality of the estimate for each marker.
+    """
+
+    poses = estimate_camera_pose(
+        camera_matrix,
+        dist_matrix,
+        image,
+        MARKER_SIZE,
+        roi,
+        os.path.join(_diagnostics, "marker.jpg") if _diagnostics else None,
+    )
+
+    if not poses:
+        raise MarkersNotFound("No marker detected.")
+
+    known_markers: Dict[int, Tuple[Pose, float]] = {}
+
+    # apply configured marker offset from origin to the detected poses
+    for marker_id in poses.keys():
+        try:
+            cpose = MARKERS[marker_id]
+        except KeyError:
+            logger.debug(f"Detected un-configured marker id {marker_id}.")
+            continue
+
+        mpose = poses[marker_id]
+        dist = math.sqrt(mpose.position.x ** 2 + mpose.position.y ** 2 + mpose.position.z ** 2)
+
+        # the closer the theta is to pi, the higher quality we get
+        theta = quaternion.as_spherical_coords(mpose.orientation.as_quaternion())[0]
+        ori_marker_quality = normalize(abs(theta), MIN_THETA, MAX_THETA)
+
+        # the closer the marker is, the higher quality we get
+        dist_marker_quality = 1.0 - normalize(dist, MIN_DIST, MAX_DIST)
+
+        marker_quality = (ori_marker_quality + dist_marker_quality) / 2
+
+        known_markers[marker_id] = (tr.make_pose_abs(cpose, mpose), marker_quality)
+
+        logger.debug(f"Known marker       : {marker_id}")
+        logger.debug(f"...original pose   : {poses[marker_id]}")
+        logger.debug(f"...transformed pose: {known_markers[marker_id][0]}")
+        logger.debug(f"...dist quality    : {dist_marker_quality:.3f}")
+        logger.debug(f"...ori quality     : {ori_marker_quality:.3f}")
+        logger.debug(f"...overall quality : {marker_quality:.3f}")
+
+    return known_markers
+
+
+def frame_quality(known_markers: Dict[int, Tuple[Pose, float]]) -> float:
+    """Mean quality over all configured markers (undetected ones have
+    zero quality)."""
+
+    return sum(quality for _, quality in known_markers.values()) / len(MARKERS)
+
+
+def camera_calibration(
+    camera_matrix: List[List[float]],
+    dist_matrix: List[float],
+    image: Image.Image,
+    inverse: bool = False,
+    roi: Optional[Roi] = None,
+) -> EstimatedPose:
+
+    if _mock:
+        time.sleep(0.5)
+        quality = random.uniform(0, 1)
+        pose = Pose(Position(random.uniform(-0.5, 0.5), random.uniform(-0.5, 0.5), random.uniform(0.2, 1)))
+    else:
+        known_markers = marker_estimates(camera_matrix, dist_matrix, image, roi)
+
+        if not known_markers:
+            raise MarkersNotFound("No known marker detected.")
+
+        # combine all detections
+        pose = weighted_average_pose(
+            [mpose for mpose, _ in known_markers.values()], [weight for _, weight in known_markers.values()]
+        )
+        quality = frame_quality(known_markers)
+
+    if inverse:
+        logger.debug("Inverting the output pose.")
+        pose = pose.inversed()
+
+    return EstimatedPose(pose, quality)
+
+
+def camera_calibration_batch(
+    camera_matrix: List[List[float]],
+    dist_matrix: List[float],
+    images: List[Image.Image],
+    inverse: bool = False,
+    roi: Optional[Roi] = None,
+) -> MultiFrameEstimatedPose:
+    """Combines estimates from multiple frames, inconsistent ones are
+    rejected."""
+
+    if not images:
+        raise Arcor2Exception("No image given.")
+
+    if _mock:
+        time.sleep(0.5)
+        return MultiFrameEstimatedPose(
+            Pose(Position(random.uniform(-0.5, 0.5), random.uniform(-0.5, 0.5), random.uniform(0.2, 1))),
+            random.uniform(0, 1),
+            len(images),
+        )
+
+    def estimates(image: Image.Image) -> Dict[int, Tuple[Pose, float]]:
+
+        try:
+            return marker_estimates(camera_matrix, dist_matrix, image, roi)
+        except Arcor2Exception as e:  # e.g. blurry frame
+            logger.debug(f"Frame skipped: {e}")
+            return {}
+
+    # OpenCV releases GIL, so the frames are processed in parallel even within one worker process
+    with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1)) as executor:
+        frames = list(executor.map(estimates, images))
+
+    detections: List[Tuple[int, Pose, float]] = [
+        (marker_id, mpose, quality) for frame in frames for marker_id, (mpose, quality) in frame.items()
+    ]
+
+    if not detections:
+        raise MarkersNotFound("No known marker detected.")
+
+    mask = inliers([mpose for _, mpose, _ in detections])
+
+    pose = weighted_average_pose(
+        [mpose for (_, mpose, _), inlier in zip(detections, mask) if inlier],
+        [quality for (_, _, quality), inlier in zip(detections, mask) if inlier],
+    )
+
+    markers: List[MarkerStatistics] = []
+    for marker_id in sorted({marker_id for marker_id, _, _ in detections}):
+
+        marker = [
+            (mpose, quality, inlier) for (mid, mpose, quality), inlier in zip(detections, mask) if mid == marker_id
+        ]
+        dev = deviation([mpose for mpose, _, _ in marker])
+
+        markers.append(
+            MarkerStatistics(
+                marker_id,
+                len(marker),
+                sum(not inlier for _, _, inlier in marker),
+                float(np.mean([quality for _, quality, _ in marker])),
+                dev.position,
+                dev.orientation,
+            )
+        )
+
+    logger.debug(f"Used {sum(mask)} of {len(detections)} estimates from {len(images)} frame(s).")
+
+    if inverse:
+        logger.debug("Inverting the output pose.")
+        pose = pose.inversed()
+
+    # frames without any known marker lower the quality
+    quality = float(np.mean([frame_quality(frame) for frame in frames]))
+
+    return MultiFrameEstimatedPose(pose, quality, sum(bool(frame) for frame in frames), markers)
+
+
 @app.route("/calibrate/robot", methods=["PUT"])
 def put_calibrate_robot() -> RespT:
     """Get calibration (camera pose wrt. marker)
@@ -81,13 +420,20 @@ def put_calibrate_robot() -> RespT:
                   schema:
                     type: object
                     required:
-                        - image
                         - args
                     properties:
                       # 'image' will be the field name in this multipart request
                       image:
                         type: string
                         format: binary
+                        description: Depth image (16-bit PNG), alternative to depth.
+                      depth:
+                        type: string
+                        format: binary
+                        description: Raw depth image (uint16, little-endian, distances in mm).
+                      depthShape:
+                        type: string
+                        description: Height and width of the raw depth image, separated by a comma.
                       args:
                         $ref: "#/components/schemas/CalibrateRobotArgs"
         responses:
@@ -100,24 +446,9 @@ def put_calibrate_robot() -> RespT:
 
     """
 
-    image = Image.open(request.files["image"].stream)
+    depth = depth_from_request()
     args = CalibrateRobotArgs.from_json(request.files["args"].stream.read().decode())
-
-    if _mock:
-        time.sleep(5)
-        pose = args.robot_pose
-        pose.position.x += random.uniform(-0.1, 0.1)
-        pose.position.y += random.uniform(-0.1, 0.1)
-        pose.position.z += random.uniform(-0.1, 0.1)
-    else:
-        pose = calibrate_robot(
-            args.robot_joints,
-            args.robot_pose,
-            args.camera_pose,
-            args.camera_parameters,
-            urdf_from_url(args.urdf_uri),
-            image,
-        )
+    pose = run("robot", robot_calibration, args, depth)
 
     return jsonify(pose.to_dict()), 200
 
@@ -168,6 +499,11 @@ def get_marker_corners() -> RespT:
                     format: float
               required: true
               description: unique ID
+            - in: query
+              name: roi
+              schema:
+                type: string
+              description: Where to look for markers first (x,y,width,height), e.g. around previously detected ones.
         requestBody:
               content:
                 multipart/form-data:
@@ -192,21 +528,14 @@ def get_marker_corners() -> RespT:
 
     """
 
-    file = request.files["image"]
-    camera_matrix = camera_matrix_from_request()
-    image = Image.open(file.stream)
-    dist_matrix = dist_matrix_from_request()
-
-    corners: List[MarkerCorners] = []
-
-    if _mock:
-        time.sleep(0.1)
-        corners = [MarkerCorners(10, [Corner(934, 831), Corner(900, 1007), Corner(663, 999), Corner(741, 828)])]
-    else:
-        _, _, _, detected_corners, ids = detect_corners(camera_matrix, dist_matrix, image)
-
-        for mid, corn in zip(ids, detected_corners[0]):
-            corners.append(MarkerCorners(int(mid), [Corner(float(v[0]), float(v[1])) for v in corn]))
+    corners = run(
+        "corners",
+        marker_corners,
+        camera_matrix_from_request(),
+        dist_matrix_from_request(),
+        image_from_request(),
+        roi_from_request(),
+    )
 
     return jsonify(corners), 200
 
@@ -262,6 +591,11 @@ def get_calibration() -> RespT:
                     format: float
               required: true
               description: unique ID
+            - in: query
+              name: roi
+              schema:
+                type: string
+              description: Where to look for markers first (x,y,width,height), e.g. around previously detected ones.
         requestBody:
               content:
                 multipart/form-data:
@@ -284,80 +618,322 @@ def get_calibration() -> RespT:
 
     """
 
-    file = request.files["image"]
+    return jsonify(run("camera", camera_calibration, *camera_request()).to_dict()), 200
 
-    camera_matrix = camera_matrix_from_request()
-    image = Image.open(file.stream)
-    dist_matrix = dist_matrix_from_request()
 
-    if _mock:
-        time.sleep(0.5)
-        quality = random.uniform(0, 1)
-        pose = Pose(Position(random.uniform(-0.5, 0.5), random.uniform(-0.5, 0.5), random.uniform(0.2, 1)))
-    else:
-        poses = estimate_camera_pose(camera_matrix, dist_matrix, image, MARKER_SIZE)
+@app.route("/calibrate/camera/batch", methods=["PUT"])
+def put_calibrate_camera_batch() -> RespT:
+    """Get calibration from multiple frames
+    ---
+    put:
+        description: Returns camera pose with respect to the origin, estimated from multiple frames at once.
+        tags:
+           - Camera
+        parameters:
+            - in: query
+              name: inverse
+              schema:
+                type: boolean
+              description: When set, the method returns pose of the origin wrt. the camera.
+            - in: query
+              name: fx
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: fy
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: cx
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: cy
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: distCoefs
+              schema:
+                type: array
+                items:
+                    type: number
+                    format: float
+              required: true
+            - in: query
+              name: roi
+              schema:
+                type: string
+              description: Where to look for markers first (x,y,width,height), e.g. around previously detected ones.
+        requestBody:
+              content:
+                multipart/form-data:
+                  schema:
+                    type: object
+                    required:
+                        - images
+                    properties:
+                      images:
+                        type: array
+                        items:
+                          type: string
+                          format: binary
+        responses:
+            200:
+              description: Ok
+              content:
+                application/json:
+                  schema:
+                    $ref: MultiFrameEstimatedPose
+            404:
+              description: No known marker detected in any of the frames.
+    """
 
-        if not poses:
-            return jsonify("No marker detected."), 404
+    res = run(
+        "camera-batch",
+        camera_calibration_batch,
+        camera_matrix_from_request(),
+        dist_matrix_from_request(),
+        images_from_request(),
+        request.args.get("inverse", default="false") == "true",
+        roi_from_request(),
+    )
 
-        quality_dict: Dict[int, float] = {k: 0.0 for k, v in MARKERS.items()}
-        known_markers: List[Tuple[Pose, float]] = []
+    return jsonify(res.to_dict()), 200
 
-        # apply configured marker offset from origin to the detected poses
-        for marker_id in poses.keys():
-            try:
-                cpose = MARKERS[marker_id]
-            except KeyError:
-                logger.debug(f"Detected un-configured marker id {marker_id}.")
-                continue
 
-            mpose = poses[marker_id]
-            dist = math.sqrt(mpose.position.x ** 2 + mpose.position.y ** 2 + mpose.position.z ** 2)
+@app.route("/calibrate/robot/jobs", methods=["POST"])
+def post_calibrate_robot_job() -> RespT:
+    """Start robot calibration
+    ---
+    post:
+        description: Starts the robot calibration, the result has to be polled.
+        tags:
+           - Robot
+        requestBody:
+              content:
+                multipart/form-data:
+                  schema:
+                    type: object
+                    required:
+                        - args
+                    properties:
+                      image:
+                        type: string
+                        format: binary
+                        description: Depth image (16-bit PNG), alternative to depth.
+                      depth:
+                        type: string
+                        format: binary
+                        description: Raw depth image (uint16, little-endian, distances in mm).
+                      depthShape:
+                        type: string
+                        description: Height and width of the raw depth image, separated by a comma.
+                      args:
+                        $ref: "#/components/schemas/CalibrateRobotArgs"
+        responses:
+            202:
+              description: Accepted
+              content:
+                application/json:
+                  schema:
+                    $ref: Job
+            503:
+              description: Too many unfinished jobs.
+    """
 
-            # the closer the theta is to pi, the higher quality we get
-            theta = quaternion.as_spherical_coords(mpose.orientation.as_quaternion())[0]
-            ori_marker_quality = normalize(abs(theta), MIN_THETA, MAX_THETA)
+    depth = depth_from_request()
+    args = CalibrateRobotArgs.from_json(request.files["args"].stream.read().decode())
+    return jsonify(submit("robot", robot_calibration, args, depth).to_dict()), 202
 
-            # the closer the marker is, the higher quality we get
-            dist_marker_quality = 1.0 - normalize(dist, MIN_DIST, MAX_DIST)
 
-            marker_quality = (ori_marker_quality + dist_marker_quality) / 2
+@app.route("/calibrate/camera/jobs", methods=["POST"])
+def post_calibrate_camera_job() -> RespT:
+    """Start camera calibration
+    ---
+    post:
+        description: Starts the camera calibration, the result has to be polled.
+        tags:
+           - Camera
+        parameters:
+            - in: query
+              name: inverse
+              schema:
+                type: boolean
+              description: When set, the result is pose of the origin wrt. the camera.
+            - in: query
+              name: fx
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: fy
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: cx
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: cy
+              schema:
+                type: number
+                format: float
+              required: true
+            - in: query
+              name: distCoefs
+              schema:
+                type: array
+                items:
+                    type: number
+                    format: float
+              required: true
+            - in: query
+              name: roi
+              schema:
+                type: string
+              description: Where to look for markers first (x,y,width,height), e.g. around previously detected ones.
+        requestBody:
+              content:
+                multipart/form-data:
+                  schema:
+                    type: object
+                    required:
+                        - image
+                    properties:
+                      image:
+                        type: string
+                        format: binary
+        responses:
+            202:
+              description: Accepted
+              content:
+                application/json:
+                  schema:
+                    $ref: Job
+            503:
+              description: Too many unfinished jobs.
+    """
 
-            quality_dict[marker_id] = marker_quality
-            known_markers.append((tr.make_pose_abs(cpose, mpose), marker_quality))
+    return jsonify(submit("camera", camera_calibration, *camera_request()).to_dict()), 202
 
-            logger.debug(f"Known marker       : {marker_id}")
-            logger.debug(f"...original pose   : {poses[marker_id]}")
-            logger.debug(f"...transformed pose: {poses[marker_id]}")
-            logger.debug(f"...dist quality    : {dist_marker_quality:.3f}")
-            logger.debug(f"...ori quality     : {ori_marker_quality:.3f}")
-            logger.debug(f"...overall quality : {marker_quality:.3f}")
 
-        if not known_markers:
-            return jsonify("No known marker detected."), 404
+@app.route("/jobs/<string:job_id>", methods=["GET"])
+def get_job(job_id: str) -> RespT:
+    """Get state of the job
+    ---
+    get:
+        description: Returns state of the job.
+        tags:
+           - Jobs
+        parameters:
+            - in: path
+              name: job_id
+              schema:
+                type: string
+              required: true
+              description: unique ID
+        responses:
+            200:
+              description: Ok
+              content:
+                application/json:
+                  schema:
+                    $ref: Job
+            404:
+              description: Unknown job.
+    """
 
-        weights = [marker[1] for marker in known_markers]
+    try:
+        return jsonify(_jobs.status(job_id).to_dict()), 200
+    except UnknownJob as e:
+        raise FlaskException(str(e), error_code=404)
 
-        # combine all detections
-        pose = Pose()
-        for mpose, weight in known_markers:
-            pose.position += mpose.position * weight
-        pose.position *= 1.0 / sum(weights)
-
-        quaternions = np.array([quaternion.as_float_array(km[0].orientation.as_quaternion()) for km in known_markers])
-        pose.orientation.set_from_quaternion(
-            quaternion.from_float_array(weighted_average_quaternions(quaternions, np.array(weights)))
-        )
 
-        quality = np.mean(list(quality_dict.values()))
+@app.route("/jobs/<string:job_id>/result", methods=["GET"])
+def get_job_result(job_id: str) -> RespT:
+    """Get result of the job
+    ---
+    get:
+        description: Returns result of the finished job (the same as the synchronous endpoint would return).
+        tags:
+           - Jobs
+        parameters:
+            - in: path
+              name: job_id
+              schema:
+                type: string
+              required: true
+              description: unique ID
+        responses:
+            200:
+              description: Pose (robot), or EstimatedPose (camera).
+              content:
+                application/json:
+                  schema:
+                    oneOf:
+                      - $ref: Pose
+                      - $ref: EstimatedPose
+            400:
+              description: The calibration failed.
+            404:
+              description: Unknown job or no marker detected.
+            409:
+              description: The job is not finished yet or it was cancelled.
+    """
 
-    inverse = request.args.get("inverse", default="false") == "true"
+    try:
+        return jsonify(_jobs.result(job_id).to_dict()), 200
+    except (UnknownJob, MarkersNotFound) as e:
+        raise FlaskException(str(e), error_code=404)
+    except JobNotFinished as e:
+        raise FlaskException(str(e), error_code=409)
+    except JobException as e:  # cancelled
+        raise FlaskException(str(e), error_code=409)
 
-    if inverse:
-        logger.debug("Inverting the output pose.")
-        pose = pose.inversed()
 
-    return jsonify(EstimatedPose(pose, quality)), 200
+@app.route("/jobs/<string:job_id>", methods=["DELETE"])
+def delete_job(job_id: str) -> RespT:
+    """Cancel the job
+    ---
+    delete:
+        description: Cancels the job. A queued job is not started at all, result of a running one is thrown away.
+        tags:
+           - Jobs
+        parameters:
+            - in: path
+              name: job_id
+              schema:
+                type: string
+              required: true
+              description: unique ID
+        responses:
+            200:
+              description: Ok
+              content:
+                application/json:
+                  schema:
+                    $ref: Job
+            404:
+              description: Unknown job.
+    """
+
+    try:
+        return jsonify(_jobs.cancel(job_id).to_dict()), 200
+    except UnknownJob as e:
+        raise FlaskException(str(e), error_code=404)
 
 
 def main() -> None:
@@ -382,6 +958,12 @@ def main() -> None:
         help="Config file name containing a valid YAML configuration.",
     )
 
+    parser.add_argument(
+        "--diagnostics",
+        metavar="DIR",
+        help="Write images with detected markers into the directory (slows down the camera calibration).",
+    )
+
     sub_group = group.add_mutually_exclusive_group()
     sub_group.add_argument("-s", "--swagger", action="store_true", default=False)
     sub_group.add_argument("-m", "--mock", action="store_true", default=False)
@@ -390,50 +972,60 @@ def main() -> None:
 
     logger.setLevel(args.debug)
 
+    markers: Dict[int, Pose] = {}
+    marker_size = MARKER_SIZE
+    min_dist = MIN_DIST
+    max_dist = MAX_DIST
+    blur_threshold = calibration.BLUR_THRESHOLD
+
     if not (args.swagger or args.mock):
 
         data = args.config_file.read()
 
-        global MARKER_SIZE
-        global MIN_DIST
-        global MAX_DIST
-
         try:
 
             config = yaml.safe_load(data)
 
-            MARKER_SIZE = float(config.get("marker_size", MARKER_SIZE))
-            MIN_DIST = float(config.get("min_dist", MIN_DIST))
-            MAX_DIST = float(config.get("max_dist", MAX_DIST))
-            calibration.BLUR_THRESHOLD = float(config.get("blur_threshold", calibration.BLUR_THRESHOLD))
+            marker_size = float(config.get("marker_size", marker_size))
+            min_dist = float(config.get("min_dist", min_dist))
+            max_dist = float(config.get("max_dist", max_dist))
+            blur_threshold = float(config.get("blur_threshold", blur_threshold))
 
             for marker_id, marker in config["markers"].items():
-                MARKERS[int(marker_id)] = Pose.from_dict(marker["pose"])
+                markers[int(marker_id)] = Pose.from_dict(marker["pose"])
 
             logger.info(
-                f"Loaded configuration id '{config['id']}' with {len(MARKERS)} marker(s) of size {MARKER_SIZE}."
+                f"Loaded configuration id '{config['id']}' with {len(markers)} marker(s) of size {marker_size}."
             )
 
         except (KeyError, ValueError, TypeError, ValidationError):
             logger.exception("Failed to load the configuration file.")
             sys.exit(1)
 
-    if not (MAX_DIST > MIN_DIST):
+    if not (max_dist > min_dist):
         logger.error("'max_dist' have to be bigger than 'min_dist'.")
         sys.exit(1)
 
-    global _mock
-    _mock = args.mock
-    if _mock:
+    if args.mock:
         logger.info("Starting as a mock!")
 
+    if args.diagnostics:
+        logger.info(f"Diagnostics images will be written into '{args.diagnostics}'.")
+
+    cfg = Config(markers, marker_size, min_dist, max_dist, blur_threshold, args.mock, args.diagnostics)
+    configure(cfg)
+
+    # workers are configured explicitly as they don't have to be forked (depends on the start method)
+    global _jobs
+    _jobs = Jobs(executor_factory=partial(ProcessPoolExecutor, initializer=configure, initargs=(cfg,)))
+
     run_app(
         app,
         SERVICE_NAME,
         arcor2_calibration.version(),
         arcor2_calibration.version(),
         port_from_url(CALIBRATION_URL),
-        [Pose, CalibrateRobotArgs, MarkerCorners, EstimatedPose],
+        [Pose, CalibrateRobotArgs, MarkerCorners, EstimatedPose, MultiFrameEstimatedPose, Job],
         args.swagger,
     )
 
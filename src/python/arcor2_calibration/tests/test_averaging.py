@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import quaternion
+
+from arcor2.data.common import Orientation, Pose, Position
+from arcor2.exceptions import Arcor2Exception
+from arcor2_calibration.averaging import deviation, inliers, weighted_average_pose
+
+
+def pose(x: float, y: float, z: float, yaw: float = 0.0) -> Pose:
+    return Pose(Position(x, y, z), Orientation.from_quaternion(quaternion.from_rotation_vector([0, 0, yaw])))
+
+
+def yaw(p: Pose) -> float:
+    return float(quaternion.as_rotation_vector(p.orientation.as_quaternion())[2])
+
+
+def test_weighted_average_pose() -> None:
+
+    res = weighted_average_pose([pose(0, 0, 1, 0.0), pose(1, 0, 1, 0.2)], [3, 1])
+
+    assert list(res.position) == pytest.approx([0.25, 0, 1])
+    assert yaw(res) == pytest.approx(0.05, abs=1e-3)
+
+    # zero weights - all poses are considered equal
+    res = weighted_average_pose([pose(0, 0, 0), pose(1, 1, 1)], [0, 0])
+    assert list(res.position) == pytest.approx([0.5, 0.5, 0.5])
+
+    with pytest.raises(Arcor2Exception):
+        weighted_average_pose([], [])
+
+
+def test_inliers() -> None:
+
+    rng = np.random.default_rng(0)
+
+    poses = []
+
+    for _ in range(10):
+        x, y, z = np.array([1.0, 2.0, 0.5]) + rng.normal(0, 0.002, 3)
+        poses.append(pose(x, y, z, rng.normal(0, 0.005)))
+
+    poses.append(pose(1.3, 2.0, 0.5))  # wrong position
+    poses.append(pose(1.0, 2.0, 0.5, np.pi / 2))  # wrong orientation
+
+    assert inliers(poses) == [True] * 10 + [False, False]
+
+    # the same estimates are not rejected
+    assert inliers([pose(1, 2, 3)] * 3) == [True] * 3
+    assert inliers([]) == []
+
+
+def test_deviation() -> None:
+
+    dev = deviation([pose(0, 0, 0, -0.1), pose(0.2, 0, 0, 0.1)])
+
+    assert dev.position == pytest.approx(0.1)
+    assert dev.orientation == pytest.approx(0.1, abs=1e-6)
+
+    assert deviation([pose(1, 2, 3, 1)]) == (pytest.approx(0), pytest.approx(0, abs=1e-6))
@@ -0,0 +1,105 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from cv2 import aruco
+from PIL import Image
+
+from arcor2.data.camera import Roi
+from arcor2.exceptions import Arcor2Exception
+from arcor2_calibration.calibration import (
+    BLUR_THRESHOLD,
+    aruco_dict,
+    blur_score,
+    detect_corners,
+    estimate_camera_pose,
+    markers_roi,
+)
+
+CAMERA_MATRIX = [[1000.0, 0.0, 640.0], [0.0, 1000.0, 360.0], [0.0, 0.0, 1.0]]
+DIST_MATRIX = [0.0, 0.0, 0.0, 0.0, 0.0]
+
+
+@pytest.fixture()
+def image() -> Image.Image:
+    """Single marker on a gray background, with a white quiet zone (wider
+    than two marker cells) around it."""
+
+    gray = np.full((720, 1280), 128, dtype=np.uint8)
+    gray[350:650, 750:1050] = 255
+    gray[400:600, 800:1000] = aruco.drawMarker(aruco_dict, 10, 200)
+
+    return Image.fromarray(cv2.cvtColor(gray, cv2.COLOR_GRAY2RGBA))
+
+
+def gray_image(image: Image.Image) -> np.ndarray:
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGBA2GRAY)
+
+
+@pytest.mark.parametrize("sigma", [0, 1, 2])
+def test_blur_score(image: Image.Image, sigma: float) -> None:
+
+    gray = gray_image(image)
+    if sigma:
+        gray = cv2.GaussianBlur(gray, (0, 0), sigma)
+
+    # the estimate is comparable to the full-resolution score (and the threshold)
+    assert blur_score(gray) == pytest.approx(blur_score(gray, 1), rel=0.1)
+
+
+def test_blur_threshold(image: Image.Image) -> None:
+
+    assert blur_score(gray_image(image)) > BLUR_THRESHOLD
+    detect_corners(CAMERA_MATRIX, DIST_MATRIX, image)
+
+    blurred = Image.fromarray(cv2.GaussianBlur(np.array(image), (0, 0), 1))
+    assert blur_score(gray_image(blurred)) < BLUR_THRESHOLD
+
+    with pytest.raises(Arcor2Exception, match="Blur score"):
+        detect_corners(CAMERA_MATRIX, DIST_MATRIX, blurred)
+
+    # the region around the marker is much sharper than the whole frame, but the gate is the same
+    with pytest.raises(Arcor2Exception, match="Blur score"):
+        detect_corners(CAMERA_MATRIX, DIST_MATRIX, blurred, roi=Roi(750, 350, 300, 300))
+
+
+def test_markers_roi() -> None:
+
+    corners = [np.array([[[100, 100], [200, 100], [200, 200], [100, 200]]], dtype=np.float32)]
+
+    assert markers_roi(corners, 1280, 720) == Roi(50, 50, 200, 200)
+    assert markers_roi(corners, 1280, 720, margin=0) == Roi(100, 100, 100, 100)
+    assert markers_roi(corners, 180, 720) == Roi(50, 50, 130, 200)  # clipped
+
+    with pytest.raises(Arcor2Exception):
+        markers_roi([], 1280, 720)
+
+
+def test_detect_corners_roi(image: Image.Image) -> None:
+
+    _, _, _, corners, ids = detect_corners(CAMERA_MATRIX, DIST_MATRIX, image)
+    assert ids.flatten().tolist() == [10]
+
+    roi = markers_roi(corners, image.width, image.height)
+    _, _, _, roi_corners, roi_ids = detect_corners(CAMERA_MATRIX, DIST_MATRIX, image, roi=roi)
+
+    assert roi_ids.flatten().tolist() == [10]
+    assert np.allclose(roi_corners[0], corners[0], atol=0.5)
+
+    # nothing in the region, the whole image is searched
+    _, _, _, _, ids = detect_corners(CAMERA_MATRIX, DIST_MATRIX, image, roi=Roi(0, 0, 300, 300))
+    assert ids.flatten().tolist() == [10]
+
+
+def test_diagnostics(image: Image.Image, tmp_path, monkeypatch) -> None:
+
+    monkeypatch.chdir(tmp_path)
+
+    poses = estimate_camera_pose(CAMERA_MATRIX, DIST_MATRIX, image, 0.1)
+    assert list(poses) == [10]
+    assert not os.listdir(tmp_path)
+
+    path = str(tmp_path / "marker.jpg")
+    estimate_camera_pose(CAMERA_MATRIX, DIST_MATRIX, image, 0.1, diagnostics=path)
+    assert os.path.exists(path)
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from arcor2_calibration_data import JobState
+
+from arcor2.exceptions import Arcor2Exception
+from arcor2_calibration.jobs import JobException, JobNotFinished, Jobs, TooManyJobs, UnknownJob
+
+
+class SomeException(Arcor2Exception):
+    pass
+
+
+def sleep(duration: float) -> float:
+    time.sleep(duration)
+    return duration
+
+
+def fail(msg: str) -> None:
+    raise SomeException(msg)
+
+
+@pytest.fixture()
+def jobs():
+
+    jobs = Jobs(workers=2, max_jobs=3)
+    yield jobs
+    jobs.shutdown()
+
+
+def test_job(jobs: Jobs) -> None:
+
+    job = jobs.submit("test", sleep, 0.2)
+    assert job.state == JobState.QUEUED
+
+    with pytest.raises(JobNotFinished):
+        jobs.result(job.id)
+
+    assert jobs.wait(job.id) == 0.2
+
+    status = jobs.status(job.id)
+    assert status.state == JobState.FINISHED
+    assert status.started is not None and status.finished is not None
+    assert status.created <= status.started < status.finished
+    assert status.finished - status.started == pytest.approx(0.2, abs=0.1)
+
+    assert jobs.result(job.id) == 0.2
+
+    with pytest.raises(UnknownJob):
+        jobs.status("unknown")
+
+
+def test_failed_job(jobs: Jobs) -> None:
+
+    job = jobs.submit("test", fail, "Marker not found.")
+
+    with pytest.raises(SomeException, match="Marker not found."):
+        jobs.wait(job.id)
+
+    status = jobs.status(job.id)
+    assert status.state == JobState.FAILED
+    assert status.error == "Marker not found."
+
+
+def test_jobs_run_in_parallel(jobs: Jobs) -> None:
+
+    jobs.wait(jobs.submit("warm-up", sleep, 0).id)  # worker processes are started on demand
+
+    start = time.monotonic()
+    ids = [jobs.submit("test", sleep, 0.3).id for _ in range(2)]
+
+    for job_id in ids:
+        jobs.wait(job_id)
+
+    assert time.monotonic() - start < 0.55
+
+
+def test_cancel(jobs: Jobs) -> None:
+
+    running = [jobs.submit("test", sleep, 0.5) for _ in range(2)]
+    queued = jobs.submit("test", sleep, 0.5)
+
+    with pytest.raises(TooManyJobs):
+        jobs.submit("test", sleep, 0)
+
+    assert jobs.cancel(queued.id).state == JobState.CANCELLED
+
+    with pytest.raises(JobException, match="cancelled"):
+        jobs.wait(queued.id)
+
+    # the result of the running job is thrown away
+    assert jobs.cancel(running[0].id).state == JobState.CANCELLED
+    assert jobs.wait(running[1].id) == 0.5
+
+    with pytest.raises(JobException, match="cancelled"):
+        jobs.result(running[0].id)
+
+    assert jobs.status(running[0].id).state == JobState.CANCELLED
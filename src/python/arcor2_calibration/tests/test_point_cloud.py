@@ -0,0 +1,90 @@
+import io
+
+import numpy as np
+import pytest
+from urdfpy import URDF
+
+from arcor2_calibration.point_cloud import RobotPointCloud, robot_point_cloud, sample_mesh
+
+ROBOT = """<?xml version="1.0"?>
+<robot name="robot">
+  <link name="base_link">
+    <visual>
+      <geometry>
+        <box size="0.2 0.2 0.1"/>
+      </geometry>
+    </visual>
+  </link>
+  <link name="arm">
+    <visual>
+      <origin xyz="0.25 0 0"/>
+      <geometry>
+        <box size="0.5 0.05 0.05"/>
+      </geometry>
+    </visual>
+  </link>
+  <joint name="joint_1" type="revolute">
+    <parent link="base_link"/>
+    <child link="arm"/>
+    <origin xyz="0 0 0.1"/>
+    <axis xyz="0 0 1"/>
+    <limit lower="-3.14" upper="3.14" effort="1" velocity="1"/>
+  </joint>
+</robot>
+"""
+
+
+@pytest.fixture()
+def robot() -> URDF:
+
+    buff = io.BytesIO(ROBOT.encode())
+    buff.name = "robot.urdf"
+    return URDF.load(buff)
+
+
+def test_sample_mesh() -> None:
+
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]], dtype=float)
+    faces = np.array([[0, 1, 2], [1, 3, 2]])
+
+    res = sample_mesh(vertices, faces, 1000, np.random.default_rng(0))
+
+    assert res.points.shape == (1000, 3)
+    assert np.all(res.points[:, :2] >= 0) and np.all(res.points[:, :2] <= 1)
+    assert np.allclose(res.points[:, 2], 0)
+    assert np.allclose(res.normals, [0, 0, 1])
+
+    # both (equal) faces should be sampled similarly
+    lower = np.sum(res.points[:, 0] + res.points[:, 1] < 1)
+    assert 400 < lower < 600
+
+
+def test_transformed(robot: URDF) -> None:
+
+    cloud = RobotPointCloud(robot, 10000)
+
+    base = np.eye(4)
+    base[:3, 3] = [1, 2, 3]
+
+    straight = cloud.transformed({"joint_1": 0}, base)
+    assert straight.points.shape[0] == pytest.approx(10000, abs=2)
+    assert np.allclose(np.linalg.norm(straight.normals, axis=1), 1)
+
+    rotated = cloud.transformed({"joint_1": np.pi / 2}, base)
+
+    # the arm (above the base) is rotated, the base is not
+    arm = straight.points[:, 2] > 3.06
+    assert np.any(arm)
+    assert np.allclose(rotated.points[~arm], straight.points[~arm])
+    assert np.allclose(rotated.points[arm, 0] - 1, -(straight.points[arm, 1] - 2))
+    assert np.allclose(rotated.points[arm, 1] - 2, straight.points[arm, 0] - 1)
+    assert rotated.points[arm, 1].max() == pytest.approx(2.5, abs=1e-3)
+
+    # points are on the surface of boxes
+    assert straight.points[~arm, 0].min() >= 0.9 - 1e-9
+    assert straight.points[arm, 0].max() <= 1.5 + 1e-9
+
+
+def test_cache(robot: URDF) -> None:
+
+    assert robot_point_cloud(robot) is robot_point_cloud(robot)
@@ -0,0 +1,146 @@
+import io
+
+import numpy as np
+import pytest
+import quaternion
+from arcor2_calibration_data.client import IcpParameters
+from urdfpy import URDF
+
+from arcor2.data.camera import CameraParameters
+from arcor2.data.common import Joint, Orientation, Pose, Position
+from arcor2_calibration.point_cloud import RobotPointCloud
+from arcor2_calibration.robot import RobotCalibrationException, calibrate_robot
+
+ROBOT = """<?xml version="1.0"?>
+<robot name="robot">
+  <link name="base_link">
+    <visual>
+      <origin xyz="0 0 0.05"/>
+      <geometry>
+        <box size="0.2 0.2 0.1"/>
+      </geometry>
+    </visual>
+  </link>
+  <link name="column">
+    <visual>
+      <origin xyz="0 0 0.2"/>
+      <geometry>
+        <box size="0.06 0.06 0.4"/>
+      </geometry>
+    </visual>
+  </link>
+  <link name="arm">
+    <visual>
+      <origin xyz="0.15 0 0"/>
+      <geometry>
+        <box size="0.3 0.05 0.05"/>
+      </geometry>
+    </visual>
+  </link>
+  <joint name="joint_1" type="revolute">
+    <parent link="base_link"/>
+    <child link="column"/>
+    <origin xyz="0 0 0.1"/>
+    <axis xyz="0 0 1"/>
+    <limit lower="-3.14" upper="3.14" effort="1" velocity="1"/>
+  </joint>
+  <joint name="joint_2" type="revolute">
+    <parent link="column"/>
+    <child link="arm"/>
+    <origin xyz="0 0 0.4"/>
+    <axis xyz="0 1 0"/>
+    <limit lower="-3.14" upper="3.14" effort="1" velocity="1"/>
+  </joint>
+</robot>
+"""
+
+CAMERA = CameraParameters(300, 300, 159.5, 119.5, [0, 0, 0, 0, 0])
+WIDTH, HEIGHT = 320, 240
+
+
+def look_at(eye: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Camera (z forward, y down) pose."""
+
+    z = (target - eye) / np.linalg.norm(target - eye)
+    x = np.cross(z, [0, 0, 1])
+    x /= np.linalg.norm(x)
+
+    tr = np.identity(4)
+    tr[:3, 0] = x
+    tr[:3, 1] = np.cross(z, x)
+    tr[:3, 2] = z
+    tr[:3, 3] = eye
+    return tr
+
+
+def render_depth(points: np.ndarray, camera_tr: np.ndarray) -> np.ndarray:
+    """Renders (dense) points into a depth image (mm) using z-buffer."""
+
+    world_to_camera = np.linalg.inv(camera_tr)
+    pts = np.dot(points, world_to_camera[:3, :3].T) + world_to_camera[:3, 3]
+    pts = pts[pts[:, 2] > 0]
+
+    u = np.round(CAMERA.fx * pts[:, 0] / pts[:, 2] + CAMERA.cx).astype(int)
+    v = np.round(CAMERA.fy * pts[:, 1] / pts[:, 2] + CAMERA.cy).astype(int)
+    inside = (u >= 0) & (u < WIDTH) & (v >= 0) & (v < HEIGHT)
+
+    zbuffer = np.full(WIDTH * HEIGHT, np.inf)
+    np.minimum.at(zbuffer, v[inside] * WIDTH + u[inside], pts[inside, 2])
+    zbuffer[np.isinf(zbuffer)] = 0
+
+    return np.round(zbuffer * 1000).astype(np.uint16).reshape(HEIGHT, WIDTH)
+
+
+@pytest.fixture()
+def robot() -> URDF:
+
+    buff = io.BytesIO(ROBOT.encode())
+    buff.name = "robot.urdf"
+    return URDF.load(buff)
+
+
+@pytest.mark.parametrize(
+    "initial_pose",
+    [  # robot is not exactly where we thought
+        Pose(Position(0.12, 0.035, 0.005), Orientation.from_quaternion(quaternion.from_rotation_vector([0, 0, 0.05]))),
+        # a larger error, which needs the capture range of the coarsest stage
+        Pose(Position(0.17, 0.0, 0.02), Orientation.from_quaternion(quaternion.from_rotation_vector([0, 0, 0.1]))),
+    ],
+)
+def test_calibrate_robot(robot: URDF, initial_pose: Pose) -> None:
+
+    joints = [Joint("joint_1", 0.4), Joint("joint_2", -0.3)]
+    true_pose = Pose(Position(0.1, 0.05, 0), Orientation())
+
+    camera_tr = look_at(np.array([0.9, -0.7, 0.8]), np.array([0.1, 0.05, 0.25]))
+
+    points = RobotPointCloud(robot, 500000, seed=1).transformed(
+        {joint.name: joint.value for joint in joints}, true_pose.as_tr_matrix()
+    )
+    depth = render_depth(points.points, camera_tr)
+    assert np.count_nonzero(depth) > 1000
+
+    res = calibrate_robot(
+        joints, initial_pose, Pose.from_tr_matrix(camera_tr), CAMERA, robot, depth, icp=IcpParameters()
+    )
+
+    assert np.linalg.norm(np.array(list(res.position)) - np.array(list(true_pose.position))) < 0.003
+
+    rot_diff = quaternion.as_rotation_vector(
+        res.orientation.as_quaternion() * true_pose.orientation.as_quaternion().inverse()
+    )
+    assert np.linalg.norm(rot_diff) < np.radians(0.5)
+
+
+def test_no_stages(robot: URDF) -> None:
+
+    with pytest.raises(RobotCalibrationException):
+        calibrate_robot(
+            [Joint("joint_1", 0), Joint("joint_2", 0)],
+            Pose(),
+            Pose(),
+            CAMERA,
+            robot,
+            np.zeros((HEIGHT, WIDTH), dtype=np.uint16),
+            icp=IcpParameters([]),
+        )
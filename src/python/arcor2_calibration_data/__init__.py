@@ -1,11 +1,11 @@
 import os
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 from dataclasses_jsonschema import JsonSchemaMixin
 
 from arcor2 import package_version
-from arcor2.data.common import Pose
+from arcor2.data.common import Pose, StrEnum
 
 CALIBRATION_URL = os.getenv("ARCOR2_CALIBRATION_URL", "http://localhost:5014")
 SERVICE_NAME = "ARCOR2 Calibration Service"
@@ -34,3 +34,45 @@ class EstimatedPose(JsonSchemaMixin):
 
     pose: Pose
     quality: float
+
+
+@dataclass
+class MarkerStatistics(JsonSchemaMixin):
+    """How consistent were estimates of the camera pose based on one
+    marker."""
+
+    marker_id: int
+    detections: int  # in how many frames the marker was detected
+    outliers: int  # how many of the detections were not used
+    quality: float  # mean
+    position_deviation: float  # m
+    orientation_deviation: float  # rad
+
+
+@dataclass
+class MultiFrameEstimatedPose(EstimatedPose):
+
+    frames: int  # number of frames with at least one known marker
+    markers: List[MarkerStatistics] = field(default_factory=list)
+
+
+class JobState(StrEnum):
+
+    QUEUED: str = "queued"
+    RUNNING: str = "running"
+    FINISHED: str = "finished"
+    FAILED: str = "failed"
+    CANCELLED: str = "cancelled"
+
+
+@dataclass
+class Job(JsonSchemaMixin):
+    """Asynchronously processed calibration (times are UNIX timestamps)."""
+
+    id: str
+    kind: str
+    state: JobState
+    created: float
+    started: Optional[float] = None  # known once the job is finished
+    finished: Optional[float] = None
+    error: Optional[str] = None
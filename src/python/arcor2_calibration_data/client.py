@@ -1,17 +1,27 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from io import BytesIO
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
-from arcor2_calibration_data import CALIBRATION_URL, EstimatedPose, MarkerCorners
+import numpy as np
+from arcor2_calibration_data import CALIBRATION_URL, EstimatedPose, Job, MarkerCorners, MultiFrameEstimatedPose
 from dataclasses_jsonschema import JsonSchemaMixin
 from PIL.Image import Image
 
 from arcor2 import rest
-from arcor2.data.camera import CameraParameters
+from arcor2.data.camera import CameraParameters, Roi
 from arcor2.data.common import Joint, Pose
+from arcor2.image import depth_to_bytes, roi_to_str, shape_to_str
 
 
-def markers_corners(camera: CameraParameters, image: Image) -> List[MarkerCorners]:
+def _camera_params(camera: CameraParameters, roi: Optional[Roi]) -> Dict[str, Any]:
+
+    params = camera.to_dict()
+    if roi is not None:
+        params["roi"] = roi_to_str(roi)
+    return params
+
+
+def markers_corners(camera: CameraParameters, image: Image, roi: Optional[Roi] = None) -> List[MarkerCorners]:
 
     with BytesIO() as buff:
 
@@ -20,18 +30,21 @@ def markers_corners(camera: CameraParameters, image: Image) -> List[MarkerCorner
         return rest.call(
             rest.Method.PUT,
             f"{CALIBRATION_URL}/markers/corners",
-            params=camera.to_dict(),
+            params=_camera_params(camera, roi),
             list_return_type=MarkerCorners,
             files={"image": buff.getvalue()},
         )
 
 
-def estimate_camera_pose(camera: CameraParameters, image: Image, inverse: bool = False) -> EstimatedPose:
+def estimate_camera_pose(
+    camera: CameraParameters, image: Image, inverse: bool = False, roi: Optional[Roi] = None
+) -> EstimatedPose:
     """Returns camera pose with respect to the origin.
 
     :param camera: Camera parameters.
     :param image: Image.
     :param inverse: When set, the method returns pose of the origin wrt. the camera.
+    :param roi: Where to look for markers first (e.g. where they were detected last time).
     :return:
     """
 
@@ -39,7 +52,7 @@ def estimate_camera_pose(camera: CameraParameters, image: Image, inverse: bool =
 
         image.save(buff, format="PNG")
 
-        params = camera.to_dict()
+        params = _camera_params(camera, roi)
         params["inverse"] = inverse
 
         return rest.call(
@@ -51,6 +64,28 @@ def estimate_camera_pose(camera: CameraParameters, image: Image, inverse: bool =
         )
 
 
+@dataclass
+class IcpStage(JsonSchemaMixin):
+    """One level of the coarse-to-fine registration."""
+
+    voxel_size: float  # point clouds are downsampled to this resolution (m), 0 means no downsampling
+    max_correspondence_distance: float  # m
+    max_iterations: int = 30
+
+
+def default_icp_stages() -> List[IcpStage]:
+    # the coarsest stage keeps the capture range of the original (single-stage) registration
+    return [IcpStage(0.05, 0.5), IcpStage(0.02, 0.1), IcpStage(0.01, 0.03), IcpStage(0.004, 0.01)]
+
+
+@dataclass
+class IcpParameters(JsonSchemaMixin):
+
+    stages: List[IcpStage] = field(default_factory=default_icp_stages)
+    relative_fitness: float = 1e-6  # a stage ends when both relative changes are below these
+    relative_rmse: float = 1e-6
+
+
 @dataclass
 class CalibrateRobotArgs(JsonSchemaMixin):
 
@@ -59,17 +94,124 @@ class CalibrateRobotArgs(JsonSchemaMixin):
     camera_pose: Pose
     camera_parameters: CameraParameters
     urdf_uri: str
+    icp: IcpParameters = field(default_factory=IcpParameters)
+
+
+def _robot_files(args: CalibrateRobotArgs, depth_image: Union[Image, np.ndarray]) -> Dict[str, Union[bytes, str]]:
+
+    files: Dict[str, Union[bytes, str]] = {"args": args.to_json()}
+
+    if isinstance(depth_image, np.ndarray):
+        files["depth"] = depth_to_bytes(depth_image)
+        files["depthShape"] = shape_to_str(depth_image.shape)
+    else:
+        with BytesIO() as buff:
+            depth_image.save(buff, format="PNG")
+            files["image"] = buff.getvalue()
+
+    return files
+
+
+def calibrate_robot(args: CalibrateRobotArgs, depth_image: Union[Image, np.ndarray]) -> Pose:
+    """Estimates the robot pose.
+
+    :param args: Robot and camera state.
+    :param depth_image: Depth image (distances in mm), preferably as an array which is sent without encoding.
+    :return:
+    """
+
+    return rest.call(
+        rest.Method.PUT,
+        f"{CALIBRATION_URL}/calibrate/robot",
+        return_type=Pose,
+        files=_robot_files(args, depth_image),
+        timeout=rest.Timeout(3.05, 240),
+    )
+
+
+def start_robot_calibration(args: CalibrateRobotArgs, depth_image: Union[Image, np.ndarray]) -> Job:
+    """Starts the robot calibration without waiting for it, the result can be
+    obtained using robot_calibration_result.
+
+    :param args: Robot and camera state.
+    :param depth_image: Depth image (distances in mm).
+    :return:
+    """
+
+    return rest.call(
+        rest.Method.POST,
+        f"{CALIBRATION_URL}/calibrate/robot/jobs",
+        return_type=Job,
+        files=_robot_files(args, depth_image),
+    )
+
+
+def estimate_camera_pose_batch(
+    camera: CameraParameters, images: Sequence[Image], inverse: bool = False, roi: Optional[Roi] = None
+) -> MultiFrameEstimatedPose:
+    """Returns camera pose with respect to the origin, estimated from
+    multiple frames (in one request).
+
+    :param camera: Camera parameters.
+    :param images: Frames (of a static scene).
+    :param inverse: When set, the method returns pose of the origin wrt. the camera.
+    :param roi: Where to look for markers first.
+    :return:
+    """
+
+    files: List[Tuple[str, bytes]] = []
+
+    for image in images:
+        with BytesIO() as buff:
+            image.save(buff, format="PNG")
+            files.append(("images", buff.getvalue()))
 
+    params = _camera_params(camera, roi)
+    params["inverse"] = inverse
 
-def calibrate_robot(args: CalibrateRobotArgs, depth_image: Image) -> Pose:
+    return rest.call(
+        rest.Method.PUT,
+        f"{CALIBRATION_URL}/calibrate/camera/batch",
+        params=params,
+        return_type=MultiFrameEstimatedPose,
+        files=files,
+        timeout=rest.Timeout(3.05, 60),
+    )
+
+
+def start_camera_calibration(
+    camera: CameraParameters, image: Image, inverse: bool = False, roi: Optional[Roi] = None
+) -> Job:
+    """Starts the camera calibration without waiting for it, the result can
+    be obtained using camera_calibration_result."""
 
     with BytesIO() as buff:
-        depth_image.save(buff, format="PNG")
+
+        image.save(buff, format="PNG")
+
+        params = _camera_params(camera, roi)
+        params["inverse"] = inverse
 
         return rest.call(
-            rest.Method.PUT,
-            f"{CALIBRATION_URL}/calibrate/robot",
-            return_type=Pose,
-            files={"image": buff.getvalue(), "args": args.to_json()},
-            timeout=rest.Timeout(3.05, 240),
+            rest.Method.POST,
+            f"{CALIBRATION_URL}/calibrate/camera/jobs",
+            params=params,
+            return_type=Job,
+            files={"image": buff.getvalue()},
         )
+
+
+def job(job_id: str) -> Job:
+    return rest.call(rest.Method.GET, f"{CALIBRATION_URL}/jobs/{job_id}", return_type=Job)
+
+
+def cancel_job(job_id: str) -> Job:
+    return rest.call(rest.Method.DELETE, f"{CALIBRATION_URL}/jobs/{job_id}", return_type=Job)
+
+
+def robot_calibration_result(job_id: str) -> Pose:
+    return rest.call(rest.Method.GET, f"{CALIBRATION_URL}/jobs/{job_id}/result", return_type=Pose)
+
+
+def camera_calibration_result(job_id: str) -> EstimatedPose:
+    return rest.call(rest.Method.GET, f"{CALIBRATION_URL}/jobs/{job_id}/result", return_type=EstimatedPose)
@@ -1,19 +1,26 @@
 import math
 import time
 from abc import ABCMeta, abstractmethod
-from typing import List
+from collections import deque
+from typing import Deque, Dict, List, Sequence, Tuple
 
+import numpy as np
 import quaternion
-from arcor2_dobot.dobot_api import MODE_PTP, DobotApi, DobotApiException
+from arcor2_dobot.dobot_api import MAX_QUEUE_LEN, MODE_PTP, POLL_RATE, DobotApi, DobotApiException
 
 import arcor2.transformations as tr
-from arcor2.data.common import Joint, Orientation, Pose, StrEnum
+from arcor2 import env
+from arcor2.data.common import Joint, Orientation, Pose, Position, StrEnum
 from arcor2.exceptions import Arcor2NotImplemented
 from arcor2.helpers import NonBlockingLock
 from arcor2.object_types.abstract import RobotException
 
 # TODO jogging
 
+DOBOT_POLL_RATE = env.get_float("ARCOR2_DOBOT_POLL_RATE", POLL_RATE)
+DOBOT_TRACE = env.get_int("ARCOR2_DOBOT_TRACE", 0)  # number of messages to be logged on communication error
+QUEUE_DEPTH = MAX_QUEUE_LEN // 2  # how many moves might be queued at once (leaves space for other commands)
+
 
 class DobotException(RobotException):
     pass
@@ -33,11 +40,20 @@ MOVE_TYPE_MAPPING = {
 }
 
 
+def wrap_angles(angles: np.ndarray) -> np.ndarray:
+    """Wraps angles into the range of <-pi, pi)."""
+
+    return (angles + np.pi) % (2 * np.pi) - np.pi
+
+
 class Dobot(metaclass=ABCMeta):
 
     ROTATE_EEF = Orientation.from_rotation_vector(y=math.pi)
     UNROTATE_EEF = ROTATE_EEF.inversed()
 
+    joint_names: Sequence[str] = ()
+    valid_ranges: Dict[str, Tuple[float, float]] = {}
+
     def __init__(self, pose: Pose, port: str = "/dev/dobot", simulator: bool = False) -> None:
 
         self.pose = pose
@@ -47,7 +63,7 @@ class Dobot(metaclass=ABCMeta):
         if not self.simulator:
 
             try:
-                self._dobot = DobotApi(port)
+                self._dobot = DobotApi(port, DOBOT_POLL_RATE, DOBOT_TRACE)
             except DobotApiException as e:
                 raise DobotApiException("Could not connect to the robot.") from e
 
@@ -87,14 +103,147 @@ class Dobot(metaclass=ABCMeta):
 
         self._dobot.set_hht_trig_output(value)
 
-    def _inverse_kinematics(self, pose: Pose) -> List[Joint]:
+    def inverse_kinematics_array(self, targets: np.ndarray) -> np.ndarray:
+        """Computes inverse kinematics for many targets at once.
+
+        Works with robot-relative targets, joint limits are not checked.
+
+        :param targets: Array of shape (N, 4) - x, y, z and rotation of the end-effector around the z axis.
+        :return: Array of shape (N, number of joints), rows of targets without a solution are NaN.
+        """
+
         raise Arcor2NotImplemented()
 
-    def inverse_kinematics(self, pose: Pose) -> List[Joint]:
+    def forward_kinematics_array(self, joints: np.ndarray) -> np.ndarray:
+        """Computes forward kinematics for many joint vectors at once.
+
+        :param joints: Array of shape (N, number of joints).
+        :return: Robot-relative targets, array of shape (N, 4) - see inverse_kinematics_array.
+        """
+
         raise Arcor2NotImplemented()
 
+    def joints_within_limits(self, joints: np.ndarray) -> np.ndarray:
+        """Checks joint vectors (rows of the array) against the joint limits.
+
+        :param joints: Array of shape (N, number of joints).
+        :return: Boolean array of shape (N,), NaN values are never within the limits.
+        """
+
+        lower = np.full(len(self.joint_names), -np.inf)
+        upper = np.full(len(self.joint_names), np.inf)
+
+        for idx, name in enumerate(self.joint_names):
+            if name in self.valid_ranges:
+                lower[idx], upper[idx] = self.valid_ranges[name]
+
+        return np.all((joints >= lower) & (joints <= upper), axis=1)
+
+    def validate_joints(self, joints: List[Joint]) -> None:
+
+        for joint in joints:
+            if joint.name in self.valid_ranges:
+                vrange = self.valid_ranges[joint.name]
+                if not vrange[0] <= joint.value <= vrange[1]:
+                    raise DobotException(
+                        "Value {:.3f} for joint {:s} is out of the range of {:s}.".format(
+                            joint.value, joint.name, str(vrange)
+                        )
+                    )
+
+    def _targets(self, poses: Sequence[Pose]) -> np.ndarray:
+        """Converts robot-relative poses into IK targets.
+
+        The end-effector can only rotate around the z axis (pointing
+        down).
+        """
+
+        quats = quaternion.as_quat_array(
+            [[p.orientation.w, p.orientation.x, p.orientation.y, p.orientation.z] for p in poses]
+        )
+        unrotated = quaternion.as_float_array(self.UNROTATE_EEF.as_quaternion() * quats).reshape(-1, 4)
+
+        eps = 1e-6
+
+        if np.any(np.abs(unrotated[:, 1:3]) > eps):
+            raise DobotApiException("Impossible orientation.")
+
+        sign = np.where(unrotated[:, 0] < 0, -1.0, 1.0)  # q and -q are the same
+
+        targets = np.empty((len(poses), 4))
+        targets[:, :3] = [list(p.position) for p in poses]
+        targets[:, 3] = 2 * np.arctan2(unrotated[:, 3] * sign, unrotated[:, 0] * sign)
+        return targets
+
+    def _poses(self, targets: np.ndarray) -> List[Pose]:
+        """Converts targets back into (robot-relative) poses."""
+
+        rotations = np.zeros((len(targets), 3))
+        rotations[:, 2] = targets[:, 3]
+        quats = self.ROTATE_EEF.as_quaternion() * quaternion.from_rotation_vector(rotations)
+
+        return [
+            Pose(Position(*(float(v) for v in target[:3])), Orientation.from_quaternion(quat))
+            for target, quat in zip(targets, quats)
+        ]
+
+    def _joints(self, values: np.ndarray) -> List[Joint]:
+        return [Joint(name, float(value)) for name, value in zip(self.joint_names, values)]
+
+    def _ik(self, poses: Sequence[Pose]) -> np.ndarray:
+        """Computes inverse kinematics for robot-relative poses, raises
+        DobotException if any of them is unreachable."""
+
+        joints = self.inverse_kinematics_array(self._targets(poses))
+
+        if np.isnan(joints).any():
+            raise DobotException("Failed to compute IK.")
+
+        out_of_limits = np.flatnonzero(~self.joints_within_limits(joints))
+
+        if out_of_limits.size:
+            self.validate_joints(self._joints(joints[out_of_limits[0]]))  # raises with details
+
+        return joints
+
+    def _inverse_kinematics(self, pose: Pose) -> List[Joint]:
+        """Computes inverse kinematics.
+
+        Works with robot-relative pose.
+
+        :param pose: IK target pose (relative to robot)
+        :return: Inverse kinematics
+        """
+
+        return self._joints(self._ik([pose])[0])
+
+    def inverse_kinematics(self, pose: Pose) -> List[Joint]:
+        """Computes inverse kinematics.
+
+        Works with absolute pose.
+
+        :param pose: IK target pose
+        :return: Inverse kinematics
+        """
+
+        return self._inverse_kinematics(tr.make_pose_rel(self.pose, pose))
+
     def forward_kinematics(self, joints: List[Joint]) -> Pose:
-        raise Arcor2NotImplemented()
+        """Computes forward kinematics.
+
+        Outputs absolute pose.
+
+        :param joints: Input joint values
+        :return: Pose of the given end effector
+        """
+
+        if len(joints) != len(self.joint_names):
+            raise DobotException("Invalid number of joints.")
+
+        self.validate_joints(joints)
+
+        targets = self.forward_kinematics_array(np.array([[joint.value for joint in joints]], dtype=float))
+        return tr.make_pose_abs(self.pose, self._poses(targets)[0])
 
     def _handle_pose_out(self, pose: Pose) -> None:
         """This is called (only for a real robot) from `get_end_effector_pose`
@@ -116,15 +265,6 @@ class Dobot(metaclass=ABCMeta):
 
         pass
 
-    def _check_orientation(self, pose: Pose) -> None:
-
-        unrotated = self.UNROTATE_EEF * pose.orientation
-
-        eps = 1e-6
-
-        if abs(unrotated.x) > eps or abs(unrotated.y) > eps:
-            raise DobotApiException("Impossible orientation.")
-
     def get_end_effector_pose(self) -> Pose:
 
         if self.simulator:
@@ -171,6 +311,27 @@ class Dobot(metaclass=ABCMeta):
         :return:
         """
 
+        self.move_sequence([pose], move_type, velocity, acceleration)
+
+    def move_sequence(
+        self, poses: List[Pose], move_type: MoveType, velocity: float = 50.0, acceleration: float = 50.0
+    ) -> None:
+        """Moves the robot's end-effector through the poses without stopping
+        between them.
+
+        Moves are put into the command queue of the robot (at most QUEUE_DEPTH at once),
+        only the last one is waited for.
+
+        :param poses: Target poses.
+        :move_type: Move type.
+        :param velocity: Speed of move (percent).
+        :param acceleration: Acceleration of move (percent).
+        :return:
+        """
+
+        if not poses:
+            raise DobotException("No pose given.")
+
         if not (0.0 <= velocity <= 100.0):
             raise DobotException("Invalid velocity.")
 
@@ -179,36 +340,44 @@ class Dobot(metaclass=ABCMeta):
 
         with self._move_lock:
 
-            rp = tr.make_pose_rel(self.pose, pose)
+            rps = [tr.make_pose_rel(self.pose, pose) for pose in poses]
 
-            # prevent Dobot from moving when given an unreachable goal
-            try:
-                jv = self._inverse_kinematics(rp)
-            except Arcor2NotImplemented:  # TODO remove this once M1 has IK
-                pass
+            # prevent Dobot from moving when any of the goals is unreachable
+            jvs = self._ik(rps)
 
             if self.simulator:
-                self._joint_values = jv
-                time.sleep((100.0 - velocity) * 0.05)
+                self._joint_values = self._joints(jvs[-1])
+                time.sleep((100.0 - velocity) * 0.05 * len(rps))
                 return
 
-            self._handle_pose_in(rp)
+            for rp in rps:
+                self._handle_pose_in(rp)
 
             try:
                 self._dobot.clear_alarms()
-                unrotated = self.UNROTATE_EEF * rp.orientation
-                rotation = math.degrees(quaternion.as_rotation_vector(unrotated.as_quaternion())[2])
                 self._dobot.speed(velocity, acceleration)
 
-                self._dobot.wait_for_cmd(
-                    self._dobot.move_to(
-                        rp.position.x * 1000.0,
-                        rp.position.y * 1000.0,
-                        rp.position.z * 1000.0,
-                        rotation,
-                        MOVE_TYPE_MAPPING[move_type],
+                queued: Deque[int] = deque()
+
+                for rp in rps:
+
+                    while len(queued) >= QUEUE_DEPTH:
+                        self._dobot.wait_for_cmd(queued.popleft())
+
+                    unrotated = self.UNROTATE_EEF * rp.orientation
+                    rotation = math.degrees(quaternion.as_rotation_vector(unrotated.as_quaternion())[2])
+
+                    queued.append(
+                        self._dobot.move_to(
+                            rp.position.x * 1000.0,
+                            rp.position.y * 1000.0,
+                            rp.position.z * 1000.0,
+                            rotation,
+                            MOVE_TYPE_MAPPING[move_type],
+                        )
                     )
-                )
+
+                self._dobot.wait_for_cmd(queued[-1])
             except DobotApiException as e:
                 raise DobotException("Move failed.") from e
 
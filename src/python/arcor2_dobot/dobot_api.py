@@ -1,16 +1,21 @@
+import heapq
+import itertools
 import logging
 import math
 import struct
+import time
 from collections import deque
+from concurrent import futures
 from enum import IntEnum
-from threading import RLock
-from typing import Deque, NamedTuple, Optional, Set
+from threading import Lock, RLock, Thread
+from typing import Callable, Deque, List, NamedTuple, Optional, Set, Tuple
 
 import numpy as np
 import serial
 from serial.tools import list_ports
 
 MAX_QUEUE_LEN = 32
+POLL_RATE = 20.0  # how often (Hz) is the index of the current command read while waiting for a command
 
 """
 This was originally https://github.com/luismesas/pydobot
@@ -241,11 +246,212 @@ class Alarm(IntEnum):
     MOTOR_ENDIO_CAN_BROKE = 0xB2
 
 
+def hex_bytes(data: bytes) -> str:
+    return ":".join("{:02x}".format(x) for x in data)
+
+
+class TraceRecord(NamedTuple):
+
+    timestamp: float
+    sent: bool
+    length: int  # of the whole message
+    data: bytes  # might be truncated
+
+    def __str__(self) -> str:
+        return (
+            f"{time.strftime('%H:%M:%S', time.localtime(self.timestamp))}.{int(self.timestamp % 1 * 1000):03d} "
+            f"{'>>' if self.sent else '<<'} {hex_bytes(self.data)}{'...' if len(self.data) < self.length else ''}"
+        )
+
+
+class TraceRecorder:
+    """Binary ring buffer of the recent serial traffic.
+
+    Recording just copies bytes into a preallocated buffer (nothing is
+    formatted), so it might be enabled all the time and dumped when
+    something goes wrong.
+    """
+
+    HEADER = struct.Struct("<d?H")  # timestamp, sent, length
+    PAYLOAD = 64  # longer messages are truncated
+
+    def __init__(self, size: int = 256) -> None:
+
+        if size < 1:
+            raise DobotApiException("Invalid size of the trace.")
+
+        self._size = size
+        self._slot = self.HEADER.size + self.PAYLOAD
+        self._buffer = bytearray(size * self._slot)
+        self._count = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self._size)
+
+    def record(self, sent: bool, data: bytes) -> None:
+
+        length = min(len(data), self.PAYLOAD)
+
+        with self._lock:
+            offset = (self._count % self._size) * self._slot
+            self.HEADER.pack_into(self._buffer, offset, time.time(), sent, len(data))
+            offset += self.HEADER.size
+            self._buffer[offset : offset + length] = data[:length]
+            self._count += 1
+
+    def records(self) -> List[TraceRecord]:
+        """Recorded messages, the oldest first."""
+
+        with self._lock:
+            buffer = bytes(self._buffer)
+            count = self._count
+
+        ret: List[TraceRecord] = []
+
+        for idx in range(max(count - self._size, 0), count):
+            offset = (idx % self._size) * self._slot
+            timestamp, sent, length = self.HEADER.unpack_from(buffer, offset)
+            offset += self.HEADER.size
+            ret.append(TraceRecord(timestamp, sent, length, buffer[offset : offset + min(length, self.PAYLOAD)]))
+
+        return ret
+
+    def dump(self) -> str:
+        return "\n".join(str(record) for record in self.records())
+
+
+class CommandTracker:
+    """Keeps track of executed queued commands.
+
+    The index of the current command is read at most with the given
+    rate (and not at all when nobody waits), so the serial link is free
+    for other requests (e.g. reading joints) during a move. Any read of
+    the index (e.g. explicit one) postpones the next poll.
+    """
+
+    def __init__(self, get_index: Callable[[], int], poll_rate: float = POLL_RATE) -> None:
+
+        if poll_rate <= 0:
+            raise DobotApiException("Invalid poll rate.")
+
+        self._get_index = get_index
+        self._period = 1.0 / poll_rate
+
+        self._lock = Lock()
+        self._pending: List[Tuple[int, int, futures.Future]] = []  # heap of (index, sequence, future)
+        self._sequence = itertools.count()
+        self._current = -1  # index of the last executed command
+        self._updated = 0.0  # when the index was read last time (time.monotonic)
+        self._thread: Optional[Thread] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def update(self, index: int) -> None:
+        """Resolves futures of commands that were already executed.
+
+        :param index: Index of the current command.
+        :return:
+        """
+
+        done: List[futures.Future] = []
+
+        with self._lock:
+            self._current = index
+            self._updated = time.monotonic()
+            while self._pending and self._pending[0][0] <= index:
+                done.append(heapq.heappop(self._pending)[2])
+
+        for fut in done:
+            if not fut.done():  # might be cancelled by a caller
+                fut.set_result(None)
+
+    def future(self, index: int) -> futures.Future:
+        """Returns future which is done once the command with the index is
+        executed."""
+
+        fut: futures.Future = futures.Future()
+
+        with self._lock:
+
+            if index <= self._current:
+                fut.set_result(None)
+                return fut
+
+            heapq.heappush(self._pending, (index, next(self._sequence), fut))
+
+            if self._thread is None:
+                self._thread = Thread(target=self._poll, name="DobotCommandTracker", daemon=True)
+                self._thread.start()
+
+        return fut
+
+    def reset(self) -> None:
+        """The last known index is forgotten and pending futures fail, as
+        their commands won't be executed (e.g. when the queue is
+        cleared)."""
+
+        with self._lock:
+            self._current = -1
+            pending, self._pending = self._pending, []
+
+        self._fail(pending, DobotApiException("Queue cleared."))
+
+    def fail(self, exc: Exception) -> None:
+        """Fails all pending futures."""
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        self._fail(pending, exc)
+
+    @staticmethod
+    def _fail(pending: List[Tuple[int, int, futures.Future]], exc: Exception) -> None:
+
+        for _, _, fut in pending:
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def _poll(self) -> None:
+
+        while True:
+
+            with self._lock:
+
+                if not self._pending:
+                    self._thread = None
+                    return
+
+                delay = self._updated + self._period - time.monotonic()
+                if delay <= 0:
+                    self._updated = time.monotonic()  # the read might fail
+
+            if delay > 0:
+                time.sleep(delay)
+                continue
+
+            try:
+                self._get_index()  # calls update()
+            except Exception as e:  # the thread can't just die, someone is waiting
+                exc = DobotApiException("Failed to get index of the current command.")
+                exc.__cause__ = e
+                self.fail(exc)
+
+
 class DobotApi:
-    def __init__(self, port: Optional[str] = None) -> None:
+    def __init__(self, port: Optional[str] = None, poll_rate: float = POLL_RATE, trace: int = 0) -> None:
+        """
+        :param port: Serial port, autodetected if not given.
+        :param poll_rate: How often (Hz) is the robot asked if a command was executed.
+        :param trace: How many recent messages are kept in order to be logged on error (disabled if 0).
+        """
 
-        self.logger = logging.Logger(__name__)
+        self.logger = logging.getLogger(__name__)
         self._lock = RLock()
+        self.trace: Optional[TraceRecorder] = TraceRecorder(trace) if trace else None
+        self._tracker = CommandTracker(self._get_queued_cmd_current_index, poll_rate)
 
         if port is None:
             # Find the serial port
@@ -285,24 +491,43 @@ class DobotApi:
             self.clear_alarms()
 
     def close(self) -> None:
+        self._tracker.fail(DobotApiException("Connection closed."))
         with self._lock:
             self._ser.close()
         self.logger.debug("%s closed" % self._ser.name)
 
+    def dump_trace(self) -> None:
+        """Logs recently exchanged messages (if they are recorded)."""
+
+        if self.trace is not None:
+            self.logger.error(f"Last {len(self.trace)} message(s) exchanged with the robot:\n{self.trace.dump()}")
+
     def _send_command(self, msg) -> Message:
-        with self._lock:
-            self._ser.reset_input_buffer()
-            self._send_message(msg)
-            msg = self._read_message()
+        try:
+            with self._lock:
+                self._ser.reset_input_buffer()
+                self._send_message(msg)
+                msg = self._read_message()
+        except serial.SerialException as e:
+            self.dump_trace()
+            raise DobotApiException("Communication failed.") from e
         if msg is None:
+            self.dump_trace()
             raise DobotApiException("No response!")
         return msg
 
     def _send_message(self, msg) -> None:
 
-        self.logger.debug(msg)
+        data = msg.bytes()
+
+        if self.trace is not None:
+            self.trace.record(True, data)
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f">> {hex_bytes(data)}")
+
         with self._lock:
-            self._ser.write(msg.bytes())
+            self._ser.write(data)
 
     def _read_message(self) -> Optional[Message]:
 
@@ -325,10 +550,13 @@ class DobotApi:
                 b.extend(bytearray([payload_length]))
                 b.extend(payload_checksum)
                 msg = Message(b)
-                self.logger.debug("Length", payload_length)
-                self.logger.debug(payload_checksum)
-                self.logger.debug("MessageID:", payload_checksum[0])
-                self.logger.debug("<<", ":".join("{:02x}".format(x) for x in b))
+
+                if self.trace is not None:
+                    self.trace.record(False, b)
+
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug(f"<< {hex_bytes(b)} (id: {msg.id}, length: {payload_length})")
+
                 return msg
         return None
 
@@ -500,14 +728,18 @@ class DobotApi:
         msg = Message()
         msg.id = 245
         msg.ctrl = 0x01
-        return self._send_command(msg)
+        response = self._send_command(msg)
+        self._tracker.reset()
+        return response
 
     def _get_queued_cmd_current_index(self) -> int:
         msg = Message()
         msg.id = 246
         response = self._send_command(msg)
         if response and response.id == 246:
-            return self._extract_cmd_index(response)
+            index = self._extract_cmd_index(response)
+            self._tracker.update(index)
+            return index
         else:
             return -1
 
@@ -515,13 +747,22 @@ class DobotApi:
     def _extract_cmd_index(response) -> int:
         return struct.unpack_from("I", response.params, 0)[0]
 
-    def wait_for_cmd(self, cmd_id: int) -> None:
-        current_cmd_id = self._get_queued_cmd_current_index()
-        while cmd_id > current_cmd_id:
-            self.logger.debug("Current-ID", current_cmd_id)
-            self.logger.debug("Waiting for", cmd_id)
+    def cmd_future(self, cmd_id: int) -> futures.Future:
+        """Future which is done once the queued command is executed."""
 
-            current_cmd_id = self._get_queued_cmd_current_index()
+        return self._tracker.future(cmd_id)
+
+    def wait_for_cmd(self, cmd_id: int, timeout: Optional[float] = None) -> None:
+        """Blocks until the queued command is executed.
+
+        The serial link is not occupied while waiting, so other commands
+        (e.g. get_pose) might be sent meanwhile.
+        """
+
+        try:
+            self.cmd_future(cmd_id).result(timeout)
+        except futures.TimeoutError as e:
+            raise DobotApiException(f"Command {cmd_id} not executed in time.") from e
 
     def _set_home_cmd(self) -> Message:
         msg = Message()
@@ -1,10 +1,11 @@
 import time
-from typing import List
+from typing import Dict, List, Tuple
 
-from arcor2_dobot.dobot import Dobot, DobotException
+import numpy as np
+from arcor2_dobot.dobot import Dobot, DobotException, wrap_angles
 from arcor2_dobot.dobot_api import DobotApiException
 
-from arcor2.data.common import Joint, Pose, StrEnum
+from arcor2.data.common import Joint, Pose, Position, StrEnum
 
 
 class Joints(StrEnum):
@@ -16,23 +17,74 @@ class Joints(StrEnum):
 
 
 class DobotM1(Dobot):
+
+    # Dimensions in meters (according to URDF)
+    arm_1_length = 0.2
+    arm_2_length = 0.2
+
+    # origin of the robot's own coordinate system (axis of the first joint, z equals to the value of the z axis joint)
+    origin = Position(0.11, 0.0, -0.01)
+
+    joint_names = list(Joints)
+
+    # according to URDF
+    valid_ranges: Dict[str, Tuple[float, float]] = {
+        Joints.J1: (-1.4835298642, 1.4835298642),
+        Joints.J2: (-2.35619449019, 2.35619449019),
+        Joints.J3: (0.02, 0.23),
+    }
+
     def __init__(self, pose: Pose, port: str = "/dev/dobot", simulator: bool = False) -> None:
         super(DobotM1, self).__init__(pose, port, simulator)
 
         if self.simulator:
-            self._joint_values = [Joint(Joints.J1, 0), Joint(Joints.J2, 0), Joint(Joints.J3, 0), Joint(Joints.J4, 0)]
+            self._joint_values = [Joint(Joints.J1, 0), Joint(Joints.J2, 0), Joint(Joints.J3, 0.1), Joint(Joints.J4, 0)]
 
     def _handle_pose_in(self, pose: Pose) -> None:
-
-        pose.position.x -= 0.11
-        pose.position.y -= 0.0
-        pose.position.z += 0.01
+        pose.position = pose.position - self.origin
 
     def _handle_pose_out(self, pose: Pose) -> None:
+        pose.position = pose.position + self.origin
+
+    def inverse_kinematics_array(self, targets: np.ndarray) -> np.ndarray:
+        """Computes inverse kinematics.
+
+        Out of the two possible elbow configurations, the one with positive J2 is preferred if it is within the
+        joint limits.
+        """
+
+        x = targets[:, 0] - self.origin.x
+        y = targets[:, 1] - self.origin.y
+        z = targets[:, 2] - self.origin.z
+
+        l1 = self.arm_1_length
+        l2 = self.arm_2_length
+
+        # law of cosines (NaN for unreachable targets)
+        with np.errstate(invalid="ignore"):
+            elbow = np.arccos((x ** 2 + y ** 2 - l1 ** 2 - l2 ** 2) / (2.0 * l1 * l2))
+
+        solutions = []
+
+        for j2 in (elbow, -elbow):
+            j1 = wrap_angles(np.arctan2(y, x) - np.arctan2(l2 * np.sin(j2), l1 + l2 * np.cos(j2)))
+            solutions.append(np.column_stack((j1, j2, z, wrap_angles(targets[:, 3] - j1 - j2))))
+
+        return np.where(self.joints_within_limits(solutions[0])[:, np.newaxis], solutions[0], solutions[1])
+
+    def forward_kinematics_array(self, joints: np.ndarray) -> np.ndarray:
+
+        j1 = joints[:, 0]
+        j12 = j1 + joints[:, 1]
 
-        pose.position.x += 0.11
-        pose.position.y += 0.0
-        pose.position.z -= 0.01
+        return np.column_stack(
+            (
+                self.arm_1_length * np.cos(j1) + self.arm_2_length * np.cos(j12) + self.origin.x,
+                self.arm_1_length * np.sin(j1) + self.arm_2_length * np.sin(j12) + self.origin.y,
+                joints[:, 2] + self.origin.z,
+                j12 + joints[:, 3],
+            )
+        )
 
     def robot_joints(self) -> List[Joint]:
 
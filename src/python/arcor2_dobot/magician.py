@@ -1,12 +1,11 @@
 import math
 from typing import Dict, List, Tuple
 
-import quaternion
+import numpy as np
 from arcor2_dobot.dobot import Dobot, DobotException
 from arcor2_dobot.dobot_api import DobotApiException
 
-import arcor2.transformations as tr
-from arcor2.data.common import Joint, Orientation, Pose, Position, StrEnum
+from arcor2.data.common import Joint, Pose, StrEnum
 
 
 class Joints(StrEnum):
@@ -52,133 +51,65 @@ class DobotMagician(Dobot):
         pose.position.y += self.link_4_length * math.sin(base_angle)
         pose.position.z -= self.end_effector_length
 
+    joint_names = list(Joints)
+
     # TODO joint4/5
-    valid_ranges: Dict[Joints, Tuple[float, float]] = {
+    valid_ranges: Dict[str, Tuple[float, float]] = {
         Joints.J1: (-2, 2),
         Joints.J2: (-0.1, 1.46),
         Joints.J3: (-0.95, 1.15),
     }
 
-    def validate_joints(self, joints: List[Joint]) -> None:
-
-        for joint in joints:
-            if joint.name in self.valid_ranges:
-                vrange = self.valid_ranges[Joints(joint.name)]
-                if vrange[0] > joint.value < vrange[1]:
-                    raise DobotException(
-                        "Value {:.3f} for joint {:s} is out of the range of {:s}.".format(
-                            joint.value, joint.name, str(vrange)
-                        )
-                    )
-
-    def _inverse_kinematics(self, pose: Pose) -> List[Joint]:
+    def inverse_kinematics_array(self, targets: np.ndarray) -> np.ndarray:
         """Computes inverse kinematics.
 
-        Works with robot-relative pose.
-
         Inspired by DobotKinematics.py from open-dobot project and DobotInverseKinematics.py from BenchBot.
-
-        :param pose: IK target pose (relative to robot)
-        :return: Inverse kinematics
         """
 
-        self._check_orientation(pose)
-
-        # TODO this is probably not working properly (use similar solution as in _check_orientation?)
-        _, _, yaw = quaternion.as_euler_angles(pose.orientation.as_quaternion())
-
-        x = pose.position.x
-        y = pose.position.y
-        z = pose.position.z + self.end_effector_length
+        x = targets[:, 0]
+        y = targets[:, 1]
+        z = targets[:, 2] + self.end_effector_length
 
         # pre-compute distances
         # radial position of end effector in the x-y plane
-        r = math.sqrt(math.pow(x, 2) + math.pow(y, 2))
-        rho_sq = pow(r - self.link_4_length, 2) + pow(z, 2)
-        rho = math.sqrt(rho_sq)  # distance b/w the ends of the links joined at the elbow
+        r = np.hypot(x, y)
+        rho_sq = (r - self.link_4_length) ** 2 + z ** 2
+        rho = np.sqrt(rho_sq)  # distance b/w the ends of the links joined at the elbow
 
         l2_sq = self.link_2_length ** 2
         l3_sq = self.link_3_length ** 2
 
-        # law of cosines
-        try:
-            alpha = math.acos((l2_sq + rho_sq - l3_sq) / (2.0 * self.link_2_length * rho))
-            gamma = math.acos((l2_sq + l3_sq - rho_sq) / (2.0 * self.link_2_length * self.link_3_length))
-        except ValueError:
-            raise DobotException("Failed to compute IK.")
+        # law of cosines (NaN for unreachable targets)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            alpha = np.arccos((l2_sq + rho_sq - l3_sq) / (2.0 * self.link_2_length * rho))
+            gamma = np.arccos((l2_sq + l3_sq - rho_sq) / (2.0 * self.link_2_length * self.link_3_length))
 
-        beta = math.atan2(z, r - self.link_4_length)
+        beta = np.arctan2(z, r - self.link_4_length)
 
         # joint angles
-        baseAngle = math.atan2(y, x)
-        rearAngle = math.pi / 2 - beta - alpha
-        frontAngle = math.pi / 2 - gamma
-
-        joints = [
-            Joint(Joints.J1, baseAngle),
-            Joint(Joints.J2, rearAngle),
-            Joint(Joints.J3, frontAngle),
-            Joint(Joints.J4, -rearAngle - frontAngle),
-            Joint(Joints.J5, yaw - baseAngle),
-        ]
-        self.validate_joints(joints)
-        return joints
-
-    def inverse_kinematics(self, pose: Pose) -> List[Joint]:
-        """Computes inverse kinematics.
-
-        Works with absolute pose.
+        base_angle = np.arctan2(y, x)
+        rear_angle = np.pi / 2 - beta - alpha
+        front_angle = np.pi / 2 - gamma
 
-        :param end_effector_id: IK target pose end-effector
-        :param pose: IK target pose
-        :param start_joints: IK start joints (not supported)
-        :param avoid_collisions: Return non-collision IK result if true (not supported)
-        :return: Inverse kinematics
-        """
-
-        return self._inverse_kinematics(tr.make_pose_rel(self.pose, pose))
+        return np.column_stack(
+            (base_angle, rear_angle, front_angle, -rear_angle - front_angle, targets[:, 3] - base_angle)
+        )
 
-    def forward_kinematics(self, joints: List[Joint]) -> Pose:
+    def forward_kinematics_array(self, joints: np.ndarray) -> np.ndarray:
         """Computes forward kinematics.
 
-        Outputs absolute pose.
-
         Inspired by DobotKinematics.py from open-dobot project.
-
-        :param end_effector_id: Target end effector name
-        :param joints: Input joint values
-        :return: Pose of the given end effector
         """
 
-        self.validate_joints(joints)
-
-        j1 = joints[0].value
-        j2 = joints[1].value
-        j3 = joints[2].value
-        sj = j2 + j3
+        j1 = joints[:, 0]
+        j2 = joints[:, 1]
+        sj = j2 + joints[:, 2]
 
-        radius = (
-            self.link_2_length * math.cos(j2 - math.pi / 2) + self.link_3_length * math.cos(sj) + self.link_4_length
-        )
-
-        x = radius * math.cos(j1)
-        y = radius * math.sin(j1)
-
-        z = (
-            self.link_2_length * math.cos(j2)
-            + self.link_3_length * math.cos(sj + math.pi / 2)
-            - self.end_effector_length
-        )
-
-        pose = Pose(
-            Position(x, y, z),
-            Orientation.from_quaternion(quaternion.from_euler_angles(0, math.pi, joints[-1].value + j1)),
-        )
+        radius = self.link_2_length * np.cos(j2 - np.pi / 2) + self.link_3_length * np.cos(sj) + self.link_4_length
 
-        if __debug__:
-            self._check_orientation(pose)
+        z = self.link_2_length * np.cos(j2) + self.link_3_length * np.cos(sj + np.pi / 2) - self.end_effector_length
 
-        return tr.make_pose_abs(self.pose, pose)
+        return np.column_stack((radius * np.cos(j1), radius * np.sin(j1), z, joints[:, -1] + j1))
 
     def robot_joints(self) -> List[Joint]:
 
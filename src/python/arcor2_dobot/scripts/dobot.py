@@ -231,6 +231,68 @@ def put_eef_pose() -> RespT:
     return jsonify("ok")
 
 
+@app.route("/eef/pose/batch", methods=["PUT"])
+@requires_started
+def put_eef_pose_batch() -> RespT:
+    """Move the EEF through the poses.
+    ---
+    put:
+        description: Moves the EEF through the poses without stopping in between.
+        tags:
+           - Robot
+        parameters:
+            - in: query
+              name: moveType
+              schema:
+                type: string
+                enum:
+                    - JUMP
+                    - LINEAR
+                    - JOINTS
+              required: true
+              description: Move type
+            - name: velocity
+              in: query
+              schema:
+                type: number
+                format: float
+                minimum: 0
+                maximum: 100
+            - name: acceleration
+              in: query
+              schema:
+                type: number
+                format: float
+                minimum: 0
+                maximum: 100
+        requestBody:
+              content:
+                application/json:
+                  schema:
+                    type: array
+                    items:
+                        $ref: Pose
+        responses:
+            200:
+              description: Ok
+            403:
+              description: Not started
+    """
+
+    assert _dobot is not None
+
+    if not isinstance(request.json, list):
+        raise FlaskException("Body should be a JSON array containing poses.", error_code=400)
+
+    poses = [Pose.from_dict(p) for p in request.json]
+    move_type: str = request.args.get("moveType", "jump")
+    velocity = float(request.args.get("velocity", default=50.0))
+    acceleration = float(request.args.get("acceleration", default=50.0))
+
+    _dobot.move_sequence(poses, MoveType(move_type), velocity, acceleration)
+    return jsonify("ok")
+
+
 @app.route("/home", methods=["PUT"])
 @requires_started
 def put_home() -> RespT:
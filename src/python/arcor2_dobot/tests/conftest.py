@@ -0,0 +1,88 @@
+import struct
+import time
+from collections import Counter
+from typing import List
+
+import pytest
+from arcor2_dobot import dobot_api
+from arcor2_dobot.dobot_api import DobotApi, Message
+
+MOVE_DURATION = 0.3
+
+
+class FakeController:
+    """Emulates the serial protocol of Dobot, queued moves take
+    MOVE_DURATION."""
+
+    def __init__(self, *args, **kwargs) -> None:
+
+        self.name = "fake"
+        self.count: Counter = Counter()  # number of received messages by id
+
+        self._out = bytearray()
+        self._finished: List[float] = []  # when queued commands are done (index is position + 1)
+        self.moves: List[float] = []  # when move commands were received
+        self.moves_done: List[float] = []  # when move commands are done
+
+    def isOpen(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def reset_input_buffer(self) -> None:
+        self._out.clear()
+
+    def read(self, size: int = 1) -> bytes:
+        ret = bytes(self._out[:size])
+        del self._out[:size]
+        return ret
+
+    def current_index(self) -> int:
+        now = time.monotonic()
+        return sum(finished <= now for finished in self._finished)
+
+    def write(self, data: bytes) -> None:
+
+        msg_id, ctrl = data[3], data[4]
+        self.count[msg_id] += 1
+
+        resp = Message()
+        resp.id = msg_id
+        resp.ctrl = ctrl
+
+        if msg_id == 84:
+            self.moves.append(time.monotonic())
+
+        if ctrl & 0x02:  # queued command
+            start = max(self._finished[-1] if self._finished else 0, time.monotonic())
+            self._finished.append(start + (MOVE_DURATION if msg_id == 84 else 0))
+            if msg_id == 84:
+                self.moves_done.append(self._finished[-1])
+            resp.params = bytearray(struct.pack("<Q", len(self._finished)))
+        elif msg_id == 246:
+            resp.params = bytearray(struct.pack("<Q", self.current_index()))
+        elif msg_id == 10:
+            resp.params = bytearray(struct.pack("<8f", 200, 0, 0, 0, 0, 0, 0, 0))
+        elif msg_id == 20 and not ctrl:
+            resp.params = bytearray(32)
+        elif msg_id == 245:
+            self._finished.clear()
+
+        self._out.extend(resp.bytes())
+
+
+@pytest.fixture()
+def controller(monkeypatch) -> FakeController:
+
+    ctrl = FakeController()
+    monkeypatch.setattr(dobot_api.serial, "Serial", lambda *args, **kwargs: ctrl)
+    return ctrl
+
+
+@pytest.fixture()
+def api(controller: FakeController):
+
+    api = DobotApi("fake", poll_rate=20)
+    yield api
+    api.close()
@@ -0,0 +1,128 @@
+import logging
+import time
+from typing import List
+
+import pytest
+from arcor2_dobot import dobot_api
+from arcor2_dobot.dobot_api import DobotApi, DobotApiException, TraceRecorder
+from arcor2_dobot.tests.conftest import MOVE_DURATION, FakeController
+
+
+def test_wait_for_cmd(api: DobotApi, controller: FakeController) -> None:
+
+    polls = controller.count[246]
+    start = time.monotonic()
+
+    index = api.move_to(200, 0, 0)
+    api.wait_for_cmd(index)
+
+    duration = time.monotonic() - start
+    assert duration >= MOVE_DURATION
+    assert controller.current_index() >= index
+
+    # not busy-polling
+    assert controller.count[246] - polls <= duration * 20 + 3
+
+
+def test_reads_during_move(api: DobotApi, controller: FakeController) -> None:
+
+    index = api.move_to(200, 0, 0)
+    fut = api.cmd_future(index)
+
+    assert api.get_pose().position.x == 200
+
+    # the read was not blocked until the move was done
+    assert controller.current_index() < index
+    assert not fut.done()
+
+    fut.result(1)
+
+
+def test_futures(api: DobotApi) -> None:
+
+    indexes = [api.move_to(200, 0, 0) for _ in range(3)]
+    futs = [api.cmd_future(idx) for idx in reversed(indexes)]
+
+    futs[1].result(1)
+    assert futs[2].done()
+    assert not futs[0].done()
+
+    futs[0].result(1)
+
+    # already executed
+    assert api.cmd_future(indexes[0]).done()
+
+    with pytest.raises(DobotApiException):
+        api.wait_for_cmd(api.move_to(200, 0, 0), timeout=0.05)
+
+
+def test_queue_cleared(api: DobotApi) -> None:
+
+    fut = api.cmd_future(api.move_to(200, 0, 0))
+    api._set_queued_cmd_clear()
+
+    with pytest.raises(DobotApiException, match="Queue cleared."):
+        fut.result(1)
+
+    # index of a new command is not compared to the one from before
+    api.wait_for_cmd(api.move_to(200, 0, 0), timeout=1)
+
+
+def test_close(api: DobotApi) -> None:
+
+    fut = api.cmd_future(api.move_to(200, 0, 0))
+    api.close()
+
+    with pytest.raises(DobotApiException):
+        fut.result(1)
+
+
+def test_trace_recorder() -> None:
+
+    trace = TraceRecorder(3)
+    assert not trace.records()
+
+    for idx in range(5):
+        trace.record(idx % 2 == 0, bytes([0xAA, 0xAA, idx]))
+
+    records = trace.records()
+    assert len(trace) == len(records) == 3
+    assert [r.data[2] for r in records] == [2, 3, 4]  # the oldest ones are overwritten
+    assert [r.sent for r in records] == [True, False, True]
+
+    trace.record(True, bytes(100))
+    record = trace.records()[-1]
+    assert record.length == 100 and len(record.data) == TraceRecorder.PAYLOAD
+    assert str(record).endswith("...")
+
+
+def test_trace(controller: FakeController, monkeypatch, caplog) -> None:
+
+    hex_calls: List[bytes] = []
+
+    def hex_bytes(data: bytes) -> str:
+        hex_calls.append(data)
+        return ""
+
+    monkeypatch.setattr(dobot_api, "hex_bytes", hex_bytes)
+
+    # messages are not formatted unless debug logging is enabled
+    caplog.set_level(logging.INFO, dobot_api.__name__)
+
+    api = DobotApi("fake", trace=8)
+    assert api.trace is not None
+
+    try:
+        api.get_pose()
+        assert not hex_calls
+
+        records = api.trace.records()
+        assert len(records) == 8
+        assert records[-2].sent and records[-2].data[3] == 10
+        assert not records[-1].sent and records[-1].data[3] == 10
+
+        caplog.set_level(logging.DEBUG, dobot_api.__name__)
+        api.get_pose()
+        assert len(hex_calls) == 2  # request and response
+    finally:
+        api.close()
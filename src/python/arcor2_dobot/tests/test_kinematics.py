@@ -0,0 +1,176 @@
+import math
+from typing import List
+
+import numpy as np
+import pytest
+import quaternion
+from arcor2_dobot.dobot import DobotException, wrap_angles
+from arcor2_dobot.m1 import DobotM1
+from arcor2_dobot.magician import DobotMagician
+
+from arcor2.data.common import Joint, Orientation, Pose, Position
+
+SAMPLES = 1000
+
+
+def magician_ik(pose: Pose) -> List[float]:
+    """The original (scalar) implementation of DobotMagician._inverse_kinematics."""
+
+    _, _, yaw = quaternion.as_euler_angles(pose.orientation.as_quaternion())
+
+    x = pose.position.x
+    y = pose.position.y
+    z = pose.position.z + DobotMagician.end_effector_length
+
+    r = math.sqrt(math.pow(x, 2) + math.pow(y, 2))
+    rho_sq = pow(r - DobotMagician.link_4_length, 2) + pow(z, 2)
+    rho = math.sqrt(rho_sq)
+
+    l2_sq = DobotMagician.link_2_length ** 2
+    l3_sq = DobotMagician.link_3_length ** 2
+
+    alpha = math.acos((l2_sq + rho_sq - l3_sq) / (2.0 * DobotMagician.link_2_length * rho))
+    gamma = math.acos((l2_sq + l3_sq - rho_sq) / (2.0 * DobotMagician.link_2_length * DobotMagician.link_3_length))
+    beta = math.atan2(z, r - DobotMagician.link_4_length)
+
+    base_angle = math.atan2(y, x)
+    rear_angle = math.pi / 2 - beta - alpha
+    front_angle = math.pi / 2 - gamma
+
+    return [base_angle, rear_angle, front_angle, -rear_angle - front_angle, yaw - base_angle]
+
+
+def magician_fk(joints: List[float]) -> Pose:
+    """The original (scalar) implementation of DobotMagician.forward_kinematics."""
+
+    j1, j2, j3 = joints[:3]
+    sj = j2 + j3
+
+    radius = (
+        DobotMagician.link_2_length * math.cos(j2 - math.pi / 2)
+        + DobotMagician.link_3_length * math.cos(sj)
+        + DobotMagician.link_4_length
+    )
+
+    z = (
+        DobotMagician.link_2_length * math.cos(j2)
+        + DobotMagician.link_3_length * math.cos(sj + math.pi / 2)
+        - DobotMagician.end_effector_length
+    )
+
+    return Pose(
+        Position(radius * math.cos(j1), radius * math.sin(j1), z),
+        Orientation.from_quaternion(quaternion.from_euler_angles(0, math.pi, joints[-1] + j1)),
+    )
+
+
+def sample_joints(joint_names, valid_ranges, rng: np.random.Generator) -> np.ndarray:
+    """Random joint vectors within the limits (unlimited joints are within <-pi, pi))."""
+
+    return np.column_stack([rng.uniform(*valid_ranges.get(name, (-np.pi, np.pi)), SAMPLES) for name in joint_names])
+
+
+def same_orientation(a: Orientation, b: Orientation) -> bool:
+    """q and -q are the same orientation."""
+
+    dot = np.dot(quaternion.as_float_array(a.as_quaternion()), quaternion.as_float_array(b.as_quaternion()))
+    return abs(dot) == pytest.approx(1.0)
+
+
+@pytest.fixture()
+def magician() -> DobotMagician:
+    return DobotMagician(Pose(), simulator=True)
+
+
+@pytest.fixture()
+def m1() -> DobotM1:
+    return DobotM1(Pose(), simulator=True)
+
+
+def test_magician_fk(magician: DobotMagician) -> None:
+
+    joints = sample_joints(magician.joint_names, magician.valid_ranges, np.random.default_rng(0))
+    targets = magician.forward_kinematics_array(joints)
+
+    for values, target in zip(joints, targets):
+
+        expected = magician_fk(list(values))
+        pose = magician.forward_kinematics(magician._joints(values))
+
+        assert list(target[:3]) == pytest.approx(list(expected.position))
+        assert list(pose.position) == pytest.approx(list(expected.position))
+        assert same_orientation(pose.orientation, expected.orientation)
+
+
+def test_magician_ik(magician: DobotMagician) -> None:
+
+    joints = sample_joints(magician.joint_names, magician.valid_ranges, np.random.default_rng(1))
+    poses = magician._poses(magician.forward_kinematics_array(joints))
+
+    res = magician.inverse_kinematics_array(magician._targets(poses))
+
+    for values, pose in zip(res, poses):
+
+        expected = magician_ik(pose)
+        assert list(values[:4]) == pytest.approx(expected[:4], abs=1e-9)
+        assert wrap_angles(np.array(values[4] - expected[4])) == pytest.approx(0, abs=1e-6)
+
+    # the fourth joint just keeps the end-effector level, the others are recovered
+    independent = [0, 1, 2, 4]
+    assert np.allclose(wrap_angles(res[:, independent] - joints[:, independent]), 0, atol=1e-6)
+
+
+def test_m1_kinematics(m1: DobotM1) -> None:
+
+    joints = sample_joints(m1.joint_names, m1.valid_ranges, np.random.default_rng(2))
+    targets = m1.forward_kinematics_array(joints)
+
+    res = m1.inverse_kinematics_array(targets)
+    assert m1.joints_within_limits(res).all()
+
+    diff = m1.forward_kinematics_array(res) - targets
+    assert np.allclose(diff[:, :3], 0)
+    assert np.allclose(wrap_angles(diff[:, 3]), 0)
+
+    # the solution is unique unless both elbow configurations are within the limits
+    positive = joints[:, 1] > 0
+    assert np.allclose(wrap_angles(res[positive] - joints[positive]), 0, atol=1e-6)
+
+    # fully stretched arm
+    pose = Pose(Position(0.51, 0, 0.09), Orientation.from_rotation_vector(y=math.pi))
+    assert m1.forward_kinematics(m1.inverse_kinematics(pose)) == pose
+    assert [j.value for j in m1.inverse_kinematics(pose)] == pytest.approx([0, 0, 0.1, 0])
+
+
+@pytest.mark.parametrize("robot", [DobotMagician, DobotM1])
+def test_unreachable(robot) -> None:
+
+    dobot = robot(Pose(), simulator=True)
+    reachable = dobot.get_end_effector_pose()
+
+    far = dobot.get_end_effector_pose()
+    far.position.x += 1.0
+
+    targets = dobot._targets([reachable, far])
+    assert dobot.joints_within_limits(dobot.inverse_kinematics_array(targets)).tolist() == [True, False]
+
+    with pytest.raises(DobotException):
+        dobot.inverse_kinematics(far)
+
+    tilted = dobot.get_end_effector_pose()
+    tilted.orientation = Orientation()
+
+    with pytest.raises(Exception, match="Impossible orientation"):
+        dobot.inverse_kinematics(tilted)
+
+
+def test_joint_limits(magician: DobotMagician) -> None:
+
+    joints = magician.robot_joints()
+    joints[2] = Joint(joints[2].name, 1.2)  # above the upper limit
+
+    with pytest.raises(DobotException):
+        magician.forward_kinematics(joints)
+
+    with pytest.raises(DobotException):
+        magician.forward_kinematics(joints[:3])
@@ -0,0 +1,60 @@
+import time
+from typing import List
+
+import pytest
+from arcor2_dobot.dobot import MoveType
+from arcor2_dobot.magician import DobotMagician
+from arcor2_dobot.tests.conftest import MOVE_DURATION, FakeController
+
+from arcor2.data.common import Pose
+
+
+@pytest.fixture()
+def magician(controller: FakeController):
+
+    dobot = DobotMagician(Pose(), "fake")
+    yield dobot
+    dobot.cleanup()
+
+
+@pytest.fixture()
+def simulator() -> DobotMagician:
+    return DobotMagician(Pose(), simulator=True)
+
+
+def targets() -> List[Pose]:
+    """Reachable poses above the initial configuration of the simulator."""
+
+    ret: List[Pose] = []
+
+    for dz in (0.01, 0.02, 0.03):
+        pose = DobotMagician(Pose(), simulator=True).get_end_effector_pose()
+        pose.position.z += dz
+        ret.append(pose)
+
+    return ret
+
+
+def test_move_sequence(magician: DobotMagician, controller: FakeController) -> None:
+
+    poses = targets()
+
+    start = time.monotonic()
+    magician.move_sequence(poses, MoveType.JOINTS, 100, 100)
+    duration = time.monotonic() - start
+
+    assert len(controller.moves) == len(poses)
+
+    # each move was queued before the previous one was done, so the robot did not stop in between
+    assert all(received < done for received, done in zip(controller.moves[1:], controller.moves_done))
+
+    # the call returns only after the last move is done
+    assert duration >= len(poses) * MOVE_DURATION
+
+
+def test_move_sequence_simulator(simulator: DobotMagician) -> None:
+
+    poses = targets()
+    simulator.move_sequence(poses, MoveType.JOINTS, 100, 100)
+
+    assert simulator.get_end_effector_pose().position.z == pytest.approx(poses[-1].position.z, abs=1e-6)
@@ -2,24 +2,28 @@ import argparse
 import asyncio
 import base64
 import functools
+import io
 import os
 import shutil
 import signal
+import socket
 import sys
-import tempfile
 import time
 import zipfile
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Awaitable, List, Optional, Set, Union
+from typing import IO, Awaitable, Dict, List, Optional, Set, Union
 
 import websockets
 from aiologger.levels import LogLevel
 from aiorun import run
-from dataclasses_jsonschema import ValidationError
+from dataclasses_jsonschema import JsonSchemaMixin, ValidationError
 from websockets.server import WebSocketServerProtocol as WsClient
 
 import arcor2_execution
 import arcor2_execution_data
+from arcor2 import channel, env
+from arcor2 import helpers as hlp
 from arcor2 import json, ws_server
 from arcor2.data import common, compile_json_schemas
 from arcor2.data import rpc as arcor2_rpc
@@ -34,6 +38,7 @@ from arcor2_execution_data.common import PackageSummary, ProjectMeta
 logger = get_aiologger("Execution")
 
 PROCESS: Union[asyncio.subprocess.Process, None] = None
+CHANNEL_WRITER: Optional[asyncio.StreamWriter] = None
 PACKAGE_STATE_EVENT: PackageState = PackageState(PackageState.Data())  # undefined state
 RUNNING_PACKAGE_ID: Optional[str] = None
 
@@ -46,6 +51,33 @@ CLIENTS: Set = set()
 
 MAIN_SCRIPT_NAME = "script.py"
 
+# uploads without a chunk for this long are considered abandoned (seconds)
+UPLOAD_TIMEOUT = env.get_float("ARCOR2_EXECUTION_UPLOAD_TIMEOUT", 60.0)
+
+
+@dataclass
+class Upload:
+
+    received: int  # number of already received bytes
+    last_chunk: float  # time.monotonic() of the last chunk
+
+
+# package id -> upload in progress
+UPLOADS: Dict[str, Upload] = {}
+
+
+@dataclass
+class IndexedSummary(JsonSchemaMixin):
+
+    mtime: int  # see _package_mtime
+    summary: PackageSummary
+
+
+# package id -> summary, maintained on upload/delete/rename/run, persisted in order to speed up the startup
+INDEX: Dict[str, IndexedSummary] = {}
+INDEX_PATH = os.path.join(PROJECT_PATH, ".index.json")
+INDEX_LOCK = asyncio.Lock()
+
 EVENT_MAPPING = {evt.__name__: evt for evt in EVENTS}
 
 
@@ -61,38 +93,41 @@ async def package_state(event: PackageState) -> None:
     await send_to_clients(event)
 
 
-async def read_proc_stdout() -> None:
-
-    global PACKAGE_STATE_EVENT
-    global ACTION_EVENT
-    global ACTION_ARGS_EVENT
-    global PACKAGE_INFO_EVENT
-    global RUNNING_PACKAGE_ID
-
-    logger.info("Reading script stdout...")
+async def read_proc_stdout(printed_out: List[str]) -> None:
+    """Reads whatever the script prints out (user's prints, tracebacks)."""
 
     assert PROCESS is not None
     assert PROCESS.stdout is not None
-    assert RUNNING_PACKAGE_ID is not None
-
-    await package_state(PackageState(PackageState.Data(PackageState.Data.StateEnum.RUNNING, RUNNING_PACKAGE_ID)))
 
-    printed_out: List[str] = []
-
-    while process_running():
+    while True:
         try:
             stdout = await PROCESS.stdout.readuntil()
         except asyncio.exceptions.IncompleteReadError:
             break
 
         decoded = stdout.decode("utf-8")
-        stripped = decoded.strip()
+        printed_out.append(decoded)
+        logger.info(decoded.strip())
+
+
+async def read_proc_events(reader: asyncio.StreamReader) -> None:
+    """Reads events sent by the script over the framed channel."""
+
+    global PACKAGE_INFO_EVENT
+
+    assert RUNNING_PACKAGE_ID is not None
+
+    while True:
 
         try:
-            data = json.loads(stripped)
-        except json.JsonException:
-            printed_out.append(decoded)
-            logger.error(decoded.strip())
+            payload = await channel.read_frame(reader)
+        except channel.ChannelException:
+            break
+
+        try:
+            data = json.loads(payload.decode("utf-8"))
+        except (UnicodeDecodeError, json.JsonException):
+            logger.error("Strange data from script: {!r}".format(payload))
             continue
 
         if not isinstance(data, dict) or "event" not in data:
@@ -101,7 +136,7 @@ async def read_proc_stdout() -> None:
 
         try:
             evt = EVENT_MAPPING[data["event"]].from_dict(data)
-        except ValidationError as e:
+        except (KeyError, ValidationError) as e:
             logger.error("Invalid event: {}, error: {}".format(data, e))
             continue
 
@@ -114,6 +149,29 @@ async def read_proc_stdout() -> None:
 
         await send_to_clients(evt)
 
+
+async def handle_process(reader: asyncio.StreamReader) -> None:
+
+    global PACKAGE_INFO_EVENT
+    global RUNNING_PACKAGE_ID
+    global CHANNEL_WRITER
+
+    logger.info("Reading script events and stdout...")
+
+    assert PROCESS is not None
+    assert RUNNING_PACKAGE_ID is not None
+
+    await package_state(PackageState(PackageState.Data(PackageState.Data.StateEnum.RUNNING, RUNNING_PACKAGE_ID)))
+
+    printed_out: List[str] = []
+
+    await asyncio.gather(read_proc_stdout(printed_out), read_proc_events(reader))
+    await PROCESS.wait()
+
+    if CHANNEL_WRITER is not None:
+        CHANNEL_WRITER.close()
+        CHANNEL_WRITER = None
+
     PACKAGE_INFO_EVENT = None
 
     if PROCESS.returncode:
@@ -144,6 +202,14 @@ async def read_proc_stdout() -> None:
     RUNNING_PACKAGE_ID = None
 
 
+async def send_command(cmd: channel.Command) -> None:
+
+    assert CHANNEL_WRITER is not None
+
+    CHANNEL_WRITER.write(channel.frame(cmd.value.encode()))
+    await CHANNEL_WRITER.drain()
+
+
 def check_script(script_path: str) -> None:
 
     if not os.path.exists(script_path):
@@ -155,6 +221,7 @@ async def run_package_cb(req: rpc.RunPackage.Request, ui: WsClient) -> None:
     global PROCESS
     global TASK
     global RUNNING_PACKAGE_ID
+    global CHANNEL_WRITER
 
     if process_running():
         raise Arcor2Exception("Already running!")
@@ -178,25 +245,41 @@ async def run_package_cb(req: rpc.RunPackage.Request, ui: WsClient) -> None:
     # set PYTHONPATH to match this scripts sys.path
     myenv["PYTHONPATH"] = pypath
 
+    # events and commands are exchanged over a dedicated channel, stdout is left for user's prints
+    parent_sock, child_sock = socket.socketpair()
+    myenv[channel.CHANNEL_FD_NAME] = str(child_sock.fileno())
+
     logger.info(f"Starting script: {script_path}")
-    PROCESS = await asyncio.create_subprocess_exec(
-        "python3.8",
-        script_path,
-        stdin=asyncio.subprocess.PIPE,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.STDOUT,
-        env=myenv,
-    )
+    try:
+        PROCESS = await asyncio.create_subprocess_exec(
+            "python3.8",
+            script_path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=myenv,
+            pass_fds=(child_sock.fileno(),),
+        )
+    except Exception:
+        parent_sock.close()
+        raise
+    finally:
+        child_sock.close()
+
     if PROCESS.returncode is not None:
+        parent_sock.close()
         raise Arcor2Exception("Failed to start project.")
 
+    reader, CHANNEL_WRITER = await asyncio.open_unix_connection(sock=parent_sock)
+
     meta = read_package_meta(req.args.id)
     meta.executed = datetime.now(tz=timezone.utc)
     write_package_meta(req.args.id, meta)
+    await index_package(package_path)
 
     RUNNING_PACKAGE_ID = req.args.id
 
-    TASK = asyncio.ensure_future(read_proc_stdout())  # run task in background
+    TASK = asyncio.ensure_future(handle_process(reader))  # run task in background
 
 
 async def stop_package_cb(req: rpc.StopPackage.Request, ui: WsClient) -> None:
@@ -225,15 +308,11 @@ async def pause_package_cb(req: rpc.PausePackage.Request, ui: WsClient) -> None:
     if not process_running():
         raise Arcor2Exception("Project not running.")
 
-    assert PROCESS is not None
-    assert PROCESS.stdin is not None
-
     if PACKAGE_STATE_EVENT.data.state != PackageState.Data.StateEnum.RUNNING:
         raise Arcor2Exception("Cannot pause.")
 
     await package_state(PackageState(PackageState.Data(PackageState.Data.StateEnum.PAUSING, RUNNING_PACKAGE_ID)))
-    PROCESS.stdin.write("p\n".encode())
-    await PROCESS.stdin.drain()
+    await send_command(channel.Command.PAUSE)
     return None
 
 
@@ -242,55 +321,140 @@ async def resume_package_cb(req: rpc.ResumePackage.Request, ui: WsClient) -> Non
     if not process_running():
         raise Arcor2Exception("Project not running.")
 
-    assert PROCESS is not None
-    assert PROCESS.stdin is not None
-
     if PACKAGE_STATE_EVENT.data.state != PackageState.Data.StateEnum.PAUSED:
         raise Arcor2Exception("Cannot resume.")
 
-    PROCESS.stdin.write("r\n".encode())
-    await PROCESS.stdin.drain()
+    await send_command(channel.Command.RESUME)
     return None
 
 
-async def _upload_package_cb(req: rpc.UploadPackage.Request, ui: WsClient) -> None:
+def _staging_path(package_id: str, suffix: str) -> str:
+    """Staging files are hidden and placed next to packages so they can be
+    atomically renamed."""
 
-    target_path = os.path.join(PROJECT_PATH, req.args.id)
+    return os.path.join(PROJECT_PATH, f".{package_id}.{suffix}")
 
-    # TODO do not allow if there are manual changes?
 
-    with tempfile.TemporaryDirectory() as tmpdirname:
+def _write_chunk(zip_path: str, offset: int, chunk: bytes) -> None:
 
-        zip_path = os.path.join(tmpdirname, "publish.zip")
+    with open(zip_path, "wb" if offset == 0 else "r+b") as zip_file:
+        zip_file.seek(offset)
+        zip_file.write(chunk)
 
-        b64_bytes = req.args.data.encode()
-        zip_content = base64.b64decode(b64_bytes)
 
-        with open(zip_path, "wb") as zip_file:
-            zip_file.write(zip_content)
+def _extract_package(zip_file: Union[str, IO[bytes]], package_id: str) -> str:
+    """Extracts the package into a staging directory and then moves it to
+    PROJECT_PATH. Blocking - it should be run in an executor.
 
-        try:
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(tmpdirname)
-        except zipfile.BadZipFile as e:
-            logger.error(e)
-            raise Arcor2Exception("Invalid zip file.")
+    :param zip_file: Path to the zip file or file-like object.
+    :param package_id:
+    :return: Path to the package.
+    """
 
-        os.remove(zip_path)
+    target_path = os.path.join(PROJECT_PATH, package_id)
+    staging_path = _staging_path(package_id, "staging")
+    old_path = _staging_path(package_id, "old")
 
-        try:
-            shutil.rmtree(target_path)
-        except FileNotFoundError:
-            pass
-        shutil.copytree(tmpdirname, target_path)
+    shutil.rmtree(staging_path, ignore_errors=True)
 
-    script_path = os.path.join(target_path, MAIN_SCRIPT_NAME)
+    try:
+        with zipfile.ZipFile(zip_file, "r") as zip_ref:
+            zip_ref.extractall(staging_path)
+        check_script(os.path.join(staging_path, MAIN_SCRIPT_NAME))
+    except zipfile.BadZipFile:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise Arcor2Exception("Invalid zip file.")
+    except Arcor2Exception:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+
+    # TODO do not allow if there are manual changes?
+
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    try:
+        os.rename(target_path, old_path)
+    except FileNotFoundError:
+        pass
+
+    os.rename(staging_path, target_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    return target_path
 
-    check_script(script_path)
 
-    evt = events.PackageChanged(await get_summary(target_path))
+async def _package_uploaded(target_path: str) -> None:
+
+    evt = events.PackageChanged(await index_package(target_path))
     evt.change_type = Event.Type.ADD
     asyncio.ensure_future(send_to_clients(evt))
+
+
+async def _upload_package_cb(req: rpc.UploadPackage.Request, ui: WsClient) -> None:
+
+    zip_content = await hlp.run_in_executor(base64.b64decode, req.args.data.encode())
+    await _package_uploaded(await hlp.run_in_executor(_extract_package, io.BytesIO(zip_content), req.args.id))
+    return None
+
+
+def _remove_staging_zip(package_id: str) -> None:
+
+    try:
+        os.remove(_staging_path(package_id, "zip"))
+    except FileNotFoundError:
+        pass
+
+
+def _expire_uploads() -> None:
+    """Forgets uploads abandoned by clients and removes their staging
+    files."""
+
+    now = time.monotonic()
+
+    for package_id, upload in list(UPLOADS.items()):
+        if now - upload.last_chunk > UPLOAD_TIMEOUT:
+            del UPLOADS[package_id]
+            _remove_staging_zip(package_id)
+
+
+async def _upload_package_chunk_cb(req: rpc.UploadPackageChunk.Request, ui: WsClient) -> None:
+
+    args = req.args
+
+    chunk = await hlp.run_in_executor(base64.b64decode, args.data.encode())
+
+    # offset has to be checked and updated before any other await, so concurrent chunks can't break the file
+    _expire_uploads()
+
+    upload = UPLOADS.get(args.id)
+
+    if args.offset != 0 and (upload is None or upload.received != args.offset):
+        raise Arcor2Exception("Unexpected chunk offset.")
+
+    # the first chunk (re)starts the upload
+    UPLOADS[args.id] = Upload(args.offset + len(chunk), time.monotonic())
+
+    zip_path = _staging_path(args.id, "zip")
+
+    try:
+        await hlp.run_in_executor(_write_chunk, zip_path, args.offset, chunk)
+    except OSError as e:
+        del UPLOADS[args.id]
+        _remove_staging_zip(args.id)
+        logger.error(e)
+        raise Arcor2Exception("Failed to store the chunk.")
+
+    if not args.last:
+        return None
+
+    del UPLOADS[args.id]
+
+    try:
+        target_path = await hlp.run_in_executor(_extract_package, zip_path, args.id)
+    finally:
+        _remove_staging_zip(args.id)
+
+    await _package_uploaded(target_path)
     return None
 
 
@@ -317,20 +481,90 @@ async def get_summary(path: str) -> PackageSummary:
     return PackageSummary(package_dir, package_meta, ProjectMeta(project.id, project.name, modified))
 
 
-async def list_packages_cb(req: rpc.ListPackages.Request, ui: WsClient) -> rpc.ListPackages.Response:
+def _package_mtime(path: str) -> int:
+    """Returns the latest modification of files the summary is made of."""
 
-    resp = rpc.ListPackages.Response()
-    resp.data = []
+    mtime = 0
+
+    for file_name in (MAIN_SCRIPT_NAME, "package.json", os.path.join("data", "project.json")):
+        try:
+            mtime = max(mtime, os.stat(os.path.join(path, file_name)).st_mtime_ns)
+        except FileNotFoundError:
+            pass
+
+    return mtime
 
-    subfolders = [f.path for f in os.scandir(PROJECT_PATH) if f.is_dir()]
 
-    for folder_path in subfolders:
+def _load_index() -> Dict[str, IndexedSummary]:
+
+    try:
+        with open(INDEX_PATH) as index_file:
+            data = json.loads_type(index_file.read(), dict)
+        return {package_id: IndexedSummary.from_dict(value) for package_id, value in data.items()}
+    except (IOError, json.JsonException, ValidationError):
+        return {}
+
+
+def _save_index(data: Dict[str, IndexedSummary]) -> None:
+
+    tmp_path = INDEX_PATH + ".tmp"
+
+    with open(tmp_path, "w") as index_file:
+        index_file.write(json.dumps({package_id: value.to_dict() for package_id, value in data.items()}))
+
+    os.replace(tmp_path, INDEX_PATH)
+
+
+async def save_index() -> None:
+
+    async with INDEX_LOCK:  # the last write has to contain the latest data
+        await hlp.run_in_executor(_save_index, dict(INDEX))
+
+
+async def index_package(path: str) -> PackageSummary:
+    """(Re)reads summary of the package and stores it into the index.
+
+    :param path: Path to the package.
+    :return:
+    """
+
+    summary = await get_summary(path)
+    INDEX[summary.id] = IndexedSummary(_package_mtime(path), summary)
+    await save_index()
+    return summary
+
+
+async def build_index() -> None:
+    """Fills the index, summaries stored on disk are reused when the package
+    was not modified since."""
+
+    stored = await hlp.run_in_executor(_load_index)
+
+    # hidden folders are used for staging
+    for entry in os.scandir(PROJECT_PATH):
+
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+
+        mtime = _package_mtime(entry.path)
+
+        if entry.name in stored and stored[entry.name].mtime == mtime:
+            INDEX[entry.name] = stored[entry.name]
+            continue
 
         try:
-            resp.data.append(await get_summary(folder_path))
+            INDEX[entry.name] = IndexedSummary(mtime, await get_summary(entry.path))
         except Arcor2Exception:
             pass
 
+    await save_index()
+    logger.info(f"Indexed {len(INDEX)} packages.")
+
+
+async def list_packages_cb(req: rpc.ListPackages.Request, ui: WsClient) -> rpc.ListPackages.Response:
+
+    resp = rpc.ListPackages.Response()
+    resp.data = [value.summary for value in INDEX.values()]
     return resp
 
 
@@ -339,13 +573,20 @@ async def delete_package_cb(req: rpc.DeletePackage.Request, ui: WsClient) -> Non
     if RUNNING_PACKAGE_ID and RUNNING_PACKAGE_ID == req.args.id:
         raise Arcor2Exception("Package is being executed.")
 
+    try:
+        package_summary = INDEX[req.args.id].summary
+    except KeyError:
+        raise Arcor2Exception("Not found.")
+
     target_path = os.path.join(PROJECT_PATH, req.args.id)
-    package_summary = await get_summary(target_path)
 
     try:
         shutil.rmtree(target_path)
     except FileNotFoundError:
         raise Arcor2Exception("Not found.")
+    finally:
+        INDEX.pop(req.args.id, None)
+        await save_index()
 
     evt = events.PackageChanged(package_summary)
     evt.change_type = Event.Type.REMOVE
@@ -355,6 +596,9 @@ async def delete_package_cb(req: rpc.DeletePackage.Request, ui: WsClient) -> Non
 
 async def rename_package_cb(req: rpc.RenamePackage.Request, ui: WsClient) -> None:
 
+    if req.args.package_id not in INDEX:
+        raise Arcor2Exception("Not found.")
+
     target_path = os.path.join(PROJECT_PATH, req.args.package_id, "package.json")
 
     pm = read_package_meta(req.args.package_id)
@@ -363,7 +607,7 @@ async def rename_package_cb(req: rpc.RenamePackage.Request, ui: WsClient) -> Non
     with open(target_path, "w") as pkg_file:
         pkg_file.write(pm.to_json())
 
-    evt = events.PackageChanged(await get_summary(os.path.join(PROJECT_PATH, req.args.package_id)))
+    evt = events.PackageChanged(await index_package(os.path.join(PROJECT_PATH, req.args.package_id)))
     evt.change_type = Event.Type.UPDATE
 
     asyncio.ensure_future(send_to_clients(evt))
@@ -406,6 +650,7 @@ RPC_DICT: ws_server.RPC_DICT_TYPE = {
     rpc.PausePackage.__name__: (rpc.PausePackage, pause_package_cb),
     rpc.ResumePackage.__name__: (rpc.ResumePackage, resume_package_cb),
     rpc.UploadPackage.__name__: (rpc.UploadPackage, _upload_package_cb),
+    rpc.UploadPackageChunk.__name__: (rpc.UploadPackageChunk, _upload_package_chunk_cb),
     rpc.ListPackages.__name__: (rpc.ListPackages, list_packages_cb),
     rpc.DeletePackage.__name__: (rpc.DeletePackage, delete_package_cb),
     rpc.RenamePackage.__name__: (rpc.RenamePackage, rename_package_cb),
@@ -413,8 +658,23 @@ RPC_DICT: ws_server.RPC_DICT_TYPE = {
 }
 
 
+def remove_staging_leftovers() -> None:
+
+    for entry in os.scandir(PROJECT_PATH):
+        if not entry.name.startswith("."):
+            continue
+        if entry.name.endswith((".zip", ".tmp")):
+            os.remove(entry.path)
+        elif entry.name.endswith((".staging", ".old")):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
 async def aio_main() -> None:
 
+    # interrupted uploads might leave some mess
+    await hlp.run_in_executor(remove_staging_leftovers)
+    await build_index()
+
     await websockets.server.serve(
         functools.partial(ws_server.server, logger=logger, register=register, unregister=unregister, rpc_dict=RPC_DICT),
         "0.0.0.0",
@@ -0,0 +1,42 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+
+def package_zip(script: str = "print('hello')\n") -> bytes:
+
+    buff = io.BytesIO()
+
+    with zipfile.ZipFile(buff, "w") as zip_file:
+        zip_file.writestr("script.py", script)
+        zip_file.writestr("data/readme.txt", os.urandom(2048).hex())  # makes the archive big enough for chunks
+
+    return buff.getvalue()
+
+
+class Logger:
+    def debug(self, *args, **kwargs) -> None:
+        pass
+
+    info = warning = error = debug
+
+
+@pytest.fixture()
+def execution(monkeypatch, tmp_path):
+    """Execution service module working with an empty project path."""
+
+    monkeypatch.setenv("ARCOR2_PROJECT_PATH", str(tmp_path))
+
+    from arcor2 import package
+    from arcor2_execution.scripts import execution
+
+    monkeypatch.setattr(package, "PROJECT_PATH", str(tmp_path))
+    monkeypatch.setattr(execution, "PROJECT_PATH", str(tmp_path))
+    monkeypatch.setattr(execution, "INDEX_PATH", str(tmp_path / ".index.json"))
+    monkeypatch.setattr(execution, "INDEX", {})
+    monkeypatch.setattr(execution, "UPLOADS", {})
+    monkeypatch.setattr(execution, "logger", Logger())
+
+    return execution
@@ -0,0 +1,101 @@
+import os
+import shutil
+from datetime import datetime, timezone
+
+import pytest
+
+from arcor2.data.execution import PackageMeta
+from arcor2.data.rpc.common import IdArgs
+from arcor2.exceptions import Arcor2Exception
+from arcor2_execution_data import rpc
+
+
+def create_package(execution, package_id: str, name: str) -> str:
+
+    path = os.path.join(execution.PROJECT_PATH, package_id)
+    os.makedirs(path, exist_ok=True)
+
+    with open(os.path.join(path, "script.py"), "w") as script:
+        script.write("print('hello')\n")
+
+    with open(os.path.join(path, "package.json"), "w") as meta:
+        meta.write(PackageMeta(name, datetime.now(tz=timezone.utc)).to_json())
+
+    return path
+
+
+def touch_later(path: str) -> None:
+    """Makes sure the modification is detected even on file systems with a
+    coarse timestamp resolution."""
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+async def restart(execution, monkeypatch) -> None:
+    """Simulates restart of the service - the in-memory index is lost."""
+
+    monkeypatch.setattr(execution, "INDEX", {})
+    await execution.build_index()
+
+
+@pytest.mark.asyncio()
+async def test_index_persisted(execution, monkeypatch) -> None:
+
+    create_package(execution, "pkg1", "First")
+    create_package(execution, "pkg2", "Second")
+
+    await execution.build_index()
+
+    assert os.path.exists(execution.INDEX_PATH)
+    summaries = {package_id: value.summary for package_id, value in execution.INDEX.items()}
+    assert {package_id: summary.package_meta.name for package_id, summary in summaries.items()} == {
+        "pkg1": "First",
+        "pkg2": "Second",
+    }
+
+    async def get_summary(path: str) -> None:
+        raise AssertionError("Unmodified packages should not be read again.")
+
+    monkeypatch.setattr(execution, "get_summary", get_summary)
+
+    await restart(execution, monkeypatch)
+    assert {package_id: value.summary for package_id, value in execution.INDEX.items()} == summaries
+
+
+@pytest.mark.asyncio()
+@pytest.mark.parametrize("file_name", ["package.json", "script.py"])
+async def test_index_refreshed(execution, monkeypatch, file_name: str) -> None:
+
+    path = create_package(execution, "pkg", "Old name")
+    await execution.build_index()
+
+    create_package(execution, "pkg", "New name")  # rewrites both files
+    touch_later(os.path.join(path, file_name))
+
+    await restart(execution, monkeypatch)
+
+    assert execution.INDEX["pkg"].summary.package_meta.name == "New name"
+    assert execution.INDEX["pkg"].mtime == execution._package_mtime(path)
+
+
+@pytest.mark.asyncio()
+async def test_index_deleted(execution, monkeypatch) -> None:
+
+    create_package(execution, "pkg1", "First")
+    path = create_package(execution, "pkg2", "Second")
+
+    await execution.build_index()
+
+    await execution.delete_package_cb(rpc.DeletePackage.Request(1, IdArgs("pkg1")), None)
+    assert list(execution.INDEX) == ["pkg2"]
+
+    with pytest.raises(Arcor2Exception, match="Not found."):
+        await execution.delete_package_cb(rpc.DeletePackage.Request(2, IdArgs("pkg1")), None)
+
+    # removed while the service was not running
+    shutil.rmtree(path)
+
+    await restart(execution, monkeypatch)
+    assert not execution.INDEX
+    assert execution._load_index() == {}
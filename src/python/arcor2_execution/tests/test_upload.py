@@ -0,0 +1,103 @@
+import base64
+import os
+import time
+
+import pytest
+
+from arcor2.exceptions import Arcor2Exception
+from arcor2_execution.tests.conftest import package_zip
+from arcor2_execution_data import rpc
+
+CHUNK_SIZE = 1024
+
+
+def chunk_req(package_id: str, data: bytes, offset: int, last: bool = False) -> rpc.UploadPackageChunk.Request:
+    return rpc.UploadPackageChunk.Request(
+        1, rpc.UploadPackageChunk.Request.Args(package_id, offset, base64.b64encode(data).decode(), last)
+    )
+
+
+async def upload(execution, package_id: str, data: bytes) -> None:
+
+    for offset in range(0, len(data), CHUNK_SIZE):
+        await execution._upload_package_chunk_cb(
+            chunk_req(package_id, data[offset : offset + CHUNK_SIZE], offset, offset + CHUNK_SIZE >= len(data)), None
+        )
+
+
+def staging_zip(execution, package_id: str) -> str:
+    return execution._staging_path(package_id, "zip")
+
+
+@pytest.mark.asyncio()
+async def test_upload_chunks(execution) -> None:
+
+    data = package_zip()
+    assert len(data) > 2 * CHUNK_SIZE
+
+    await upload(execution, "pkg", data)
+
+    with open(os.path.join(execution.PROJECT_PATH, "pkg", "script.py")) as script:
+        assert script.read() == "print('hello')\n"
+
+    assert "pkg" in execution.INDEX
+    assert not execution.UPLOADS
+    assert not os.path.exists(staging_zip(execution, "pkg"))
+
+    # the package is replaced by a new upload
+    await upload(execution, "pkg", package_zip("print('world')\n"))
+
+    with open(os.path.join(execution.PROJECT_PATH, "pkg", "script.py")) as script:
+        assert script.read() == "print('world')\n"
+
+
+@pytest.mark.asyncio()
+async def test_unexpected_offset(execution) -> None:
+
+    data = package_zip()
+
+    with pytest.raises(Arcor2Exception, match="offset"):  # the first chunk is missing
+        await execution._upload_package_chunk_cb(chunk_req("pkg", data[CHUNK_SIZE:], CHUNK_SIZE, True), None)
+
+    await execution._upload_package_chunk_cb(chunk_req("pkg", data[:CHUNK_SIZE], 0), None)
+
+    with pytest.raises(Arcor2Exception, match="offset"):  # a chunk is skipped
+        await execution._upload_package_chunk_cb(chunk_req("pkg", data[2 * CHUNK_SIZE :], 2 * CHUNK_SIZE, True), None)
+
+    # the upload might be restarted
+    await upload(execution, "pkg", data)
+    assert "pkg" in execution.INDEX
+
+
+@pytest.mark.asyncio()
+async def test_invalid_zip(execution) -> None:
+
+    await execution._upload_package_chunk_cb(chunk_req("pkg", b"not a zip file", 0), None)
+
+    with pytest.raises(Arcor2Exception, match="Invalid zip file."):
+        await execution._upload_package_chunk_cb(chunk_req("pkg", b"still not a zip file", 14, True), None)
+
+    assert not execution.UPLOADS
+    assert not execution.INDEX
+    assert not os.listdir(execution.PROJECT_PATH)  # no package, no staging leftovers
+
+
+@pytest.mark.asyncio()
+async def test_abandoned_upload(execution, monkeypatch) -> None:
+
+    data = package_zip()
+
+    await execution._upload_package_chunk_cb(chunk_req("abandoned", data[:CHUNK_SIZE], 0), None)
+    assert os.path.exists(staging_zip(execution, "abandoned"))
+
+    monkeypatch.setattr(execution, "UPLOAD_TIMEOUT", 0.05)
+    time.sleep(0.1)
+
+    # any other upload cleans up the abandoned one
+    await upload(execution, "pkg", data)
+
+    assert not execution.UPLOADS
+    assert not os.path.exists(staging_zip(execution, "abandoned"))
+
+    with pytest.raises(Arcor2Exception, match="offset"):
+        await execution._upload_package_chunk_cb(chunk_req("abandoned", data[CHUNK_SIZE:], CHUNK_SIZE, True), None)
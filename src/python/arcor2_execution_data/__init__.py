@@ -15,6 +15,7 @@ EXPOSED_RPCS: Tuple[Type[RPC], ...] = (
     rpc.PausePackage,
     rpc.ResumePackage,
     rpc.UploadPackage,
+    rpc.UploadPackageChunk,
     rpc.ListPackages,
     rpc.DeletePackage,
     rpc.RenamePackage,
@@ -26,6 +26,30 @@ class UploadPackage(RPC):
 # ----------------------------------------------------------------------------------------------------------------------
 
 
+class UploadPackageChunk(RPC):
+    @dataclass
+    class Request(RPC.Request):
+        @dataclass
+        class Args(JsonSchemaMixin):
+            id: str = field(metadata=dict(description="Id of the execution package."))
+            offset: int = field(
+                metadata=dict(description="Position of the chunk within the zip file. Chunks have to be sent in order.")
+            )
+            data: str = field(metadata=dict(description="Base64 encoded chunk of the zip file."))
+            last: bool = field(
+                default=False, metadata=dict(description="The package is extracted once the last chunk is received.")
+            )
+
+        args: Args
+
+    @dataclass
+    class Response(RPC.Response):
+        pass
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
 class ListPackages(RPC):
     @dataclass
     class Request(RPC.Request):
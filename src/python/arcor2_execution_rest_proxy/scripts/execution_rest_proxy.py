@@ -1,23 +1,23 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
 import base64
+import hashlib
 import json
 import os
 import shutil
 import tempfile
-import time
 import uuid
-from contextlib import contextmanager
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from queue import Queue
-from threading import Thread
-from typing import TYPE_CHECKING, Dict, List, Optional, Type
+from threading import Event, Lock, RLock, Thread
+from typing import Dict, List, Optional, Tuple, Type, Union
 
 import arcor2_execution_rest_proxy
-import websocket
+import websockets
 from dataclasses_jsonschema import JsonSchemaMixin
 from flask import jsonify, request, send_file
 from sqlitedict import SqliteDict
@@ -26,17 +26,24 @@ from werkzeug.utils import secure_filename
 from arcor2.data import events
 from arcor2.data import rpc as arcor2_rpc
 from arcor2.data.events import PackageInfo, PackageState, ProjectException
-from arcor2.flask import RespT, create_app, run_app
+from arcor2.flask import FlaskException, RespT, create_app, run_app
+from arcor2.logging import get_logger
 from arcor2.package import PROJECT_PATH
 from arcor2_execution_data import EVENTS, EXPOSED_RPCS
 from arcor2_execution_data import URL as EXE_URL
 from arcor2_execution_data import rpc
 
+logger = get_logger(__name__)
+
 PORT = int(os.getenv("ARCOR2_EXECUTION_PROXY_PORT", 5009))
 SERVICE_NAME = "ARCOR2 Execution Service Proxy"
 
 DB_PATH = os.getenv("ARCOR2_EXECUTION_PROXY_DB_PATH", "/tmp")  # should be directory where DBs can be stored
 TOKENS_DB_PATH = os.path.join(DB_PATH, "tokens")
+ARCHIVES_PATH = os.path.join(DB_PATH, "package_archives")  # cached archives of packages
+
+EVENT_MAPPING: Dict[str, Type[events.Event]] = {evt.__name__: evt for evt in EVENTS}
+RPC_MAPPING: Dict[str, Type[arcor2_rpc.common.RPC]] = {rpc.__name__: rpc for rpc in EXPOSED_RPCS}
 
 
 class ExecutionState(Enum):
@@ -78,79 +85,187 @@ class Token(JsonSchemaMixin):
 
 app = create_app(__name__)
 
-ws: Optional[websocket.WebSocket] = None
-
-if TYPE_CHECKING:
-    ReqQueue = Queue[arcor2_rpc.common.RPC.Request]  # this is only processed by mypy
-    RespQueue = Queue[arcor2_rpc.common.RPC.Response]
-else:
-    ReqQueue = Queue  # this is not seen by mypy but will be executed at runtime.
-    RespQueue = Queue
+RPC_TIMEOUT = float(os.getenv("ARCOR2_EXECUTION_PROXY_RPC_TIMEOUT", 10.0))
 
+# the connection to the Execution service is handled by an event loop running in a dedicated thread
+loop = asyncio.new_event_loop()
+ws: Optional[websockets.WebSocketClientProtocol] = None
+ws_connected = Event()
 
-rpc_request_queue: ReqQueue = ReqQueue()
-rpc_responses: Dict[int, RespQueue] = {}
+# request id -> future for its response, only accessed from the loop
+rpc_responses: Dict[int, asyncio.Future] = {}
 
 package_state: Optional[PackageState.Data] = None
 package_info: Optional[PackageInfo.Data] = None
 exception_message: Optional[str] = None
 
 
-@contextmanager
-def tokens_db():
-    """This is a wrapper for SqliteDict enabling one to change all settings at
-    one place."""
+class TokenRegistry:
+    """In-memory registry of tokens loaded at startup.
+
+    Changes are written through to the database, which is not accessed
+    by anyone else.
+    """
+
+    def __init__(self, db_path: str) -> None:
+
+        self._lock = Lock()
+        self._db = SqliteDict(db_path, autocommit=True, encode=json.dumps, decode=json.loads)
+        self._tokens: Dict[str, Token] = {token_id: Token.from_dict(data) for token_id, data in self._db.items()}
+
+    def values(self) -> List[Token]:
+
+        with self._lock:
+            return list(self._tokens.values())
+
+    def get(self, token_id: str) -> Token:
+        """Raises KeyError for unknown token."""
+
+        return self._tokens[token_id]
+
+    def put(self, token: Token) -> None:
+
+        with self._lock:
+            self._tokens[token.id] = token
+            self._db[token.id] = token.to_dict()
+
+    def delete(self, token_id: str) -> None:
+        """Raises KeyError for unknown token."""
+
+        with self._lock:
+            del self._tokens[token_id]
+            del self._db[token_id]
+
+    def set_access(self, token_id: str, access: bool) -> None:
+        """Raises KeyError for unknown token."""
+
+        with self._lock:
+            token = self._tokens[token_id]
+            token.access = access
+            self._db[token_id] = token.to_dict()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+_token_registry: Optional[TokenRegistry] = None
+_token_registry_lock = Lock()
+
 
-    with SqliteDict(TOKENS_DB_PATH, autocommit=True, encode=json.dumps, decode=json.loads) as tokens:
-        yield tokens
+def tokens_db() -> TokenRegistry:
+    """Returns the token registry, which is created on the first call."""
 
+    global _token_registry
 
-def ws_thread() -> None:  # TODO use (refactored) arserver client
+    with _token_registry_lock:
+        if _token_registry is None:
+            _token_registry = TokenRegistry(TOKENS_DB_PATH)
+        return _token_registry
+
+
+def handle_message(message: Union[str, bytes]) -> None:
 
     global package_info
     global package_state
     global exception_message
-    assert ws
 
-    event_mapping: Dict[str, Type[events.Event]] = {evt.__name__: evt for evt in EVENTS}
-    rpc_mapping: Dict[str, Type[arcor2_rpc.common.RPC]] = {rpc.__name__: rpc for rpc in EXPOSED_RPCS}
+    data = json.loads(message)
+
+    if "event" in data:
+
+        evt = EVENT_MAPPING[data["event"]].from_dict(data)
+
+        if isinstance(evt, PackageInfo):
+            package_info = evt.data
+        elif isinstance(evt, PackageState):
+            package_state = evt.data
+
+            if package_state.state == PackageState.Data.StateEnum.RUNNING:
+                exception_message = None
+
+        elif isinstance(evt, ProjectException):
+            exception_message = evt.data.message
+
+    elif "response" in data:
+        resp = RPC_MAPPING[data["response"]].Response.from_dict(data)
+
+        try:
+            fut = rpc_responses.pop(resp.id)
+        except KeyError:  # e.g. the request already timed out
+            return
+
+        if not fut.done():
+            fut.set_result(resp)
+
+
+async def ws_client() -> None:  # TODO use (refactored) arserver client
+
+    global ws
 
     while True:
 
-        data = json.loads(ws.recv())  # TODO handle WebSocketConnectionClosedException
+        try:
+            logger.info("Connecting to the Execution service...")
 
-        if "event" in data:
+            async with websockets.connect(EXE_URL) as websocket:
 
-            evt = event_mapping[data["event"]].from_dict(data)
+                ws = websocket
+                ws_connected.set()
+                logger.info("Connected to the Execution service.")
 
-            if isinstance(evt, PackageInfo):
-                package_info = evt.data
-            elif isinstance(evt, PackageState):
-                package_state = evt.data
+                async for message in websocket:
+                    try:
+                        handle_message(message)
+                    except Exception as e:  # one malformed message should not break the connection
+                        logger.error(f"Failed to process message from the Execution service: {e}")
 
-                if package_state.state == PackageState.Data.StateEnum.RUNNING:
-                    exception_message = None
+        except websockets.exceptions.ConnectionClosed:
+            logger.warning("Connection to the Execution service closed.")
+        except Exception as e:  # e.g. ConnectionRefusedError, InvalidHandshake
+            logger.warning(f"Failed to connect to the Execution service: {e}")
+            await asyncio.sleep(1.0)
+        finally:
+            ws = None
 
-            elif isinstance(evt, ProjectException):
-                exception_message = evt.data.message
+            # there is no chance to get responses for the pending requests
+            for fut in rpc_responses.values():
+                if not fut.done():
+                    fut.set_exception(FlaskException("Connection to the Execution service lost.", error_code=503))
+            rpc_responses.clear()
 
-        elif "response" in data:
-            resp = rpc_mapping[data["response"]].Response.from_dict(data)
-            rpc_responses[resp.id].put(resp)
 
+def ws_thread() -> None:
 
-def call_rpc(req: arcor2_rpc.common.RPC.Request) -> arcor2_rpc.common.RPC.Response:
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(ws_client())
+
+
+async def _call_rpc(req: arcor2_rpc.common.RPC.Request) -> arcor2_rpc.common.RPC.Response:
+
+    if ws is None:
+        raise FlaskException("Not connected to the Execution service.", error_code=503)
 
     assert req.id not in rpc_responses
-    assert ws
 
-    rpc_responses[req.id] = RespQueue(maxsize=1)
+    fut = loop.create_future()
+    rpc_responses[req.id] = fut
 
-    ws.send(req.to_json())  # TODO handle WebSocketConnectionClosedException
+    try:
+        await ws.send(req.to_json())
+        return await asyncio.wait_for(fut, RPC_TIMEOUT)
+    except websockets.exceptions.ConnectionClosed:
+        raise FlaskException("Connection to the Execution service lost.", error_code=503)
+    except asyncio.TimeoutError:
+        raise FlaskException("The Execution service did not respond in time.", error_code=504)
+    finally:
+        rpc_responses.pop(req.id, None)
 
-    resp = rpc_responses[req.id].get()
-    del rpc_responses[req.id]
-    return resp
+
+def call_rpc(req: arcor2_rpc.common.RPC.Request) -> arcor2_rpc.common.RPC.Response:
+    """Can be called from any thread, any number of requests might be pending
+    at the same time."""
+
+    return asyncio.run_coroutine_threadsafe(_call_rpc(req), loop).result()
 
 
 def get_id() -> int:
@@ -165,6 +280,87 @@ def package_exists(package_id: str) -> bool:
     return os.path.exists(os.path.join(PROJECT_PATH, package_id))
 
 
+# package id -> lock, so the same archive is not built by more threads at once (nor removed while being sent)
+archive_locks: Dict[str, RLock] = defaultdict(RLock)
+
+
+def package_signature(package_id: str) -> str:
+    """Computes a signature of the package content based on file names, sizes
+    and modification times.
+
+    This is much cheaper than compressing the package.
+    """
+
+    package_path = os.path.join(PROJECT_PATH, package_id)
+    sig = hashlib.sha1()
+
+    for root, dirs, files in os.walk(package_path):
+        dirs.sort()
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            st = os.stat(file_path)
+            sig.update(f"{os.path.relpath(file_path, package_path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+
+    return sig.hexdigest()
+
+
+def package_archives_path(package_id: str) -> str:
+    """Each package has its own directory with archives (named by their
+    signatures)."""
+
+    return os.path.join(ARCHIVES_PATH, package_id)
+
+
+def remove_package_archives(package_id: str, keep: Optional[str] = None) -> None:
+
+    with archive_locks[package_id]:
+
+        try:
+            file_names = os.listdir(package_archives_path(package_id))
+        except FileNotFoundError:
+            return
+
+        for file_name in file_names:
+            archive_path = os.path.join(package_archives_path(package_id), file_name)
+            if archive_path != keep:
+                try:
+                    os.remove(archive_path)
+                except FileNotFoundError:
+                    pass
+
+
+def package_archive(package_id: str) -> Tuple[str, str]:
+    """Returns the package archive, which is built only if the package has
+    changed since the last time.
+
+    The archive might be removed as soon as the package changes, so it has to
+    be opened while holding archive_locks[package_id].
+
+    :param package_id:
+    :return: Path to the archive and its signature.
+    """
+
+    signature = package_signature(package_id)
+    archives_path = package_archives_path(package_id)
+    archive_path = os.path.join(archives_path, f"{signature}.zip")
+
+    with archive_locks[package_id]:
+
+        if not os.path.exists(archive_path):
+
+            os.makedirs(archives_path, exist_ok=True)
+
+            with tempfile.TemporaryDirectory(dir=ARCHIVES_PATH) as tmpdirname:
+                tmp_path = shutil.make_archive(
+                    os.path.join(tmpdirname, package_id), "zip", os.path.join(PROJECT_PATH, package_id)
+                )
+                os.replace(tmp_path, archive_path)
+
+            remove_package_archives(package_id, keep=archive_path)
+
+    return archive_path, signature
+
+
 @app.route("/tokens/create", methods=["POST"])
 def post_token() -> RespT:
     """post_token
@@ -192,11 +388,9 @@ def post_token() -> RespT:
     """
 
     token = Token(uuid.uuid4().hex, request.args["name"])
-    token_dict = token.to_dict()
-    with tokens_db() as tokens:
-        tokens[token.id] = token_dict
+    tokens_db().put(token)
 
-    return jsonify(token_dict), 200
+    return jsonify(token.to_dict()), 200
 
 
 @app.route("/tokens", methods=["GET"])
@@ -218,8 +412,7 @@ def get_tokens() -> RespT:
                   $ref: Token
     """
 
-    with tokens_db() as tokens:
-        return jsonify(list(tokens.values())), 200
+    return jsonify([token.to_dict() for token in tokens_db().values()]), 200
 
 
 @app.route("/tokens/<string:tokenId>", methods=["DELETE"])
@@ -242,11 +435,10 @@ def delete_token(tokenId: str) -> RespT:  # noqa
           description: Ok
     """
 
-    with tokens_db() as tokens:
-        try:
-            del tokens[tokenId]
-        except KeyError:
-            return "Token not found", 404
+    try:
+        tokens_db().delete(tokenId)
+    except KeyError:
+        return "Token not found", 404
 
     return "ok", 200
 
@@ -281,13 +473,10 @@ def put_token_access(tokenId: str) -> RespT:  # noqa
                     type: boolean
     """
 
-    with tokens_db() as tokens:
-        try:
-            token = Token.from_dict(tokens[tokenId])
-        except KeyError:
-            return "Token not found", 404
-        token.access = request.args["newAccess"] == "true"
-        tokens[tokenId] = token.to_dict()
+    try:
+        tokens_db().set_access(tokenId, request.args["newAccess"] == "true")
+    except KeyError:
+        return "Token not found", 404
 
     return "ok", 200
 
@@ -312,12 +501,10 @@ def get_token_access(tokenId: str) -> RespT:  # noqa
               description: Ok
     """
 
-    with tokens_db() as tokens:
-        try:
-            token = Token.from_dict(tokens[tokenId])
-        except KeyError:
-            return "Token not found", 404
-        return jsonify(token.access), 200
+    try:
+        return jsonify(tokens_db().get(tokenId).access), 200
+    except KeyError:
+        return "Token not found", 404
 
 
 @app.route("/packages/<string:packageId>", methods=["PUT"])
@@ -374,6 +561,7 @@ def put_package(packageId: str) -> RespT:  # noqa
             b64_str = b64_bytes.decode()
 
     resp = call_rpc(rpc.UploadPackage.Request(id=get_id(), args=rpc.UploadPackage.Request.Args(packageId, b64_str)))
+    remove_package_archives(packageId)
 
     if resp.result:
         return "ok", 200
@@ -405,6 +593,8 @@ def get_package(packageId: str) -> RespT:  # noqa
                   type: string
                   format: binary
                   example: The archive of execution package (.zip)
+        304:
+            description: Package was not modified (see If-None-Match header).
         404:
             description: Package ID was not found.
     """
@@ -412,12 +602,19 @@ def get_package(packageId: str) -> RespT:  # noqa
     if not package_exists(packageId):
         return "Not found", 404
 
-    with tempfile.TemporaryDirectory() as tmpdirname:
+    # send_file opens the archive, which then can't be removed by a concurrent request
+    with archive_locks[packageId]:
 
-        archive_path = os.path.join(tmpdirname, packageId)
-        shutil.make_archive(archive_path, "zip", os.path.join(PROJECT_PATH, packageId))
+        archive_path, signature = package_archive(packageId)
 
-        return send_file(archive_path + ".zip", as_attachment=True, cache_timeout=0)
+        return send_file(
+            archive_path,
+            as_attachment=True,
+            download_name=f"{packageId}.zip",
+            etag=signature,
+            conditional=True,
+            max_age=0,
+        )
 
 
 @app.route("/packages", methods=["GET"])
@@ -489,6 +686,7 @@ def delete_package(packageId: str) -> RespT:  # noqa
         return "Not found", 404
 
     resp = call_rpc(rpc.DeletePackage.Request(id=get_id(), args=arcor2_rpc.common.IdArgs(id=packageId)))
+    remove_package_archives(packageId)
 
     if resp.result:
         return "ok", 200
@@ -667,17 +865,10 @@ def main() -> None:
     parser.add_argument("-s", "--swagger", action="store_true", default=False)
     args = parser.parse_args()
 
-    global ws
-
-    while not args.swagger:
-        try:
-            ws = websocket.create_connection(EXE_URL, enable_multithread=True)
-            thread = Thread(target=ws_thread, daemon=True)
-            thread.start()
-            break
-        except ConnectionRefusedError:
-            print("Connecting to the Execution service...")
-            time.sleep(1.0)
+    if not args.swagger:
+        tokens_db()  # load tokens at startup
+        Thread(target=ws_thread, daemon=True).start()
+        ws_connected.wait()
 
     run_app(
         app,
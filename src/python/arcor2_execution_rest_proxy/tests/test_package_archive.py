@@ -0,0 +1,146 @@
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from typing import Iterator, Tuple
+
+import pytest
+
+from arcor2.data.rpc.common import RPC
+
+
+def create_package(project_path: str, package_id: str) -> str:
+
+    package_path = os.path.join(project_path, package_id)
+    os.makedirs(os.path.join(package_path, "data"))
+
+    with open(os.path.join(package_path, "script.py"), "w") as script:
+        script.write("print('hello')\n")
+
+    return package_path
+
+
+@pytest.fixture()
+def proxy(monkeypatch) -> Iterator[Tuple[object, str, str]]:
+    """Proxy module with empty project and archive directories."""
+
+    with tempfile.TemporaryDirectory() as project_path, tempfile.TemporaryDirectory() as archives_path:
+
+        monkeypatch.setenv("ARCOR2_PROJECT_PATH", project_path)
+
+        from arcor2_execution_rest_proxy.scripts import execution_rest_proxy as proxy
+
+        monkeypatch.setattr(proxy, "PROJECT_PATH", project_path)
+        monkeypatch.setattr(proxy, "ARCHIVES_PATH", archives_path)
+
+        def call_rpc(req: RPC.Request) -> RPC.Response:
+            return RPC.Response(req.id, True)
+
+        monkeypatch.setattr(proxy, "call_rpc", call_rpc)
+
+        yield proxy, project_path, archives_path
+
+
+def get(client, url: str, **kwargs):
+    """Response with the content read (the archive is closed)."""
+
+    resp = client.get(url, **kwargs)
+    resp.get_data()
+    resp.close()
+    return resp
+
+
+def archives(archives_path: str, package_id: str) -> int:
+
+    try:
+        return len(os.listdir(os.path.join(archives_path, package_id)))
+    except FileNotFoundError:
+        return 0
+
+
+def test_package_archive(proxy) -> None:
+
+    proxy, project_path, archives_path = proxy
+    package_path = create_package(project_path, "pkg")
+
+    client = proxy.app.test_client()
+
+    assert get(client, "/packages/unknown").status_code == 404
+
+    resp = get(client, "/packages/pkg")
+    assert resp.status_code == 200
+    etag = resp.headers["ETag"]
+
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zip_file:
+        assert zip_file.read("script.py") == b"print('hello')\n"
+
+    assert archives(archives_path, "pkg") == 1
+
+    # the same archive is served again
+    resp = get(client, "/packages/pkg")
+    assert resp.headers["ETag"] == etag
+
+    assert get(client, "/packages/pkg", headers={"If-None-Match": etag}).status_code == 304
+
+    with open(os.path.join(package_path, "data", "project.json"), "w") as project:
+        project.write("{}")
+
+    resp = get(client, "/packages/pkg", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zip_file:
+        assert zip_file.read("data/project.json") == b"{}"
+
+    assert archives(archives_path, "pkg") == 1  # the outdated archive is removed
+
+
+def test_invalidated(proxy) -> None:
+
+    proxy, project_path, archives_path = proxy
+
+    create_package(project_path, "pkg")
+    create_package(project_path, "pkg-b")  # its id starts with the id of the other package
+
+    client = proxy.app.test_client()
+
+    for package_id in ("pkg", "pkg-b"):
+        assert get(client, f"/packages/{package_id}").status_code == 200
+        assert archives(archives_path, package_id) == 1
+
+    # upload drops the archive, it is built again on the next request
+    resp = client.put("/packages/pkg", data={"executionPackage": (io.BytesIO(b"zip"), "pkg.zip")})
+    assert resp.status_code == 200
+    assert archives(archives_path, "pkg") == 0
+    assert archives(archives_path, "pkg-b") == 1
+
+    resp = get(client, "/packages/pkg")
+    assert resp.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zip_file:
+        assert zip_file.read("script.py") == b"print('hello')\n"
+    assert archives(archives_path, "pkg") == 1
+
+    assert client.delete("/packages/pkg").status_code == 200
+    assert archives(archives_path, "pkg") == 0
+    assert archives(archives_path, "pkg-b") == 1
+
+
+def test_not_removed_while_sent(proxy) -> None:
+
+    proxy, project_path, archives_path = proxy
+    create_package(project_path, "pkg")
+
+    proxy.package_archive("pkg")
+
+    with proxy.archive_locks["pkg"]:  # e.g. get_package is opening the file
+
+        remove = threading.Thread(target=proxy.remove_package_archives, args=("pkg",))
+        remove.start()
+        remove.join(0.1)
+
+        assert remove.is_alive()
+        assert archives(archives_path, "pkg") == 1
+
+    remove.join()
+    assert archives(archives_path, "pkg") == 0
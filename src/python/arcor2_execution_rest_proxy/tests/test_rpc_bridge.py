@@ -0,0 +1,125 @@
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from threading import Event, Thread
+
+import pytest
+import websockets
+
+from arcor2 import json
+from arcor2.helpers import find_free_port
+from arcor2_execution_data import rpc
+
+
+def test_concurrent_rpcs(monkeypatch) -> None:
+
+    monkeypatch.setenv("ARCOR2_PROJECT_PATH", tempfile.gettempdir())
+
+    from arcor2_execution_rest_proxy.scripts import execution_rest_proxy as proxy
+
+    from arcor2.flask import FlaskException
+
+    port = find_free_port()
+    monkeypatch.setattr(proxy, "EXE_URL", f"ws://127.0.0.1:{port}")
+    monkeypatch.setattr(proxy, "RPC_TIMEOUT", 0.5)
+
+    server_loop = asyncio.new_event_loop()
+
+    async def handler(websocket, path) -> None:
+        async def respond(message: str) -> None:
+            data = json.loads_type(message, dict)
+            if data["args"]["id"] == "slow":
+                return  # never responds
+            await asyncio.sleep(int(data["args"]["id"]) % 3 * 0.05)  # responses come in different order
+            resp = rpc.RunPackage.Response(data["id"], True, [data["args"]["id"]])
+            await websocket.send(resp.to_json())
+
+        async for message in websocket:
+            asyncio.ensure_future(respond(message))
+
+    def server() -> None:
+        asyncio.set_event_loop(server_loop)
+        server_loop.run_until_complete(websockets.serve(handler, "127.0.0.1", port))
+        server_loop.run_forever()
+
+    Thread(target=server, daemon=True).start()
+
+    if not proxy.ws_connected.is_set():  # the bridge can't be started twice (e.g. when the test is repeated)
+        Thread(target=proxy.ws_thread, daemon=True).start()
+        assert proxy.ws_connected.wait(5)
+
+    def call(package_id: str) -> str:
+        req = rpc.RunPackage.Request(proxy.get_id(), args=rpc.RunPackage.Request.Args(package_id))
+        resp = proxy.call_rpc(req)
+        assert resp.id == req.id
+        assert resp.messages
+        return resp.messages[0]
+
+    ids = [str(idx) for idx in range(30)]
+
+    with ThreadPoolExecutor(10) as executor:
+        assert list(executor.map(call, ids)) == ids
+
+    with pytest.raises(FlaskException) as exc_info:
+        call("slow")
+
+    assert exc_info.value.error_code == 504
+    assert not proxy.rpc_responses
+
+
+def test_bridge_survives_errors(monkeypatch) -> None:
+
+    monkeypatch.setenv("ARCOR2_PROJECT_PATH", tempfile.gettempdir())
+
+    from arcor2_execution_rest_proxy.scripts import execution_rest_proxy as proxy
+
+    port = find_free_port()
+    connections = 0
+
+    async def process_request(path, request_headers):
+        nonlocal connections
+        connections += 1
+        if connections == 1:  # the client gets InvalidHandshake
+            return HTTPStatus.SERVICE_UNAVAILABLE, [], b""
+        return None
+
+    async def handler(websocket, path) -> None:
+
+        await websocket.send("not a json")
+        await websocket.send(json.dumps({"event": "UnknownEvent"}))
+
+        async for message in websocket:
+            data = json.loads_type(message, dict)
+            await websocket.send(rpc.RunPackage.Response(data["id"], True, [data["args"]["id"]]).to_json())
+
+    server_loop = asyncio.new_event_loop()
+
+    def server() -> None:
+        asyncio.set_event_loop(server_loop)
+        server_loop.run_until_complete(websockets.serve(handler, "127.0.0.1", port, process_request=process_request))
+        server_loop.run_forever()
+
+    Thread(target=server, daemon=True).start()
+
+    # a separate instance of the bridge, so it does not interfere with the one of other tests
+    client_loop = asyncio.new_event_loop()
+    Thread(target=client_loop.run_forever, daemon=True).start()
+
+    monkeypatch.setattr(proxy, "EXE_URL", f"ws://127.0.0.1:{port}")
+    monkeypatch.setattr(proxy, "loop", client_loop)
+    monkeypatch.setattr(proxy, "ws_connected", Event())
+    monkeypatch.setattr(proxy, "rpc_responses", {})
+    monkeypatch.setattr(proxy, "ws", None)
+
+    bridge = asyncio.run_coroutine_threadsafe(proxy.ws_client(), client_loop)
+
+    try:
+        assert proxy.ws_connected.wait(5)
+        assert connections == 2
+
+        # malformed messages were ignored, the connection still works
+        req = rpc.RunPackage.Request(proxy.get_id(), args=rpc.RunPackage.Request.Args("pkg"))
+        assert proxy.call_rpc(req).messages == ["pkg"]
+    finally:
+        bridge.cancel()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+
+def test_tokens(monkeypatch) -> None:
+
+    monkeypatch.setenv("ARCOR2_PROJECT_PATH", tempfile.gettempdir())
+
+    from arcor2_execution_rest_proxy.scripts import execution_rest_proxy as proxy
+
+    with tempfile.TemporaryDirectory() as db_path:
+
+        tokens_db_path = os.path.join(db_path, "tokens")
+
+        monkeypatch.setattr(proxy, "TOKENS_DB_PATH", tokens_db_path)
+        monkeypatch.setattr(proxy, "_token_registry", None)
+
+        client = proxy.app.test_client()
+
+        assert client.get("/tokens").json == []
+
+        created = client.post("/tokens/create", query_string={"name": "hmi"}).json
+        assert created is not None
+        token = proxy.Token.from_dict(created)
+        assert token.name == "hmi"
+        assert not token.access
+
+        assert client.get(f"/tokens/{token.id}/access").json is False
+        assert client.put(f"/tokens/{token.id}/access", query_string={"newAccess": "true"}).status_code == 200
+        assert client.get(f"/tokens/{token.id}/access").json is True
+
+        assert client.get("/tokens/unknown/access").status_code == 404
+        assert client.put("/tokens/unknown/access", query_string={"newAccess": "true"}).status_code == 404
+        assert client.delete("/tokens/unknown").status_code == 404
+
+        # tokens are persisted
+        proxy.tokens_db().close()
+        monkeypatch.setattr(proxy, "_token_registry", None)
+
+        tokens = client.get("/tokens").json
+        assert tokens is not None
+        assert [proxy.Token.from_dict(t) for t in tokens] == [proxy.Token(token.id, "hmi", True)]
+
+        assert client.delete(f"/tokens/{token.id}").status_code == 200
+        assert client.get("/tokens").json == []
+
+        proxy.tokens_db().close()
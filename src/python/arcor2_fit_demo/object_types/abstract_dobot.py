@@ -1,3 +1,4 @@
+import copy
 from dataclasses import dataclass
 from typing import List, Optional, Set, cast
 
@@ -109,6 +110,40 @@ class AbstractDobot(FitCommonMixin, Robot):
                 params={"move_type": move_type, "velocity": velocity, "acceleration": acceleration},
             )
 
+    def move_sequence(
+        self,
+        poses: List[Pose],
+        move_type: MoveType,
+        velocity: float = 50.0,
+        acceleration: float = 50.0,
+    ) -> None:
+        """Moves the robot's end-effector through the poses without stopping
+        between them.
+
+        The service responds once the last move is done, so the timeout
+        grows with the number of poses.
+
+        :param poses: Target poses.
+        :move_type: Move type.
+        :param velocity: Speed of move (percent).
+        :param acceleration: Acceleration of move (percent).
+        :return:
+        """
+
+        assert 0.0 <= velocity <= 100.0
+        assert 0.0 <= acceleration <= 100.0
+
+        move_timeout = 10.0  # upper estimate of a single move's duration (even the slowest one)
+
+        with self._move_lock:
+            rest.call(
+                rest.Method.PUT,
+                f"{self.settings.url}/eef/pose/batch",
+                body=poses,
+                params={"move_type": move_type, "velocity": velocity, "acceleration": acceleration},
+                timeout=rest.Timeout(read=rest.Timeout().read + len(poses) * move_timeout),
+            )
+
     def suck(self, *, an: Optional[str] = None) -> None:
         rest.call(rest.Method.PUT, f"{self.settings.url}/suck")
 
@@ -123,13 +158,12 @@ class AbstractDobot(FitCommonMixin, Robot):
         :return:
         """
 
-        pick_pose.position.z += vertical_offset
-        self.move(pick_pose, MoveType.JOINTS)  # pre-pick pose
-        pick_pose.position.z -= vertical_offset
-        self.move(pick_pose, MoveType.JOINTS)  # pick pose
+        pre_pick_pose = copy.deepcopy(pick_pose)
+        pre_pick_pose.position.z += vertical_offset
+
+        self.move_sequence([pre_pick_pose, pick_pose], MoveType.JOINTS)
         self.suck()
-        pick_pose.position.z += vertical_offset
-        self.move(pick_pose, MoveType.JOINTS)  # pre-pick pose
+        self.move(pre_pick_pose, MoveType.JOINTS)
 
     def place(self, place_pose: Pose, vertical_offset: float = 0.05, *, an: Optional[str] = None) -> None:
         """Places an item to a given pose.
@@ -139,13 +173,12 @@ class AbstractDobot(FitCommonMixin, Robot):
         :return:
         """
 
-        place_pose.position.z += vertical_offset
-        self.move(place_pose, MoveType.JOINTS)  # pre-place pose
-        place_pose.position.z -= vertical_offset
-        self.move(place_pose, MoveType.JOINTS)  # place pose
+        pre_place_pose = copy.deepcopy(place_pose)
+        pre_place_pose.position.z += vertical_offset
+
+        self.move_sequence([pre_place_pose, place_pose], MoveType.JOINTS)
         self.release()
-        place_pose.position.z += vertical_offset
-        self.move(place_pose, MoveType.JOINTS)  # pre-place pose
+        self.move(pre_place_pose, MoveType.JOINTS)
 
     def robot_joints(self) -> List[Joint]:
         return rest.call(rest.Method.GET, f"{self.settings.url}/joints", list_return_type=Joint)
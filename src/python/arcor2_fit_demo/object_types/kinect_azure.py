@@ -1,17 +1,23 @@
-from io import BytesIO
-from typing import Optional
+from typing import Dict, Iterator, Optional, Union
 
+import numpy as np
 from PIL import Image
 
 from arcor2 import rest
-from arcor2.data.camera import CameraParameters
+from arcor2.data.camera import CameraParameters, Roi
 from arcor2.data.common import ActionMetadata, Pose
 from arcor2.data.object_type import Models
+from arcor2.exceptions import Arcor2Exception
+from arcor2.image import DEPTH_SHAPE_HEADER, depth_from_bytes, roi_to_str, shape_from_str
 from arcor2.object_types.abstract import Camera
 
 from .fit_common_mixin import FitCommonMixin, UrlSettings
 
 
+class KinectAzureException(Arcor2Exception):
+    pass
+
+
 class KinectAzure(FitCommonMixin, Camera):
 
     _ABSTRACT = False
@@ -45,15 +51,57 @@ class KinectAzure(FitCommonMixin, Camera):
     def color_image(self, *, an: Optional[str] = None) -> Image.Image:
         return rest.get_image(f"{self.settings.url}/color/image")
 
+    def color_image_region(self, roi: Optional[Roi] = None, scale: float = 1.0) -> Image.Image:
+        return rest.get_image(f"{self.settings.url}/color/image", params=self._region_params(roi, scale))
+
     def depth_image(self, averaged_frames: int = 1, *, an: Optional[str] = None) -> Image.Image:
-        return Image.open(
-            rest.call(
-                rest.Method.GET,
-                f"{self.settings.url}/depth/image",
-                return_type=BytesIO,
-                params={"averagedFrames": averaged_frames},
-            )
-        )
+        return Image.fromarray(self.depth_array(averaged_frames))
+
+    def depth_array(self, averaged_frames: int = 1, roi: Optional[Roi] = None, scale: float = 1.0) -> np.ndarray:
+
+        params = self._region_params(roi, scale)
+        params["averagedFrames"] = averaged_frames
+
+        resp = rest.get_raw(f"{self.settings.url}/depth/raw", params=params)
+
+        try:
+            shape = shape_from_str(resp.headers[DEPTH_SHAPE_HEADER])
+        except KeyError:
+            raise KinectAzureException("Depth shape not provided.")
+
+        return depth_from_bytes(resp.content, shape)
+
+    @staticmethod
+    def _region_params(roi: Optional[Roi], scale: float) -> Dict[str, Union[str, int, float, bool]]:
+
+        params: Dict[str, Union[str, int, float, bool]] = {"scale": scale}
+
+        if roi:
+            params["roi"] = roi_to_str(roi)
+
+        return params
+
+    def color_stream(self, fps: float = 10.0, scale: float = 1.0) -> Iterator[Image.Image]:
+        """Yields color images as they come from the sensor (one connection
+        for all of them). The stream ends when the generator is closed or
+        the sensor is stopped.
+
+        :param fps: Maximal frame rate.
+        :param scale: Downscale factor (0, 1>.
+        :return:
+        """
+
+        return rest.get_image_stream(f"{self.settings.url}/color/stream", params={"fps": fps, "scale": scale})
+
+    def depth_stream(self, fps: float = 10.0, scale: float = 1.0) -> Iterator[Image.Image]:
+        """Yields depth images as they come from the sensor.
+
+        :param fps: Maximal frame rate.
+        :param scale: Downscale factor (0, 1>.
+        :return:
+        """
+
+        return rest.get_image_stream(f"{self.settings.url}/depth/stream", params={"fps": fps, "scale": scale})
 
     def sync_images(self) -> None:
         pass
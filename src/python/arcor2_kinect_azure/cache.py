@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Tuple
+
+from dataclasses_jsonschema import JsonSchemaMixin
+
+CACHE_SIZE = max(int(os.getenv("ARCOR2_KINECT_AZURE_CACHE_SIZE", 16)), 1)
+
+# capture timestamp, format and its parameters (quality, scale, etc.)
+Key = Tuple[float, str, Tuple[Hashable, ...]]
+
+
+@dataclass
+class CacheMetrics(JsonSchemaMixin):
+
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+
+
+class EncodedFrameCache:
+    """LRU cache of encoded images.
+
+    When more threads ask for the same (not yet cached) key at once, the
+    image is encoded only once and the other threads wait for it.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE) -> None:
+
+        self._size = size
+        self._data: "OrderedDict[Key, bytes]" = OrderedDict()
+        self._pending: Dict[Key, threading.Event] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Key, encode: Callable[[], bytes]) -> bytes:
+
+        while True:
+
+            with self._lock:
+
+                try:
+                    data = self._data[key]
+                except KeyError:
+                    pass
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return data
+
+                event = self._pending.get(key)
+
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+
+            event.wait()  # if encoding fails in the other thread, this one will try it again
+
+        try:
+            data = encode()
+            with self._lock:
+                self._data[key] = data
+                if len(self._data) > self._size:
+                    self._data.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+        return data
+
+    def metrics(self) -> CacheMetrics:
+
+        with self._lock:
+            total = self.hits + self.misses
+            return CacheMetrics(self.hits, self.misses, self.hits / total if total else 0.0, len(self._data))
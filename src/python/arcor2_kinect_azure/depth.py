@@ -0,0 +1,141 @@
+"""Streaming (frame by frame) averaging of depth images.
+
+Pixels with zero depth are invalid (no data from the sensor) and do not
+contribute to the result.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+from arcor2.data.common import StrEnum
+
+MEDIAN_FRAMES = max(int(os.getenv("ARCOR2_KINECT_AZURE_MEDIAN_FRAMES", 9)), 1)
+CONVERGENCE_QUANTILE = 0.95
+CONVERGENCE_STEP = 4  # the quantile is estimated from every n-th pixel (in both directions)
+
+
+class AveragingMethod(StrEnum):
+
+    MEAN: str = "mean"
+    MEDIAN: str = "median"
+
+
+class DepthAverage:
+    """Per-pixel running statistics of the added depth images.
+
+    Memory does not depend on number of frames - mean and variance are
+    computed from running sums, median is computed from (at most)
+    MEDIAN_FRAMES latest frames.
+    """
+
+    def __init__(self, method: AveragingMethod = AveragingMethod.MEAN, median_frames: int = MEDIAN_FRAMES) -> None:
+
+        self.method = method
+        self.frames = 0
+
+        self._median_frames = median_frames
+
+        self._count: Optional[np.ndarray] = None
+        self._sum: Optional[np.ndarray] = None
+        self._sum_sq: Optional[np.ndarray] = None
+        self._window: Optional[np.ndarray] = None
+
+    def add(self, depth: np.ndarray) -> None:
+
+        if self._count is None:
+            # integer sums are exact and faster than floating point ones
+            self._count = np.zeros(depth.shape, dtype=np.uint32)
+            self._sum = np.zeros(depth.shape, dtype=np.uint32)
+            self._sum_sq = np.zeros(depth.shape, dtype=np.uint64)
+
+            if self.method == AveragingMethod.MEDIAN:
+                self._window = np.zeros((self._median_frames,) + depth.shape, dtype=depth.dtype)
+
+        assert self._sum is not None
+        assert self._sum_sq is not None
+
+        if depth.shape != self._count.shape:
+            raise ValueError("Depth images differ in size.")
+
+        # invalid pixels are zeros, so they don't change the sums
+        values = depth.astype(np.uint32)
+        self._count += depth > 0
+        self._sum += values
+        values *= values  # fits into uint32 for uint16 input
+        self._sum_sq += values
+
+        if self._window is not None:
+            self._window[self.frames % self._median_frames] = depth
+
+        self.frames += 1
+
+    def standard_error(self, step: int = 1) -> np.ndarray:
+        """Standard error of the mean for pixels with at least two valid
+        values.
+
+        :param step: Only every n-th pixel (in both directions) is considered.
+        :return: 1D array.
+        """
+
+        if self._count is None:
+            return np.empty(0)
+
+        assert self._sum is not None
+        assert self._sum_sq is not None
+
+        count = self._count[::step, ::step]
+        mask = count > 1
+
+        n = count[mask].astype(np.float64)
+        total = self._sum[::step, ::step][mask].astype(np.float64)
+        total_sq = self._sum_sq[::step, ::step][mask].astype(np.float64)
+
+        var = np.maximum(total_sq - total * total / n, 0) / (n - 1)
+        return np.sqrt(var / n)
+
+    def converged(self, tolerance: float) -> bool:
+        """Standard error of most pixels is within the tolerance.
+
+        :param tolerance: In millimeters.
+        :return:
+        """
+
+        error = self.standard_error(CONVERGENCE_STEP)
+
+        if not error.size:
+            return False
+
+        return bool(np.quantile(error, CONVERGENCE_QUANTILE) <= tolerance)
+
+    def result(self) -> np.ndarray:
+        """Averaged depth, pixels without valid value are zeros.
+
+        :return: uint16 array.
+        """
+
+        if self._count is None:
+            raise ValueError("No frames added.")
+
+        if self._window is not None:
+            return self._median()
+
+        assert self._sum is not None
+
+        mean = np.divide(self._sum, self._count, out=np.zeros(self._sum.shape), where=self._count > 0)
+        return np.rint(mean).astype(np.uint16)
+
+    def _median(self) -> np.ndarray:
+
+        assert self._window is not None
+
+        window = np.sort(self._window[: min(self.frames, self._median_frames)], axis=0)  # zeros go first
+        valid = np.count_nonzero(window, axis=0)
+        first = window.shape[0] - valid  # index of the first valid value
+        last = window.shape[0] - 1  # pixels without any valid value have only zeros
+
+        lower = np.take_along_axis(window, np.minimum(first + (valid - 1) // 2, last)[np.newaxis], axis=0)[0]
+        upper = np.take_along_axis(window, np.minimum(first + valid // 2, last)[np.newaxis], axis=0)[0]
+
+        return ((lower.astype(np.uint32) + upper) // 2).astype(np.uint16)
@@ -0,0 +1,342 @@
+"""Sensor-independent part of the service - pyk4a is not needed here, so the
+mock can run without it."""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Iterator, NamedTuple, Optional
+
+import cv2
+import numpy as np
+from arcor2_kinect_azure.depth import AveragingMethod, DepthAverage
+from PIL import Image
+
+from arcor2.data.camera import CameraParameters
+from arcor2.exceptions import Arcor2Exception
+from arcor2.logging import get_logger
+
+logger = get_logger(__name__)
+
+BUFFER_SIZE = max(int(os.getenv("ARCOR2_KINECT_AZURE_BUFFER_SIZE", 5)), 1)
+FRAME_TIMEOUT = 1.0
+ERROR_DELAY = 0.1  # before the next attempt to grab a frame after an unexpected error
+JPEG_QUALITY = 75  # the same as PIL's default
+
+DEPTH_TOLERANCE = float(os.getenv("ARCOR2_KINECT_AZURE_DEPTH_TOLERANCE", 0.5))
+MIN_AVERAGED_FRAMES = 3
+
+
+class KinectAzureException(Arcor2Exception):
+    pass
+
+
+class ColorAndDepthImage(NamedTuple):
+
+    color: Image.Image
+    depth: Image.Image
+
+
+class Frame(ABC):
+    """Color and depth images captured at the same time.
+
+    Frames are shared by all consumers, so images must not be modified.
+    """
+
+    def __init__(self, timestamp: float) -> None:
+        self.timestamp = timestamp
+
+    @property
+    @abstractmethod
+    def color(self) -> np.ndarray:
+        """BGRA image (uint8)."""
+
+    @property
+    @abstractmethod
+    def depth(self) -> np.ndarray:
+        """Depth in millimeters (uint16), transformed into the color camera."""
+
+
+class StaticFrame(Frame):
+    def __init__(self, timestamp: float, color: np.ndarray, depth: np.ndarray) -> None:
+
+        super().__init__(timestamp)
+        self._color = color
+        self._depth = depth
+
+    @property
+    def color(self) -> np.ndarray:
+        return self._color
+
+    @property
+    def depth(self) -> np.ndarray:
+        return self._depth
+
+
+class FrameBuffer:
+    """Ring buffer of the latest frames.
+
+    Consumers may wait for a frame newer than the one they already have.
+    """
+
+    def __init__(self, size: int = BUFFER_SIZE) -> None:
+
+        self._frames: Deque[Frame] = deque(maxlen=size)
+        self._cond = threading.Condition()
+
+    def put(self, frame: Frame) -> None:
+
+        with self._cond:
+            self._frames.append(frame)
+            self._cond.notify_all()
+
+    def latest(self, timeout: float = FRAME_TIMEOUT) -> Frame:
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames, timeout):
+                raise KinectAzureException("No frame available.")
+            return self._frames[-1]
+
+    def newer_than(self, timestamp: float, timeout: float = FRAME_TIMEOUT) -> Frame:
+        """Returns the oldest buffered frame newer than the given timestamp,
+        waits for it if there is no such frame yet.
+
+        :param timestamp:
+        :param timeout:
+        :return:
+        """
+
+        with self._cond:
+
+            if not self._cond.wait_for(lambda: self._frames and self._frames[-1].timestamp > timestamp, timeout):
+                raise KinectAzureException("No new frame available.")
+
+            for frame in self._frames:
+                if frame.timestamp > timestamp:
+                    return frame
+
+        raise AssertionError("Unreachable.")
+
+    def frames(
+        self, count: int, newer_than: Optional[float] = None, buffered: bool = False, timeout: float = FRAME_TIMEOUT
+    ) -> Iterator[Frame]:
+        """Yields consecutive frames, e.g. for averaging.
+
+        :param count: Number of frames.
+        :param newer_than: Only frames newer than the timestamp are yielded. When not set, the latest frame is the
+        first one.
+        :param buffered: Start with already buffered frames (up to count) instead of waiting for the new ones.
+        :param timeout: For each frame.
+        :return:
+        """
+
+        if count < 1:
+            return
+
+        frame: Optional[Frame] = None
+
+        if buffered:
+            with self._cond:
+                candidates = [f for f in self._frames if newer_than is None or f.timestamp > newer_than]
+                if candidates:
+                    frame = candidates[-count] if len(candidates) >= count else candidates[0]
+
+        if frame is None:
+            frame = self.latest(timeout) if newer_than is None else self.newer_than(newer_than, timeout)
+
+        yield frame
+
+        for _ in range(count - 1):
+            frame = self.newer_than(frame.timestamp, timeout)
+            yield frame
+
+
+def bgra_to_rgba(arr: np.ndarray) -> np.ndarray:
+    """Converts the image in one pass into a new array (frames are shared, so
+    the conversion can't be done in place)."""
+
+    return cv2.cvtColor(arr, cv2.COLOR_BGRA2RGBA)
+
+
+def encode_jpeg(bgra: np.ndarray, quality: int = JPEG_QUALITY) -> bytes:
+    """Encodes the image as it comes from the sensor - the encoder drops the
+    alpha channel on the fly, so there is no need for an intermediate RGB
+    copy.
+
+    :param bgra:
+    :param quality:
+    :return:
+    """
+
+    ok, buff = cv2.imencode(".jpg", bgra, [cv2.IMWRITE_JPEG_QUALITY, quality])
+
+    if not ok:
+        raise KinectAzureException("Failed to encode the image.")
+
+    return buff.tobytes()
+
+
+def encode_png(depth: np.ndarray, compression: int = 1) -> bytes:
+    """Encodes (16-bit) depth image.
+
+    :param depth:
+    :param compression: 0-9, default is fast enough for streaming.
+    :return:
+    """
+
+    ok, buff = cv2.imencode(".png", depth, [cv2.IMWRITE_PNG_COMPRESSION, compression])
+
+    if not ok:
+        raise KinectAzureException("Failed to encode the image.")
+
+    return buff.tobytes()
+
+
+def color_image(frame: Frame) -> Image.Image:
+
+    return Image.fromarray(bgra_to_rgba(frame.color), mode="RGBA")
+
+
+def depth_image(frame: Frame) -> Image.Image:
+
+    return Image.fromarray(frame.depth)
+
+
+class AveragedDepth(NamedTuple):
+
+    depth: np.ndarray
+    frames: int  # number of actually used frames
+    timestamp: float  # of the last used frame
+
+
+class FrameSource(ABC):
+    """Continuously captures frames in a background thread and fills the
+    buffer."""
+
+    def __init__(self, buffer_size: int = BUFFER_SIZE) -> None:
+
+        self.buffer = FrameBuffer(buffer_size)
+        self.color_camera_params: Optional[CameraParameters] = None
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+
+    @abstractmethod
+    def _grab(self) -> Frame:
+        """Blocks until a new frame is captured."""
+
+    def _capture_loop(self) -> None:
+
+        while not self._stop_event.is_set():
+            try:
+                self.buffer.put(self._grab())
+            except KinectAzureException as e:
+                logger.warning(str(e))
+            except Exception:  # the thread must not end, requests would just time out waiting for a frame
+                logger.exception("Failed to grab a frame.")
+                self._stop_event.wait(ERROR_DELAY)
+
+    def start_capturing(self) -> None:
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._stop_event.is_set()
+
+    def frame(self, newer_than: Optional[float] = None) -> Frame:
+        """Returns the latest frame or the first one newer than the given
+        timestamp."""
+
+        return self.buffer.latest() if newer_than is None else self.buffer.newer_than(newer_than)
+
+    def averaged_depth(
+        self,
+        averaged_frames: int = 1,
+        newer_than: Optional[float] = None,
+        buffered: bool = False,
+        method: AveragingMethod = AveragingMethod.MEAN,
+        tolerance: float = DEPTH_TOLERANCE,
+    ) -> AveragedDepth:
+        """Averages depth frames as they come.
+
+        :param averaged_frames: Maximal number of frames.
+        :param newer_than: See FrameBuffer.frames.
+        :param buffered: See FrameBuffer.frames.
+        :param method:
+        :param tolerance: Averaging ends sooner when the (standard) error is within the tolerance (mm). Zero
+        disables this.
+        :return:
+        """
+
+        if averaged_frames < 1:
+            raise KinectAzureException("At least one frame has to be averaged.")
+
+        avg = DepthAverage(method)
+        last: Optional[Frame] = None
+
+        for last in self.buffer.frames(averaged_frames, newer_than, buffered):
+
+            avg.add(last.depth)
+
+            if tolerance > 0 and MIN_AVERAGED_FRAMES <= avg.frames < averaged_frames and avg.converged(tolerance):
+                break
+
+        assert last is not None
+        return AveragedDepth(avg.result(), avg.frames, last.timestamp)
+
+    def color_image(self, newer_than: Optional[float] = None) -> Image.Image:
+
+        return color_image(self.frame(newer_than))
+
+    def depth_image(
+        self,
+        averaged_frames: int = 1,
+        newer_than: Optional[float] = None,
+        buffered: bool = False,
+        method: AveragingMethod = AveragingMethod.MEAN,
+        tolerance: float = DEPTH_TOLERANCE,
+    ) -> Image.Image:
+
+        return Image.fromarray(self.averaged_depth(averaged_frames, newer_than, buffered, method, tolerance).depth)
+
+    def sync_images(self, newer_than: Optional[float] = None) -> ColorAndDepthImage:
+
+        frame = self.frame(newer_than)
+        return ColorAndDepthImage(color_image(frame), depth_image(frame))
+
+    def cleanup(self) -> None:
+
+        self._stop_event.set()
+
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+class MockKinectAzure(FrameSource):
+    """Provides still images at the rate of the real sensor."""
+
+    FPS = 30
+
+    def __init__(self, color: Image.Image, depth: Image.Image, buffer_size: int = BUFFER_SIZE) -> None:
+
+        super().__init__(buffer_size)
+
+        self.color_camera_params = CameraParameters(
+            915.575, 915.425, 957.69, 556.35, [0.447, -2.5, 0.00094, -0.00053, 1.432, 0.329, -2.332, 1.363]
+        )
+
+        self._color = cv2.cvtColor(np.array(color.convert("RGB")), cv2.COLOR_RGB2BGRA)
+        self._depth = np.array(depth).astype(np.uint16)
+
+        self._color.flags.writeable = False
+        self._depth.flags.writeable = False
+
+        self._next_frame = time.monotonic()
+        self.start_capturing()
+
+    def _grab(self) -> Frame:
+
+        self._next_frame += 1.0 / self.FPS
+        time.sleep(max(self._next_frame - time.monotonic(), 0))
+        return StaticFrame(time.time(), self._color, self._depth)
@@ -1,30 +1,47 @@
 import json
-from threading import Lock
-from typing import NamedTuple, Optional
+import time
+from typing import Optional
 
 import numpy as np
 import pyk4a
-from PIL import Image
+from arcor2_kinect_azure.frames import ColorAndDepthImage, Frame, FrameSource, KinectAzureException
 from pyk4a import Config, ImageFormat, K4AException, PyK4A, PyK4ACapture
 
 from arcor2.data.camera import CameraParameters
-from arcor2.exceptions import Arcor2Exception
 
+__all__ = ["ColorAndDepthImage", "KinectAzure", "KinectAzureException"]
 
-class KinectAzureException(Arcor2Exception):
-    pass
 
+class KinectFrame(Frame):
+    """Images are obtained (and depth transformed) lazily, only when
+    requested."""
 
-class ColorAndDepthImage(NamedTuple):
+    def __init__(self, timestamp: float, capture: PyK4ACapture) -> None:
 
-    color: Image.Image
-    depth: Image.Image
+        super().__init__(timestamp)
+        self._capture = capture
 
+    @property
+    def color(self) -> np.ndarray:
 
-class KinectAzure:
+        if self._capture.color is None:
+            raise KinectAzureException("Color image not available.")
+
+        return self._capture.color
+
+    @property
+    def depth(self) -> np.ndarray:
+
+        if self._capture.transformed_depth is None:
+            raise KinectAzureException("Depth image not available.")
+
+        return self._capture.transformed_depth
+
+
+class KinectAzure(FrameSource):
     def __init__(self) -> None:
 
-        self._lock = Lock()
+        super().__init__()
 
         self._k4a = PyK4A(
             Config(
@@ -50,10 +67,11 @@ class KinectAzure:
 
         # "CALIBRATION_LensDistortionModelBrownConrady"
 
+        self.start_capturing()
         img = self.color_image()
 
         # no need to handle depth camera parameters as we will always provide transformed depth image
-        self.color_camera_params: Optional[CameraParameters] = None
+        color_camera_params: Optional[CameraParameters] = None
 
         try:
             for camera in c["CalibrationInformation"]["Cameras"]:
@@ -88,71 +106,34 @@ class KinectAzure:
                     cp.fx *= img.width
                     cp.fy *= h
 
-                    assert self.color_camera_params is None
+                    assert color_camera_params is None
 
                     # apply crop offset
                     cp.cy -= (img.width / 4 * 3 - img.width / 16 * 9) / 2
-                    self.color_camera_params = cp
+                    color_camera_params = cp
 
                     break
 
         except (KeyError, IndexError) as e:
+            self.cleanup()
             raise KinectAzureException("Failed to parse calibration.") from e
 
-        if self.color_camera_params is None:
+        if color_camera_params is None:
+            self.cleanup()
             raise KinectAzureException("Failed to get camera calibration.")
 
-    def _bgra_to_rgba(self, arr: np.ndarray) -> None:
+        self.color_camera_params = color_camera_params
 
-        arr[:, :, [0, 1, 2, 3]] = arr[:, :, [2, 1, 0, 3]]
-
-    def _capture(self) -> PyK4ACapture:
-
-        with self._lock:
-
-            try:
-                return self._k4a.get_capture(timeout=1000)
-            except K4AException as e:
-                raise KinectAzureException("Failed to get capture.") from e
-
-    def color_image(self) -> Image.Image:
-
-        capture = self._capture()
-
-        if capture.color is None:
-            raise KinectAzureException("Color image not available.")
+    def _grab(self) -> Frame:
 
-        self._bgra_to_rgba(capture.color)
-        return Image.fromarray(capture.color, mode="RGBA")
-
-    def _depth_image(self) -> np.ndarray:
-
-        capture = self._capture()
-
-        if capture.transformed_depth is None:
-            raise KinectAzureException("Depth image not available.")
-
-        return capture.transformed_depth
-
-    def depth_image(self, averaged_frames: int = 1) -> Image.Image:
-
-        img = self._depth_image()
-        array = img.astype(np.float32)
-
-        for _ in range(averaged_frames):
-            array += self._depth_image().astype(np.float32)
-
-        return Image.fromarray((array / averaged_frames).astype(img.dtype))
-
-    def sync_images(self) -> ColorAndDepthImage:
-
-        capture = self._capture()
-
-        if not capture.color or not capture.depth:
-            raise KinectAzureException("Color/depth image not available.")
+        try:
+            capture = self._k4a.get_capture(timeout=1000)
+        except K4AException as e:
+            raise KinectAzureException("Failed to get capture.") from e
 
-        self._bgra_to_rgba(capture.color)
-        return ColorAndDepthImage(Image.fromarray(capture.color), Image.fromarray(capture.transformed_depth))
+        return KinectFrame(time.time(), capture)
 
     def cleanup(self) -> None:
+
+        super().cleanup()
         self._k4a.stop()
@@ -1,20 +1,36 @@
 #!/usr/bin/env python3
 
 import argparse
+import gzip
 import io
 import os
 import zipfile
 from functools import wraps
-from typing import TYPE_CHECKING, Optional
+from typing import Iterator, Optional
 
+import cv2
 from arcor2_kinect_azure import get_data, version
-from flask import jsonify, request, send_file
+from arcor2_kinect_azure.cache import CacheMetrics, EncodedFrameCache
+from arcor2_kinect_azure.depth import AveragingMethod
+from arcor2_kinect_azure.frames import (
+    DEPTH_TOLERANCE,
+    JPEG_QUALITY,
+    AveragedDepth,
+    Frame,
+    FrameSource,
+    MockKinectAzure,
+    encode_jpeg,
+    encode_png,
+)
+from arcor2_kinect_azure.stream import MIMETYPE, TIMESTAMP_HEADER, multipart_stream
+from flask import Response, jsonify, request, send_file
 from PIL import Image
 
-from arcor2.data.camera import CameraParameters
-from arcor2.flask import RespT, create_app, run_app
+from arcor2.data.camera import CameraParameters, Roi
+from arcor2.exceptions import Arcor2Exception
+from arcor2.flask import FlaskException, RespT, create_app, run_app
 from arcor2.helpers import port_from_url
-from arcor2.image import image_to_bytes_io
+from arcor2.image import DEPTH_SHAPE_HEADER, depth_to_bytes, region, roi_from_str, roi_to_str, shape_to_str
 from arcor2.logging import get_logger
 
 logger = get_logger(__name__)
@@ -24,19 +40,16 @@ SERVICE_NAME = "Kinect Azure Service"
 
 app = create_app(__name__)
 
-if TYPE_CHECKING:
-    from arcor2_kinect_azure.kinect_azure import KinectAzure
+AVERAGED_FRAMES_HEADER = "X-Averaged-Frames"
+CAMERA_PARAMETERS_HEADER = "X-Camera-Parameters"
 
-_kinect: Optional["KinectAzure"] = None
+_kinect: Optional[FrameSource] = None
+_cache = EncodedFrameCache()
 _mock: bool = False
-_mock_started: bool = False
 
 
 def started() -> bool:
 
-    if _mock:
-        return _mock_started
-
     return _kinect is not None
 
 
@@ -50,14 +63,90 @@ def requires_started(f):
     return wrapped
 
 
-def color_image() -> Image.Image:
+def newer_than() -> Optional[float]:
+
+    value = request.args.get("newerThan")
+
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        raise FlaskException("Invalid timestamp.", error_code=400)
+
+
+def averaged_depth(averaged_frames: int) -> AveragedDepth:
+
+    assert _kinect is not None
+
+    try:
+        method = AveragingMethod(request.args.get("method", default=AveragingMethod.MEAN.value))
+    except ValueError:
+        raise FlaskException("Unknown averaging method.", error_code=400)
+
+    return _kinect.averaged_depth(
+        averaged_frames,
+        newer_than(),
+        request.args.get("buffered", default="false") == "true",
+        method,
+        number_arg("tolerance", DEPTH_TOLERANCE, 0, 1000),
+    )
+
+
+def jpeg(frame: Frame, quality: int = JPEG_QUALITY, scale: float = 1.0, roi: Optional[Roi] = None) -> bytes:
+
+    return _cache.get(
+        (frame.timestamp, "jpeg", (quality, scale, roi_to_str(roi) if roi else None)),
+        lambda: encode_jpeg(region(frame.color, roi, scale), quality),
+    )
+
+
+def png(frame: Frame, scale: float = 1.0, roi: Optional[Roi] = None) -> bytes:
+
+    return _cache.get(
+        (frame.timestamp, "png", (scale, roi_to_str(roi) if roi else None)),
+        lambda: encode_png(region(frame.depth, roi, scale, cv2.INTER_NEAREST)),
+    )
+
+
+def number_arg(name: str, default: float, minimum: float, maximum: float) -> float:
+
+    try:
+        value = float(request.args.get(name, default=default))
+    except ValueError:
+        raise FlaskException(f"Invalid {name}.", error_code=400)
+
+    if not minimum <= value <= maximum:
+        raise FlaskException(f"{name} has to be within <{minimum}, {maximum}>.", error_code=400)
+
+    return value
+
+
+def roi_arg() -> Optional[Roi]:
+
+    value = request.args.get("roi")
 
-    return Image.open(get_data("rgb.jpg"))
+    if not value:
+        return None
 
+    try:
+        return roi_from_str(value)
+    except Arcor2Exception:
+        raise FlaskException("Invalid roi.", error_code=400)
 
-def depth_image() -> Image.Image:
 
-    return Image.open(get_data("depth.png"))
+def stream_response(stream: Iterator[bytes]) -> Response:
+
+    resp = Response(stream, mimetype=MIMETYPE)
+    resp.headers["Cache-Control"] = "no-cache, no-store"
+    return resp
+
+
+def with_timestamp(resp: Response, timestamp: float) -> Response:
+
+    resp.headers[TIMESTAMP_HEADER] = repr(timestamp)
+    return resp
 
 
 @app.route("/state/start", methods=["PUT"])
@@ -78,16 +167,16 @@ def put_start() -> RespT:
     if started():
         return "Already started.", 403
 
+    global _kinect
+    assert _kinect is None
+
     if _mock:
-        global _mock_started
-        _mock_started = True
+        _kinect = MockKinectAzure(Image.open(get_data("rgb.jpg")), Image.open(get_data("depth.png")))
     else:
 
         # lazy import so mock mode can work without pyk4a installed
         from arcor2_kinect_azure.kinect_azure import KinectAzure
 
-        global _kinect
-        assert _kinect is None
         _kinect = KinectAzure()
 
     return "ok", 200
@@ -109,14 +198,10 @@ def put_stop() -> RespT:
               description: Not started
     """
 
-    if _mock:
-        global _mock_started
-        _mock_started = False
-    else:
-        global _kinect
-        assert _kinect is not None
-        _kinect.cleanup()
-        _kinect = None
+    global _kinect
+    assert _kinect is not None
+    _kinect.cleanup()
+    _kinect = None
     return "ok", 200
 
 
@@ -151,6 +236,28 @@ def get_image_color() -> RespT:
         description: Get the color image.
         tags:
            - Color camera
+        parameters:
+           - in: query
+             name: newerThan
+             schema:
+                type: number
+             required: false
+             description: Capture timestamp (from the X-Capture-Timestamp header) the image has to be newer than.
+           - in: query
+             name: roi
+             schema:
+                type: string
+             required: false
+             description: Region of interest (x,y,width,height) in pixels of the full-resolution image.
+           - in: query
+             name: scale
+             schema:
+                type: number
+                default: 1
+                minimum: 0.05
+                maximum: 1
+             required: false
+             description: Downscale factor (applied after cropping).
         responses:
             200:
               description: Ok
@@ -162,17 +269,14 @@ def get_image_color() -> RespT:
               description: Not started
     """
 
-    if _mock:
-        img = color_image()
-    else:
-        assert _kinect is not None
-        img = _kinect.color_image()
+    assert _kinect is not None
 
-    return send_file(
-        image_to_bytes_io(img, target_format="JPEG", target_mode="RGB"),
-        mimetype="image/jpeg",
-        cache_timeout=0,
-    )
+    roi = roi_arg()
+    scale = number_arg("scale", 1, 0.05, 1)
+    frame = _kinect.frame(newer_than())
+
+    resp = send_file(io.BytesIO(jpeg(frame, scale=scale, roi=roi)), mimetype="image/jpeg", max_age=0)
+    return with_timestamp(resp, frame.timestamp)
 
 
 @app.route("/color/parameters", methods=["GET"])
@@ -195,19 +299,12 @@ def get_color_camera_parameters() -> RespT:
               description: Not started
     """
 
-    if _mock:
-        params = CameraParameters(
-            915.575, 915.425, 957.69, 556.35, [0.447, -2.5, 0.00094, -0.00053, 1.432, 0.329, -2.332, 1.363]
-        )
-    else:
-        assert _kinect is not None
-
-        if not _kinect.color_camera_params:
-            return "Failed to get camera parameters", 403
+    assert _kinect is not None
 
-        params = _kinect.color_camera_params
+    if not _kinect.color_camera_params:
+        return "Failed to get camera parameters", 403
 
-    return jsonify(params.to_dict()), 200
+    return jsonify(_kinect.color_camera_params.to_dict()), 200
 
 
 @app.route("/depth/image", methods=["GET"])
@@ -226,10 +323,59 @@ def get_image_depth() -> RespT:
                 type: integer
                 default: 1
              required: false
-             description: Package name
+             description: Maximal number of averaged frames.
+           - in: query
+             name: method
+             schema:
+                type: string
+                enum: [mean, median]
+                default: mean
+             required: false
+             description: Median is computed from a limited number of the latest frames.
+           - in: query
+             name: tolerance
+             schema:
+                type: number
+                minimum: 0
+                maximum: 1000
+             required: false
+             description: Averaging ends when standard error of (most of) the pixels is within the tolerance (mm).
+           - in: query
+             name: buffered
+             schema:
+                type: boolean
+                default: false
+             required: false
+             description: Allows averaging of already captured frames, so there is no need to wait for new ones.
+           - in: query
+             name: newerThan
+             schema:
+                type: number
+             required: false
+             description: Capture timestamp (from the X-Capture-Timestamp header) the image has to be newer than.
+           - in: query
+             name: roi
+             schema:
+                type: string
+             required: false
+             description: Region of interest (x,y,width,height) in pixels of the full-resolution image.
+           - in: query
+             name: scale
+             schema:
+                type: number
+                default: 1
+                minimum: 0.05
+                maximum: 1
+             required: false
+             description: Downscale factor (applied after cropping).
         responses:
             200:
               description: Ok
+              headers:
+                X-Averaged-Frames:
+                  schema:
+                    type: integer
+                  description: Number of actually averaged frames.
               content:
                 image/png:
                     schema:
@@ -238,13 +384,266 @@ def get_image_depth() -> RespT:
               description: Not started
     """
 
-    if _mock:
-        img = depth_image()
+    assert _kinect is not None
+
+    roi = roi_arg()
+    scale = number_arg("scale", 1, 0.05, 1)
+    averaged_frames = int(request.args.get("averagedFrames", default=1))
+
+    if averaged_frames == 1:  # a single frame might be already encoded
+        frame = _kinect.frame(newer_than())
+        resp = send_file(io.BytesIO(png(frame, scale, roi)), mimetype="image/png", max_age=0)
+        resp.headers[AVERAGED_FRAMES_HEADER] = "1"
+        return with_timestamp(resp, frame.timestamp)
+
+    avg = averaged_depth(averaged_frames)
+
+    resp = send_file(
+        io.BytesIO(encode_png(region(avg.depth, roi, scale, cv2.INTER_NEAREST))), mimetype="image/png", max_age=0
+    )
+    resp.headers[AVERAGED_FRAMES_HEADER] = str(avg.frames)
+    return with_timestamp(resp, avg.timestamp)
+
+
+@app.route("/depth/raw", methods=["GET"])
+@requires_started
+def get_raw_depth() -> RespT:
+    """Get the depth image as a raw buffer.
+    ---
+    get:
+        description: Get the depth image as a raw buffer of uint16 (little-endian) distances in mm, row by row.
+        tags:
+           - Depth camera
+        parameters:
+           - in: query
+             name: averagedFrames
+             schema:
+                type: integer
+                default: 1
+             required: false
+             description: Maximal number of averaged frames.
+           - in: query
+             name: method
+             schema:
+                type: string
+                enum: [mean, median]
+                default: mean
+             required: false
+             description: Median is computed from a limited number of the latest frames.
+           - in: query
+             name: tolerance
+             schema:
+                type: number
+                minimum: 0
+                maximum: 1000
+             required: false
+             description: Averaging ends when standard error of (most of) the pixels is within the tolerance (mm).
+           - in: query
+             name: buffered
+             schema:
+                type: boolean
+                default: false
+             required: false
+             description: Allows averaging of already captured frames, so there is no need to wait for new ones.
+           - in: query
+             name: newerThan
+             schema:
+                type: number
+             required: false
+             description: Capture timestamp (from the X-Capture-Timestamp header) the image has to be newer than.
+           - in: query
+             name: roi
+             schema:
+                type: string
+             required: false
+             description: Region of interest (x,y,width,height) in pixels of the full-resolution image.
+           - in: query
+             name: scale
+             schema:
+                type: number
+                default: 1
+                minimum: 0.05
+                maximum: 1
+             required: false
+             description: Downscale factor (applied after cropping).
+           - in: query
+             name: compress
+             schema:
+                type: boolean
+                default: false
+             required: false
+             description: Compress the data (gzip, fastest level), worth it for slow networks only.
+        responses:
+            200:
+              description: Ok
+              headers:
+                X-Depth-Shape:
+                  schema:
+                    type: string
+                  description: Height and width of the image, separated by a comma.
+                X-Camera-Parameters:
+                  schema:
+                    type: string
+                  description: Intrinsic parameters (JSON) of the color camera (adjusted to the region and scale).
+                X-Averaged-Frames:
+                  schema:
+                    type: integer
+                  description: Number of actually averaged frames.
+              content:
+                application/octet-stream:
+                    schema:
+                        type: string
+                        format: binary
+            403:
+              description: Not started
+    """
+
+    assert _kinect is not None
+
+    roi = roi_arg()
+    scale = number_arg("scale", 1, 0.05, 1)
+    averaged_frames = int(request.args.get("averagedFrames", default=1))
+
+    if averaged_frames == 1:
+        frame = _kinect.frame(newer_than())
+        depth, frames, timestamp = frame.depth, 1, frame.timestamp
     else:
-        assert _kinect is not None
-        img = _kinect.depth_image(averaged_frames=int(request.args.get("averagedFrames", default=1)))
+        depth, frames, timestamp = averaged_depth(averaged_frames)
+
+    depth = region(depth, roi, scale, cv2.INTER_NEAREST)
+    data = depth_to_bytes(depth)
+
+    resp = Response(data, mimetype="application/octet-stream")
+
+    if request.args.get("compress", default="false") == "true":
+        resp.set_data(gzip.compress(data, compresslevel=1))
+        resp.headers["Content-Encoding"] = "gzip"
+
+    resp.headers["Cache-Control"] = "no-cache, no-store"
+    resp.headers[DEPTH_SHAPE_HEADER] = shape_to_str(depth.shape)
+    if _kinect.color_camera_params:
+        resp.headers[CAMERA_PARAMETERS_HEADER] = _kinect.color_camera_params.for_region(roi, scale).to_json()
+    resp.headers[AVERAGED_FRAMES_HEADER] = str(frames)
+    return with_timestamp(resp, timestamp)
+
+
+@app.route("/color/stream", methods=["GET"])
+@requires_started
+def get_stream_color() -> RespT:
+    """Get the stream of color images (MJPEG).
+    ---
+    get:
+        description: Get the stream of color images (MJPEG). Each part has the X-Capture-Timestamp header.
+        tags:
+           - Color camera
+        parameters:
+           - in: query
+             name: fps
+             schema:
+                type: number
+                default: 10
+                minimum: 0.1
+                maximum: 30
+             required: false
+             description: Maximal frame rate.
+           - in: query
+             name: roi
+             schema:
+                type: string
+             required: false
+             description: Region of interest (x,y,width,height) in pixels of the full-resolution image.
+           - in: query
+             name: scale
+             schema:
+                type: number
+                default: 1
+                minimum: 0.05
+                maximum: 1
+             required: false
+             description: Downscale factor (applied after cropping).
+           - in: query
+             name: quality
+             schema:
+                type: integer
+                minimum: 1
+                maximum: 100
+             required: false
+             description: JPEG quality.
+        responses:
+            200:
+              description: Ok
+              content:
+                multipart/x-mixed-replace:
+                    schema:
+                        type: string
+                        format: binary
+            403:
+              description: Not started
+    """
+
+    assert _kinect is not None
+
+    fps = number_arg("fps", 10, 0.1, 30)
+    scale = number_arg("scale", 1, 0.05, 1)
+    roi = roi_arg()
+    quality = int(number_arg("quality", JPEG_QUALITY, 1, 100))
+
+    return stream_response(multipart_stream(_kinect, lambda frame: jpeg(frame, quality, scale, roi), "image/jpeg", fps))
+
+
+@app.route("/depth/stream", methods=["GET"])
+@requires_started
+def get_stream_depth() -> RespT:
+    """Get the stream of (16-bit PNG) depth images.
+    ---
+    get:
+        description: Get the stream of (16-bit PNG) depth images. Each part has the X-Capture-Timestamp header.
+        tags:
+           - Depth camera
+        parameters:
+           - in: query
+             name: fps
+             schema:
+                type: number
+                default: 10
+                minimum: 0.1
+                maximum: 30
+             required: false
+             description: Maximal frame rate.
+           - in: query
+             name: roi
+             schema:
+                type: string
+             required: false
+             description: Region of interest (x,y,width,height) in pixels of the full-resolution image.
+           - in: query
+             name: scale
+             schema:
+                type: number
+                default: 1
+                minimum: 0.05
+                maximum: 1
+             required: false
+             description: Downscale factor (applied after cropping).
+        responses:
+            200:
+              description: Ok
+              content:
+                multipart/x-mixed-replace:
+                    schema:
+                        type: string
+                        format: binary
+            403:
+              description: Not started
+    """
+
+    assert _kinect is not None
 
-    return send_file(image_to_bytes_io(img, target_format="PNG"), mimetype="image/png", cache_timeout=0)
+    fps = number_arg("fps", 10, 0.1, 30)
+    scale = number_arg("scale", 1, 0.05, 1)
+    roi = roi_arg()
+
+    return stream_response(multipart_stream(_kinect, lambda frame: png(frame, scale, roi), "image/png", fps))
 
 
 @app.route("/synchronized/image", methods=["GET"])
@@ -256,6 +655,13 @@ def get_image_both() -> RespT:
         description: Get the depth image.
         tags:
            - Synchronized
+        parameters:
+           - in: query
+             name: newerThan
+             schema:
+                type: number
+             required: false
+             description: Capture timestamp (from the X-Capture-Timestamp header) the image has to be newer than.
         responses:
             200:
               description: Ok
@@ -268,25 +674,40 @@ def get_image_both() -> RespT:
               description: Not started
     """
 
-    if _mock:
-        color = color_image()
-        depth = depth_image()
-    else:
-        assert _kinect is not None
-        both = _kinect.sync_images()
-        color = both.color
-        depth = both.depth
+    assert _kinect is not None
+    frame = _kinect.frame(newer_than())
 
     mem_zip = io.BytesIO()
 
     with zipfile.ZipFile(mem_zip, mode="w", compression=zipfile.ZIP_STORED) as zf:
-        zf.writestr("color.jpg", image_to_bytes_io(color).getvalue())
-        zf.writestr("depth.png", image_to_bytes_io(depth, target_format="PNG").getvalue())
+        zf.writestr("color.jpg", jpeg(frame))
+        zf.writestr("depth.png", png(frame))
 
     mem_zip.seek(0)
-    return send_file(
-        mem_zip, mimetype="application/zip", cache_timeout=0, as_attachment=True, attachment_filename="synchronized.zip"
+    resp = send_file(
+        mem_zip, mimetype="application/zip", max_age=0, as_attachment=True, download_name="synchronized.zip"
     )
+    return with_timestamp(resp, frame.timestamp)
+
+
+@app.route("/cache/metrics", methods=["GET"])
+def get_cache_metrics() -> RespT:
+    """Get metrics of the encoded images cache.
+    ---
+    get:
+        description: Get metrics of the encoded images cache.
+        tags:
+           - Cache
+        responses:
+            200:
+              description: Ok
+              content:
+                application/json:
+                  schema:
+                    $ref: CacheMetrics
+    """
+
+    return jsonify(_cache.metrics().to_dict()), 200
 
 
 def main() -> None:
@@ -301,7 +722,7 @@ def main() -> None:
     if _mock:
         logger.info("Starting as a mock!")
 
-    run_app(app, SERVICE_NAME, version(), version(), port_from_url(URL), [CameraParameters], args.swagger)
+    run_app(app, SERVICE_NAME, version(), version(), port_from_url(URL), [CameraParameters, CacheMetrics], args.swagger)
 
     if _kinect:
         _kinect.cleanup()
@@ -0,0 +1,70 @@
+"""Streaming of frames as multipart/x-mixed-replace (e.g. MJPEG), which is
+supported by browsers (img tag) and many other clients."""
+
+import time
+from typing import Callable, Iterator
+
+from arcor2_kinect_azure.frames import Frame, FrameSource, KinectAzureException
+
+BOUNDARY = "frame"
+MIMETYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+TIMESTAMP_HEADER = "X-Capture-Timestamp"
+
+MAX_FPS = 30.0
+
+
+def part(data: bytes, content_type: str, timestamp: float) -> bytes:
+
+    headers = (
+        f"--{BOUNDARY}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        f"{TIMESTAMP_HEADER}: {timestamp!r}\r\n\r\n"
+    )
+
+    return headers.encode() + data + b"\r\n"
+
+
+def multipart_stream(
+    source: FrameSource, encode: Callable[[Frame], bytes], content_type: str, fps: float
+) -> Iterator[bytes]:
+    """Yields new frames (parts of the multipart response) until the source is
+    stopped.
+
+    :param source:
+    :param encode: Returns encoded (and downscaled) image from the frame.
+    :param content_type: Of the encoded image.
+    :param fps: Maximal rate, the stream is never faster than the sensor.
+    :return:
+    """
+
+    period = 1.0 / min(fps, MAX_FPS)
+    next_frame = time.monotonic()
+
+    try:
+        frame = source.frame()
+    except KinectAzureException:
+        return
+
+    while True:
+
+        yield part(encode(frame), content_type, frame.timestamp)
+
+        next_frame += period
+        now = time.monotonic()
+
+        if next_frame > now:
+            time.sleep(next_frame - now)
+        else:  # the client (or encoding) is too slow, do not try to catch up
+            next_frame = now
+
+        while True:
+
+            if not source.running:
+                return
+
+            try:
+                frame = source.frame(frame.timestamp)
+                break
+            except KinectAzureException:  # no new frame within the timeout, let's check if the source still runs
+                continue
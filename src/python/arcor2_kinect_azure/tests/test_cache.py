@@ -0,0 +1,58 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from arcor2_kinect_azure.cache import EncodedFrameCache
+
+
+def test_cache() -> None:
+
+    cache = EncodedFrameCache(2)
+
+    assert cache.get((1.0, "jpeg", (75,)), lambda: b"a") == b"a"
+    assert cache.get((1.0, "jpeg", (75,)), lambda: b"x") == b"a"
+    assert cache.get((1.0, "jpeg", (90,)), lambda: b"b") == b"b"
+    assert cache.get((2.0, "jpeg", (75,)), lambda: b"c") == b"c"  # evicts the least recently used one
+
+    assert cache.get((1.0, "jpeg", (75,)), lambda: b"d") == b"d"
+
+    metrics = cache.metrics()
+    assert metrics.hits == 1
+    assert metrics.misses == 4
+    assert metrics.hit_rate == pytest.approx(0.2)
+    assert metrics.size == 2
+
+
+def test_concurrent_requests_encode_once() -> None:
+
+    cache = EncodedFrameCache()
+    calls = 0
+    lock = threading.Lock()
+
+    def encode() -> bytes:
+        nonlocal calls
+        with lock:
+            calls += 1
+        time.sleep(0.05)
+        return b"data"
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: cache.get((1.0, "png", ()), encode), range(8)))
+
+    assert results == [b"data"] * 8
+    assert calls == 1
+    assert cache.metrics().hits == 7
+
+
+def test_failed_encoding_is_not_cached() -> None:
+
+    cache = EncodedFrameCache()
+
+    def fail() -> bytes:
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        cache.get((1.0, "png", ()), fail)
+
+    assert cache.get((1.0, "png", ()), lambda: b"ok") == b"ok"
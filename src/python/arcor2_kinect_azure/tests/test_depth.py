@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from arcor2_kinect_azure.depth import AveragingMethod, DepthAverage
+
+
+def test_mean_ignores_invalid_pixels() -> None:
+
+    avg = DepthAverage()
+
+    avg.add(np.array([[1000, 0, 0]], dtype=np.uint16))
+    avg.add(np.array([[1002, 500, 0]], dtype=np.uint16))
+    avg.add(np.array([[1004, 0, 0]], dtype=np.uint16))
+
+    assert avg.frames == 3
+    assert avg.result().tolist() == [[1002, 500, 0]]
+
+
+@pytest.mark.parametrize("frames", [1, 2, 3, 4, 5, 12])
+def test_median(frames: int) -> None:
+
+    rng = np.random.default_rng(frames)
+    images = rng.integers(1, 4000, size=(frames, 4, 5), dtype=np.uint16)
+    images[:, 0, 0] = 0  # no valid value
+    images[0, 1, 1] = 0  # one invalid value
+
+    avg = DepthAverage(AveragingMethod.MEDIAN, median_frames=5)
+
+    for img in images:
+        avg.add(img)
+
+    res = avg.result()
+    window = images[-5:].astype(float)
+    window[window == 0] = np.nan
+
+    with pytest.warns(RuntimeWarning):  # all-NaN slice
+        expected = np.nan_to_num(np.floor(np.nanmedian(window, axis=0)))
+
+    assert res.dtype == np.uint16
+    assert np.array_equal(res, expected)
+
+
+def test_convergence() -> None:
+
+    rng = np.random.default_rng(0)
+    truth = rng.integers(500, 3000, size=(48, 64)).astype(float)
+
+    avg = DepthAverage()
+    assert not avg.converged(1.0)
+
+    for _ in range(4):
+        avg.add((truth + rng.normal(0, 10, truth.shape)).astype(np.uint16))
+
+    assert not avg.converged(1.0)
+
+    for _ in range(200):
+        avg.add((truth + rng.normal(0, 10, truth.shape)).astype(np.uint16))
+
+    assert avg.converged(1.0)
+    assert np.abs(avg.result() - truth).mean() < 2
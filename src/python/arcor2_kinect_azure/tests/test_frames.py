@@ -0,0 +1,300 @@
+import gzip
+import io
+import threading
+import time
+import zipfile
+from typing import Callable
+
+import numpy as np
+import pytest
+from arcor2_kinect_azure import frames
+from arcor2_kinect_azure.frames import (
+    MIN_AVERAGED_FRAMES,
+    Frame,
+    FrameBuffer,
+    FrameSource,
+    KinectAzureException,
+    MockKinectAzure,
+    StaticFrame,
+    bgra_to_rgba,
+    encode_jpeg,
+    encode_png,
+)
+from arcor2_kinect_azure.scripts import kinect_azure as service
+from arcor2_kinect_azure.stream import multipart_stream
+from PIL import Image
+
+from arcor2.data.camera import CameraParameters
+from arcor2.flask import FlaskException
+from arcor2.image import DEPTH_SHAPE_HEADER, depth_from_bytes, shape_from_str
+from arcor2.rest import read_multipart
+
+
+def frame(timestamp: float, depth: int = 0) -> StaticFrame:
+    return StaticFrame(timestamp, np.zeros((2, 2, 4), dtype=np.uint8), np.full((2, 2), depth, dtype=np.uint16))
+
+
+def test_buffer() -> None:
+
+    buffer = FrameBuffer(3)
+
+    with pytest.raises(KinectAzureException):
+        buffer.latest(timeout=0.01)
+
+    for ts in range(1, 6):
+        buffer.put(frame(ts))
+
+    assert buffer.latest().timestamp == 5
+    assert buffer.newer_than(1).timestamp == 3  # frames 1 and 2 were already dropped
+    assert buffer.newer_than(3).timestamp == 4
+
+    with pytest.raises(KinectAzureException):
+        buffer.newer_than(5, timeout=0.01)
+
+    assert [f.timestamp for f in buffer.frames(2, buffered=True)] == [4, 5]
+    assert [f.timestamp for f in buffer.frames(2, newer_than=3, buffered=True)] == [4, 5]
+    assert [f.timestamp for f in buffer.frames(1)] == [5]
+
+
+def test_capture_survives_errors(monkeypatch) -> None:
+    class FailingSource(FrameSource):
+        def __init__(self) -> None:
+            super().__init__()
+            self.grabs = 0
+
+        def _grab(self) -> Frame:
+            self.grabs += 1
+            if self.grabs <= 2:
+                raise RuntimeError("Device error.")
+            time.sleep(0.01)
+            return frame(time.time())
+
+    monkeypatch.setattr(frames, "ERROR_DELAY", 0.01)
+    monkeypatch.setattr(frames.logger, "disabled", True)  # the traceback is expected
+
+    source = FailingSource()
+    source.start_capturing()
+
+    try:
+        assert source.frame() is not None
+        assert source.running
+        assert source.grabs > 2
+    finally:
+        source.cleanup()
+
+    assert not source.running
+
+
+def test_buffer_waits_for_new_frame() -> None:
+
+    buffer = FrameBuffer(3)
+    buffer.put(frame(1))
+
+    threading.Timer(0.05, buffer.put, args=(frame(2),)).start()
+    assert [f.timestamp for f in buffer.frames(2)] == [1, 2]
+
+
+def synthetic_bgra(width: int = 1920, height: int = 1080) -> np.ndarray:
+
+    y, x = np.mgrid[0:height, 0:width]
+    return np.dstack((x % 256, y % 256, (x + y) % 256, np.full_like(x, 255))).astype(np.uint8)
+
+
+def test_conversion() -> None:
+
+    bgra = synthetic_bgra(64, 48)
+    orig = bgra.copy()
+
+    rgba = bgra_to_rgba(bgra)
+    assert np.array_equal(rgba, bgra[:, :, [2, 1, 0, 3]])
+    assert np.array_equal(bgra, orig)  # the shared frame is untouched
+
+    img = Image.open(io.BytesIO(encode_jpeg(bgra, quality=100)))
+    assert img.mode == "RGB"
+    assert np.abs(np.array(img).astype(int) - rgba[:, :, :3]).mean() < 2
+
+
+def test_encoding_benchmark() -> None:
+    """Per-frame cost of the color image encoding compared to the previous
+    PIL based approach."""
+
+    bgra = synthetic_bgra()
+
+    def pil() -> None:
+        arr = bgra.copy()
+        arr[:, :, [0, 1, 2, 3]] = arr[:, :, [2, 1, 0, 3]]
+        Image.fromarray(arr, mode="RGBA").convert("RGB").save(io.BytesIO(), "JPEG")
+
+    def direct() -> None:
+        encode_jpeg(bgra)
+
+    def measure(func: Callable[[], None], frames: int = 10) -> float:
+        func()
+        start = time.perf_counter()
+        for _ in range(frames):
+            func()
+        return (time.perf_counter() - start) / frames
+
+    before = measure(pil)
+    after = measure(direct)
+
+    assert after < before, f"Encoding takes {after * 1e3:.1f} ms per frame (PIL based {before * 1e3:.1f} ms)."
+
+
+@pytest.fixture()
+def client():
+
+    service.app.config["TESTING"] = True
+    service._kinect = MockKinectAzure(
+        Image.new("RGB", (64, 48), (255, 0, 0)), Image.fromarray(np.full((48, 64), 1000, dtype=np.uint16))
+    )
+
+    with service.app.test_client() as client:
+        yield client
+        assert client.put("/state/stop").status_code == 200
+
+    assert service._kinect is None
+
+
+def test_mock_color(client) -> None:
+
+    resp = client.get("/color/image")
+    assert resp.status_code == 200
+    ts = float(resp.headers[service.TIMESTAMP_HEADER])
+
+    img = Image.open(io.BytesIO(resp.data))
+    assert img.mode == "RGB"
+    pixel = img.getpixel((32, 24))
+    assert isinstance(pixel, tuple)
+    r, g, b = pixel
+    assert r > 200 and g < 50 and b < 50
+
+    resp = client.get("/color/image", query_string={"newerThan": ts})
+    assert resp.status_code == 200
+    assert float(resp.headers[service.TIMESTAMP_HEADER]) > ts
+
+
+def test_mock_depth(client) -> None:
+
+    start = time.time()
+
+    resp = client.get("/depth/image", query_string={"averagedFrames": 2, "newerThan": start})
+    assert resp.status_code == 200
+    assert float(resp.headers[service.TIMESTAMP_HEADER]) > start
+
+    resp = client.get("/depth/image", query_string={"averagedFrames": 2, "buffered": "true"})
+    assert resp.status_code == 200
+
+    img = Image.open(io.BytesIO(resp.data))
+    assert img.size == (64, 48)
+    assert np.all(np.array(img) == 1000)
+
+    # mock frames are the same, so averaging ends as soon as possible
+    resp = client.get("/depth/image", query_string={"averagedFrames": 10})
+    assert resp.status_code == 200
+    assert int(resp.headers[service.AVERAGED_FRAMES_HEADER]) == MIN_AVERAGED_FRAMES
+
+    resp = client.get("/depth/image", query_string={"averagedFrames": 4, "tolerance": 0, "method": "median"})
+    assert resp.status_code == 200
+    assert int(resp.headers[service.AVERAGED_FRAMES_HEADER]) == 4
+
+    # error handlers are registered by run_app
+    for tolerance in ("abc", -1):
+        with pytest.raises(FlaskException) as e:
+            client.get("/depth/image", query_string={"averagedFrames": 2, "tolerance": tolerance})
+        assert e.value.error_code == 400
+
+
+def test_mock_raw_depth(client) -> None:
+
+    resp = client.get("/depth/raw")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/octet-stream"
+
+    shape = shape_from_str(resp.headers[DEPTH_SHAPE_HEADER])
+    assert shape == (48, 64)
+    assert np.all(depth_from_bytes(resp.data, shape) == 1000)
+    assert CameraParameters.from_json(resp.headers[service.CAMERA_PARAMETERS_HEADER]).fx > 0
+
+    resp = client.get("/depth/raw", query_string={"averagedFrames": 3, "compress": "true"})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert int(resp.headers[service.AVERAGED_FRAMES_HEADER]) == 3
+    assert np.all(depth_from_bytes(gzip.decompress(resp.data), (48, 64)) == 1000)
+
+
+def test_mock_region(client) -> None:
+
+    resp = client.get("/color/image", query_string={"roi": "8,4,32,16", "scale": 0.5})
+    assert resp.status_code == 200
+    assert Image.open(io.BytesIO(resp.data)).size == (16, 8)
+
+    resp = client.get("/depth/image", query_string={"roi": "8,4,32,16", "scale": 0.5})
+    assert resp.status_code == 200
+    assert Image.open(io.BytesIO(resp.data)).size == (16, 8)
+
+    resp = client.get("/depth/raw", query_string={"roi": "8,4,32,16", "scale": 0.5, "averagedFrames": 3})
+    assert resp.status_code == 200
+    assert shape_from_str(resp.headers[DEPTH_SHAPE_HEADER]) == (8, 16)
+    assert np.all(depth_from_bytes(resp.data, (8, 16)) == 1000)
+
+    assert service._kinect is not None
+    full = service._kinect.color_camera_params
+    assert full is not None
+    params = CameraParameters.from_json(resp.headers[service.CAMERA_PARAMETERS_HEADER])
+    assert params.fx == pytest.approx(full.fx / 2)
+    assert params.cx == pytest.approx((full.cx - 8 + 0.5) / 2 - 0.5)
+
+    # error handlers are registered by run_app
+    for args in ({"roi": "8,4"}, {"scale": 2}):
+        with pytest.raises(FlaskException) as e:
+            client.get("/color/image", query_string=args)
+        assert e.value.error_code == 400
+
+
+def test_mock_synchronized(client) -> None:
+
+    hits = service._cache.metrics().hits
+
+    color = client.get("/color/image")
+    assert color.status_code == 200
+
+    # the same frame - color image is already encoded
+    just_before = {"newerThan": float(color.headers[service.TIMESTAMP_HEADER]) - 1e-6}
+
+    resp = client.get("/synchronized/image", query_string=just_before)
+    assert resp.status_code == 200
+    assert resp.headers[service.TIMESTAMP_HEADER] == color.headers[service.TIMESTAMP_HEADER]
+
+    depth = client.get("/depth/image", query_string=just_before)  # encoded within the previous request
+    assert depth.status_code == 200
+
+    assert service._cache.metrics().hits == hits + 2
+
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert set(zf.namelist()) == {"color.jpg", "depth.png"}
+
+
+def test_mock_stream(client) -> None:
+
+    resp = client.get("/color/stream", query_string={"fps": 30, "scale": 0.5}, buffered=False)
+    assert resp.status_code == 200
+    assert resp.mimetype == "multipart/x-mixed-replace"
+
+    parts = iter(resp.response)
+    data = b"".join(next(parts) for _ in range(3))
+    resp.close()
+
+    images = [Image.open(io.BytesIO(img)) for img in read_multipart(io.BytesIO(data))]
+    assert len(images) == 3
+    assert all(img.size == (32, 24) for img in images)
+
+
+def test_mock_stream_ends_with_stop() -> None:
+
+    source = MockKinectAzure(Image.new("RGB", (8, 6)), Image.fromarray(np.full((6, 8), 1000, dtype=np.uint16)))
+    parts = multipart_stream(source, lambda frame: encode_png(frame.depth), "image/png", 30)
+
+    assert next(parts).startswith(b"--")
+    source.cleanup()
+    assert len(list(parts)) <= 1  # maybe one more already captured frame